@@ -0,0 +1,127 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import TarefaAgendada
+
+
+class Agendador:
+    """
+    Agendador de tarefas periódicas em uma thread daemon.
+    Com vários workers/processos, cada execução é reivindicada por um UPDATE
+    condicional na linha da tarefa (tarefas_agendadas), então apenas um
+    worker executa cada tarefa por vez e as demais apenas pulam o ciclo.
+    """
+
+    # Tempo máximo que uma execução mantém a trava (protege contra worker morto)
+    DURACAO_TRAVA = timedelta(minutes=15)
+
+    # Um agendador por processo, mesmo que create_app seja chamado mais de uma vez
+    _iniciado_no_processo = False
+    _lock_processo = threading.Lock()
+
+    def __init__(self, app, intervalo_ciclo=10):
+        self.app = app
+        self.intervalo_ciclo = intervalo_ciclo
+        self.tarefas = {}  # nome -> (funcao, intervalo em segundos)
+        self.identificador = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._thread = None
+        self._parar = threading.Event()
+
+    def registrar(self, nome, funcao, intervalo):
+        """Registra uma tarefa; intervalo <= 0 desativa a tarefa."""
+        if intervalo > 0:
+            self.tarefas[nome] = (funcao, intervalo)
+
+    def iniciar(self):
+        if self._thread or not self.tarefas:
+            return
+        with Agendador._lock_processo:
+            if Agendador._iniciado_no_processo:
+                return
+            Agendador._iniciado_no_processo = True
+        self._thread = threading.Thread(target=self._loop, name="agendador", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _loop(self):
+        # Aguarda um ciclo antes da primeira execução (scripts curtos encerram antes)
+        while not self._parar.wait(self.intervalo_ciclo):
+            for nome in list(self.tarefas):
+                try:
+                    with self.app.app_context():
+                        if self._reivindicar(nome):
+                            self._executar(nome)
+                except Exception as e:
+                    print(f"❌ Erro no agendador ({nome}): {e}")
+
+    def _reivindicar(self, nome) -> bool:
+        """Tenta obter a trava da tarefa se ela estiver vencida e livre."""
+        agora = datetime.now()
+
+        if not db.session.get(TarefaAgendada, nome):
+            try:
+                db.session.add(TarefaAgendada(nome=nome))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # Outro worker criou a linha
+
+        resultado = db.session.execute(
+            update(TarefaAgendada)
+            .where(
+                TarefaAgendada.nome == nome,
+                or_(TarefaAgendada.bloqueado_ate.is_(None), TarefaAgendada.bloqueado_ate < agora),
+                or_(TarefaAgendada.proxima_execucao.is_(None), TarefaAgendada.proxima_execucao <= agora),
+            )
+            .values(bloqueado_por=self.identificador, bloqueado_ate=agora + self.DURACAO_TRAVA)
+        )
+        db.session.commit()
+        return resultado.rowcount == 1
+
+    def _executar(self, nome):
+        funcao, intervalo = self.tarefas[nome]
+        inicio = datetime.now()
+        cronometro = time.perf_counter()
+        erro = None
+
+        try:
+            funcao()
+        except Exception as e:
+            db.session.rollback()
+            erro = str(e)
+            print(f"❌ Erro na tarefa agendada {nome}: {e}")
+
+        db.session.execute(
+            update(TarefaAgendada)
+            .where(TarefaAgendada.nome == nome, TarefaAgendada.bloqueado_por == self.identificador)
+            .values(
+                ultima_execucao=inicio,
+                duracao_segundos=time.perf_counter() - cronometro,
+                ultimo_erro=erro,
+                proxima_execucao=inicio + timedelta(seconds=intervalo),
+                bloqueado_por=None,
+                bloqueado_ate=None,
+            )
+        )
+        db.session.commit()
+
+
+def tarefa_to_dict(tarefa: TarefaAgendada, intervalo=None) -> dict:
+    return {
+        "nome": tarefa.nome,
+        "intervaloSegundos": intervalo,
+        "ultimaExecucao": tarefa.ultima_execucao.isoformat() if tarefa.ultima_execucao else None,
+        "duracaoSegundos": tarefa.duracao_segundos,
+        "proximaExecucao": tarefa.proxima_execucao.isoformat() if tarefa.proxima_execucao else None,
+        "ultimoErro": tarefa.ultimo_erro,
+        "executandoEm": tarefa.bloqueado_por,
+    }
@@ -1,111 +1,200 @@
 import os
+import re
+
 from dotenv import load_dotenv
 from mistralai.client import MistralClient
 
+from cache_ia import cache_respostas_ia
+
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
 
 client = MistralClient(api_key=os.getenv("MISTRAL_API_KEY"))
 
+MODELO_PADRAO = "mistral-large-latest"
+
+
+def _normalizar_entrada(texto) -> str:
+    """Normaliza entradas para a chave do cache (caixa e espaços)."""
+    return " ".join(str(texto or "").lower().split())
+
 
-def gerar_resumo(problema_relatado: str) -> str:
+def _chat_com_cache(funcao: str, entradas: tuple, prompt: str) -> str:
+    """
+    Chama o modelo usando o cache de respostas (memória + banco), endereçado
+    pelo modelo, pela função e pelas entradas normalizadas.
+    """
+    chave = cache_respostas_ia.chave(
+        MODELO_PADRAO, funcao, *(_normalizar_entrada(e) for e in entradas)
+    )
+    resposta = cache_respostas_ia.obter(chave)
+    if resposta is not None:
+        return resposta
+
+    response = client.chat(
+        model=MODELO_PADRAO, messages=[{"role": "user", "content": prompt}]
+    )
+    resposta = response.choices[0].message.content.strip()
+    cache_respostas_ia.guardar(chave, MODELO_PADRAO, resposta)
+    return resposta
+
+
+def transmitir_chat(prompt: str):
+    """Gera os trechos da resposta do modelo conforme chegam (streaming)."""
+    for chunk in client.chat_stream(
+        model=MODELO_PADRAO, messages=[{"role": "user", "content": prompt}]
+    ):
+        trecho = chunk.choices[0].delta.content if chunk.choices else None
+        if trecho:
+            yield trecho
+
+
+def _chat_stream_com_cache(funcao: str, entradas: tuple, prompt: str):
+    """Como _chat_com_cache, mas em streaming; respostas em cache saem em um único trecho."""
+    chave = cache_respostas_ia.chave(
+        MODELO_PADRAO, funcao, *(_normalizar_entrada(e) for e in entradas)
+    )
+    resposta = cache_respostas_ia.obter(chave)
+    if resposta is not None:
+        yield resposta
+        return
+
+    partes = []
+    for trecho in transmitir_chat(prompt):
+        partes.append(trecho)
+        yield trecho
+    cache_respostas_ia.guardar(chave, MODELO_PADRAO, "".join(partes).strip())
+
+
+def gerar_resumo(problema_relatado: str, fallback: bool = True) -> str:
     """
     Gera um resumo conciso do problema relatado pelo cliente.
+    Com fallback=False, erros da API são propagados (para novas tentativas).
     """
     try:
         prompt = (
             f"Resuma o seguinte problema relatado de forma concisa e "
             f"técnica, focando nos pontos principais: {problema_relatado}"
         )
-        response = client.chat(
-            model="mistral-large-latest", messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content.strip()
+        return _chat_com_cache("resumo", (problema_relatado,), prompt)
     except Exception as e:
+        if not fallback:
+            raise
         print(f"Erro ao gerar resumo: {e}")
         return "Resumo não disponível."
 
 
+def _prompt_pre_diagnostico(tipo_aparelho: str, marca_modelo: str, problema_relatado: str) -> str:
+    return (
+        "Act as a senior computer and smartphone repair technician, focused on fast bench-level diagnosis.\n\n"
+        "Service context:\n"
+        f"- Device: {tipo_aparelho} {marca_modelo}\n"
+        f"- Reported issue: {problema_relatado}\n\n"
+        "Mandatory rules:\n"
+        "- DO NOT repeat the reported issue.\n"
+        "- DO NOT rewrite or summarize the context.\n"
+        "- Write in plain text only (no lists, no markdown, no symbols).\n"
+        "- Start by stating the main suspected cause.\n"
+        "- Use extremely concise, technical language.\n"
+        "- Limit the entire response to a maximum of 60 words.\n"
+        "- Avoid explanations, background, or theory.\n\n"
+        "Response language:\n"
+        "- The entire response MUST be written in Brazilian Portuguese.\n\n"
+        "Mandatory response format:\n"
+        "Paragraph 1: One short sentence stating the most likely cause.\n\n"
+        "Paragraph 2: One short sentence stating the first diagnostic check.\n\n"
+        "Insert exactly one blank line between paragraphs.\n\n"
+        "End with exactly:\n\n"
+        "Suspeitos principais:\n"
+        "1) <causa> – Testar: <teste direto>\n"
+        "2) <causa> – Testar: <teste direto>\n\n"
+        "Goal:\n"
+        "Deliver a minimal, actionable diagnosis for an experienced repair technician."
+    )
+
+
 def gerar_pre_diagnostico(
-    tipo_aparelho: str, marca_modelo: str, problema_relatado: str
+    tipo_aparelho: str, marca_modelo: str, problema_relatado: str, fallback: bool = True
 ) -> str:
     """
     Gera um pré-diagnóstico baseado nas informações do aparelho e problema.
+    Com fallback=False, erros da API são propagados (para novas tentativas).
     """
     try:
-        prompt = (
-            "Act as a senior computer and smartphone repair technician, focused on fast bench-level diagnosis.\n\n"
-            "Service context:\n"
-            f"- Device: {tipo_aparelho} {marca_modelo}\n"
-            f"- Reported issue: {problema_relatado}\n\n"
-            "Mandatory rules:\n"
-            "- DO NOT repeat the reported issue.\n"
-            "- DO NOT rewrite or summarize the context.\n"
-            "- Write in plain text only (no lists, no markdown, no symbols).\n"
-            "- Start by stating the main suspected cause.\n"
-            "- Use extremely concise, technical language.\n"
-            "- Limit the entire response to a maximum of 60 words.\n"
-            "- Avoid explanations, background, or theory.\n\n"
-            "Response language:\n"
-            "- The entire response MUST be written in Brazilian Portuguese.\n\n"
-            "Mandatory response format:\n"
-            "Paragraph 1: One short sentence stating the most likely cause.\n\n"
-            "Paragraph 2: One short sentence stating the first diagnostic check.\n\n"
-            "Insert exactly one blank line between paragraphs.\n\n"
-            "End with exactly:\n\n"
-            "Suspeitos principais:\n"
-            "1) <causa> – Testar: <teste direto>\n"
-            "2) <causa> – Testar: <teste direto>\n\n"
-            "Goal:\n"
-            "Deliver a minimal, actionable diagnosis for an experienced repair technician."
-        )
-        response = client.chat(
-            model="mistral-large-latest", messages=[{"role": "user", "content": prompt}]
+        prompt = _prompt_pre_diagnostico(tipo_aparelho, marca_modelo, problema_relatado)
+        return _chat_com_cache(
+            "pre_diagnostico", (tipo_aparelho, marca_modelo, problema_relatado), prompt
         )
-        return response.choices[0].message.content.strip()
     except Exception as e:
+        if not fallback:
+            raise
         print(f"Erro ao gerar pré-diagnóstico: {e}")
         return "Pré-diagnóstico não disponível."
 
 
-def interpretar_consulta_ia(consulta: str, dados_contexto: dict, estado_conversacional: dict = None) -> dict:
-    """
-    Interpreta uma consulta em linguagem natural e extrai informações dos dados disponíveis.
-    Suporta criação conversacional de dados (clientes, OS, produtos).
-    Retorna uma resposta estruturada com a informação solicitada.
-    """
-    try:
-        consulta_lower = consulta.lower()
+def gerar_pre_diagnostico_stream(tipo_aparelho: str, marca_modelo: str, problema_relatado: str):
+    """Versão em streaming de gerar_pre_diagnostico (erros são propagados)."""
+    prompt = _prompt_pre_diagnostico(tipo_aparelho, marca_modelo, problema_relatado)
+    yield from _chat_stream_com_cache(
+        "pre_diagnostico", (tipo_aparelho, marca_modelo, problema_relatado), prompt
+    )
+
+
+def _secoes_contexto(dados_contexto: dict) -> str:
+    """Monta apenas as seções do prompt presentes no contexto (ver coletar_dados_contexto)."""
+    secoes = []
+
+    if "clientes" in dados_contexto or "total_clientes" in dados_contexto:
+        linhas = [f"Total: {dados_contexto.get('total_clientes', 0)} clientes"]
+        for c in dados_contexto.get('clientes', []):
+            linhas.append(
+                f"- {c['nome']} (ID: {c['id']}) | CPF/CNPJ: {c['cpf_cnpj']} | "
+                f"Telefone: {c['telefone']} | Email: {c['email'] or '-'} | Endereço: {c['endereco'] or '-'}"
+            )
+        secoes.append("CLIENTES:\n" + "\n".join(linhas))
+
+    if "os" in dados_contexto or "total_os" in dados_contexto:
+        linhas = [
+            f"Total: {dados_contexto.get('total_os', 0)} OS",
+            "Status disponíveis: aguardando, em_reparo, pronto, entregue, cancelado",
+        ]
+        for ordem in dados_contexto.get('os', []):
+            linhas.append(
+                f"- {ordem['numeroOS']} | Cliente: {ordem['clienteNome']} | Status: {ordem['status']} | "
+                f"Aparelho: {ordem['tipoAparelho']} {ordem['marcaModelo']} | "
+                f"Problema: {ordem['problemaRelatado']} | Valor: R$ {ordem['valorOrcamento']:.2f}"
+            )
+        secoes.append("ORDENS DE SERVIÇO:\n" + "\n".join(linhas))
+
+    if "produtos" in dados_contexto or "total_produtos" in dados_contexto:
+        linhas = [
+            f"Total: {dados_contexto.get('total_produtos', 0)} produtos",
+            f"Produtos com estoque baixo: {dados_contexto.get('produtos_baixo_estoque', 0)} itens",
+        ]
+        for p in dados_contexto.get('produtos', []):
+            linhas.append(
+                f"- {p['nome']} ({p['codigo']}) | Categoria: {p['categoria']} | "
+                f"Quantidade: {p['quantidade']} (mínimo {p['estoqueMinimo']}) | "
+                f"Preço: R$ {p['precoVenda']:.2f}"
+            )
+        secoes.append("PRODUTOS/ESTOQUE:\n" + "\n".join(linhas))
+
+    if "receitas_totais" in dados_contexto:
+        secoes.append(
+            "FINANCEIRO:\n"
+            f"Receitas totais: R$ {dados_contexto['receitas_totais']:.2f}\n"
+            f"OS entregues: {dados_contexto.get('os_entregues', 0)} OS"
+        )
 
-        # Verificar se estamos em um fluxo conversacional de criação
-        if estado_conversacional and estado_conversacional.get('modo'):
-            return processar_fluxo_conversacional(consulta, estado_conversacional, dados_contexto)
+    return "\n\n".join(secoes)
 
-        # Verificar se o usuário quer iniciar criação de dados
-        intencao_criacao = detectar_intencao_criacao(consulta_lower)
-        if intencao_criacao:
-            return iniciar_fluxo_criacao(intencao_criacao, dados_contexto)
 
-        # Contexto dos dados disponíveis
-        contexto = f"""
+def _prompt_consulta(consulta: str, dados_contexto: dict) -> str:
+    # Contexto dos dados disponíveis
+    contexto = f"""
 Sistema de Assistência Técnica - Dados Disponíveis:
 
-CLIENTES:
-Total: {dados_contexto.get('total_clientes', 0)} clientes
-Lista: {', '.join([f"{c['nome']} (ID: {c['id']})" for c in dados_contexto.get('clientes', [])[:10]])}
-
-ORDENS DE SERVIÇO:
-Total: {dados_contexto.get('total_os', 0)} OS
-Status disponíveis: aguardando, em_reparo, pronto, entregue, cancelado
-Exemplos: {', '.join([f"{os['numeroOS']} - {os['clienteNome']} - {os['status']}" for os in dados_contexto.get('os', [])[:10]])}
-
-PRODUTOS/ESTOQUE:
-Total: {dados_contexto.get('total_produtos', 0)} produtos
-Produtos com estoque baixo: {len([p for p in dados_contexto.get('produtos', []) if p['quantidade'] < p['estoqueMinimo']])} itens
-
-FINANCEIRO:
-Receitas totais: R$ {dados_contexto.get('receitas_totais', 0):.2f}
-OS entregues: {dados_contexto.get('os_entregues', 0)} OS
+{_secoes_contexto(dados_contexto)}
 
 CONSULTA DO USUÁRIO: "{consulta}"
 
@@ -123,7 +212,7 @@ TIPO DE RESPOSTAS ESPERADAS:
 - Para produtos: nome, quantidade, preço, categoria
 """
 
-        prompt = f"""{contexto}
+    prompt = f"""{contexto}
 
 Sua tarefa é interpretar a consulta do usuário e fornecer a informação solicitada baseada apenas nos dados fornecidos acima.
 
@@ -133,9 +222,31 @@ INSTRUÇÕES IMPORTANTES:
 - Escreva de forma natural e conversacional, mas direta
 - Se a informação não estiver disponível, diga "Não encontrei essa informação nos dados disponíveis."
 """
+    return prompt
+
+
+def interpretar_consulta_ia(consulta: str, dados_contexto: dict, estado_conversacional: dict = None) -> dict:
+    """
+    Interpreta uma consulta em linguagem natural e extrai informações dos dados disponíveis.
+    Suporta criação conversacional de dados (clientes, OS, produtos).
+    Retorna uma resposta estruturada com a informação solicitada.
+    """
+    try:
+        consulta_lower = consulta.lower()
+
+        # Verificar se estamos em um fluxo conversacional de criação
+        if estado_conversacional and estado_conversacional.get('modo'):
+            return processar_fluxo_conversacional(consulta, estado_conversacional, dados_contexto)
+
+        # Verificar se o usuário quer iniciar criação de dados
+        intencao_criacao = detectar_intencao_criacao(consulta_lower)
+        if intencao_criacao:
+            return iniciar_fluxo_criacao(intencao_criacao, dados_contexto)
+
+        prompt = _prompt_consulta(consulta, dados_contexto)
 
         response = client.chat(
-            model="mistral-large-latest", messages=[{"role": "user", "content": prompt}]
+            model=MODELO_PADRAO, messages=[{"role": "user", "content": prompt}]
         )
 
         resposta_ia = response.choices[0].message.content.strip()
@@ -160,18 +271,68 @@ INSTRUÇÕES IMPORTANTES:
         }
 
 
+def interpretar_consulta_ia_stream(consulta: str, dados_contexto: dict, estado_conversacional: dict = None):
+    """
+    Versão em streaming de interpretar_consulta_ia.
+    Gera ("token", trecho) conforme o modelo responde e termina com
+    ("resultado", dict) no mesmo formato da versão síncrona.
+    Fluxos conversacionais (sem chamada ao modelo) geram só o resultado.
+    """
+    if estado_conversacional and estado_conversacional.get('modo'):
+        yield "resultado", processar_fluxo_conversacional(consulta, estado_conversacional, dados_contexto)
+        return
+
+    intencao_criacao = detectar_intencao_criacao(consulta.lower())
+    if intencao_criacao:
+        yield "resultado", iniciar_fluxo_criacao(intencao_criacao, dados_contexto)
+        return
+
+    partes = []
+    for trecho in transmitir_chat(_prompt_consulta(consulta, dados_contexto)):
+        partes.append(trecho)
+        yield "token", trecho
+
+    yield "resultado", {
+        "resposta": "".join(partes).strip(),
+        "dados": extrair_dados_consulta(consulta, dados_contexto),
+        "consulta": consulta,
+        "estado_conversacional": None
+    }
+
+
+# Critérios de classificação das consultas (usados na montagem do contexto e na extração)
+PADRAO_NUMERO_OS = re.compile(r'os\s*(\d+)|#os(\d+)')
+PALAVRAS_FINANCEIRO = ['receita', 'faturamento', 'venda', 'financeiro']
+PALAVRAS_ESTOQUE = ['produto', 'estoque', 'inventario']
+
+
+def classificar_consulta(consulta: str) -> dict:
+    """
+    Identifica o que a consulta pede (número de OS, financeiro, estoque) para
+    buscar só os dados necessários. Nomes de clientes são resolvidos pelo
+    índice de nomes (similaridade_utils.indice_clientes).
+    """
+    consulta_lower = consulta.lower()
+    os_match = PADRAO_NUMERO_OS.search(consulta_lower)
+    return {
+        "numero_os": (
+            f"#OS{int(os_match.group(1) or os_match.group(2)):04d}" if os_match else None
+        ),
+        "financeiro": any(palavra in consulta_lower for palavra in PALAVRAS_FINANCEIRO),
+        "estoque": any(palavra in consulta_lower for palavra in PALAVRAS_ESTOQUE),
+    }
+
+
 def extrair_dados_consulta(consulta: str, dados_contexto: dict) -> dict:
     """
     Extrai dados específicos baseados na consulta do usuário.
     """
     consulta_lower = consulta.lower()
+    alvo = classificar_consulta(consulta)
 
     # Buscar por número de OS (ex: "OS005", "#OS001")
-    import re
-    os_match = re.search(r'os\s*(\d+)|#os(\d+)', consulta_lower)
-    if os_match:
-        numero = os_match.group(1) or os_match.group(2)
-        numero_formatado = f"#OS{int(numero):04d}"
+    if alvo["numero_os"]:
+        numero_formatado = alvo["numero_os"]
 
         for os in dados_contexto.get('os', []):
             if os['numeroOS'] == numero_formatado:
@@ -180,9 +341,12 @@ def extrair_dados_consulta(consulta: str, dados_contexto: dict) -> dict:
                     "dados": os
                 }
 
-    # Buscar por nome de cliente
-    for cliente in dados_contexto.get('clientes', []):
-        if cliente['nome'].lower() in consulta_lower:
+    # Buscar por nome de cliente (clientes já localizados pelo índice de nomes
+    # vêm com similaridadeNome, do mais provável para o menos)
+    clientes = dados_contexto.get('clientes', [])
+    citados = [c for c in clientes if c.get('similaridadeNome')]
+    for cliente in citados or clientes:
+        if citados or cliente['nome'].lower() in consulta_lower:
             # Buscar OS do cliente
             os_cliente = [os for os in dados_contexto.get('os', []) if os['clienteId'] == cliente['id']]
             return {
@@ -192,7 +356,7 @@ def extrair_dados_consulta(consulta: str, dados_contexto: dict) -> dict:
             }
 
     # Consultas financeiras
-    if any(palavra in consulta_lower for palavra in ['receita', 'faturamento', 'venda', 'financeiro']):
+    if alvo["financeiro"]:
         return {
             "tipo": "financeiro",
             "dados": {
@@ -204,12 +368,12 @@ def extrair_dados_consulta(consulta: str, dados_contexto: dict) -> dict:
         }
 
     # Consultas de produtos/estoque
-    if any(palavra in consulta_lower for palavra in ['produto', 'estoque', 'inventario']):
+    if alvo["estoque"]:
         produtos_baixo_estoque = [p for p in dados_contexto.get('produtos', []) if p['quantidade'] < p['estoqueMinimo']]
         return {
             "tipo": "produtos",
             "dados": {
-                "total_produtos": len(dados_contexto.get('produtos', [])),
+                "total_produtos": dados_contexto.get('total_produtos', len(dados_contexto.get('produtos', []))),
                 "baixo_estoque": produtos_baixo_estoque,
                 "todos_produtos": dados_contexto.get('produtos', [])[:20]  # Limitar para não sobrecarregar
             }
@@ -368,9 +532,9 @@ def processar_criacao_cliente(consulta: str, estado: dict, dados_contexto: dict)
         elif not cpf_limpo.isdigit():
             resposta = "CPF/CNPJ deve conter apenas números. Por favor, digite novamente:"
         else:
-            # Verificar se já existe
-            cpf_existe = any(c['cpf_cnpj'].replace('.', '').replace('-', '').replace('/', '') == cpf_limpo
-                           for c in dados_contexto.get('clientes', []))
+            # Verificar se já existe (o contexto traz o cliente com este CPF/CNPJ, se houver)
+            cpf_existe = any(c['cpf_cnpj'] == cpf_limpo
+                             for c in dados_contexto.get('clientes', []))
             if cpf_existe:
                 resposta = "Este CPF/CNPJ já está cadastrado no sistema. Por favor, verifique ou use outro:"
             else:
@@ -9,12 +9,17 @@ from flask import (
 from flask_cors import CORS
 from sqlalchemy.exc import IntegrityError
 
+from auth_utils import login_required
 from config import get_config
 from extensions import db, migrate
 
 
-def create_app():
-    """App factory principal."""
+def create_app(servicos_em_segundo_plano=True):
+    """
+    App factory principal. servicos_em_segundo_plano=False não inicia as
+    threads da fila de IA nem o agendador (processos que só usam o app,
+    como o worker_ia.py).
+    """
     app = Flask(
         __name__,
         template_folder="../templates",
@@ -28,7 +33,18 @@ def create_app():
     migrate.init_app(app, db)
 
     # Importa models para que o Migrate reconheça
-    from models import Cliente, ProdutoEstoque, OrdemServico, Usuario  # noqa: F401
+    from models import (  # noqa: F401
+        Cliente,
+        ProdutoEstoque,
+        OrdemServico,
+        Usuario,
+        ResumoFinanceiroDiario,
+        TarefaAgendada,
+        Sequencia,
+        TarefaIA,
+        RespostaIACache,
+        ConversaIA,
+    )
 
     # Cria todas as tabelas no banco de dados
     with app.app_context():
@@ -41,6 +57,9 @@ def create_app():
     from routes_estoque import bp as estoque_bp
     from routes_notificacoes import bp as notificacoes_bp
     from routes_ai import bp as ai_bp
+    from routes_financeiro import bp as financeiro_bp
+    from routes_busca import bp as busca_bp
+    from routes_dispositivos import bp as dispositivos_bp
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(clientes_bp, url_prefix="/api/clientes")
@@ -48,11 +67,111 @@ def create_app():
     app.register_blueprint(estoque_bp, url_prefix="/api/estoque")
     app.register_blueprint(notificacoes_bp)
     app.register_blueprint(ai_bp, url_prefix="/api/ai")
+    app.register_blueprint(financeiro_bp, url_prefix="/api/financeiro")
+    app.register_blueprint(busca_bp, url_prefix="/api/busca")
+    app.register_blueprint(dispositivos_bp, url_prefix="/api/dispositivos")
+
+    # Índice de texto completo da busca (criado e populado na primeira execução)
+    # e backfills de OS antigas (prazo_limite, IMEI/serial normalizado)
+    from busca_utils import indice_busca
+    from routes_dispositivos import preencher_imei_serial_normalizado
+    from routes_notificacoes import preencher_prazos_limite
+
+    with app.app_context():
+        indice_busca.preparar()
+        preencher_prazos_limite()
+        preencher_imei_serial_normalizado()
+
+    # Cache de respostas da IA
+    from cache_ia import cache_respostas_ia
+
+    cache_respostas_ia.configurar(
+        max_memoria=app.config["AI_CACHE_MAX_MEMORIA"],
+        ttl_segundos=app.config["AI_CACHE_TTL"],
+        max_persistente=app.config["AI_CACHE_MAX_PERSISTENTE"],
+    )
+
+    # Sessões de conversa do assistente
+    from conversas_utils import conversas_ia
+
+    conversas_ia.configurar(
+        max_conversas=app.config["CONVERSAS_IA_MAX"],
+        ttl_segundos=app.config["CONVERSAS_IA_TTL"],
+        persistir=app.config["CONVERSAS_IA_PERSISTIR"],
+    )
+
+    # Fila persistente de tarefas de IA (workers em threads; 0 = só worker_ia.py)
+    from fila_ia import FilaTarefasIA
+    from routes_os import pre_diagnosticar_os_ia, resumir_os_ia
+
+    fila_ia = FilaTarefasIA(
+        app,
+        workers=app.config["AI_WORKERS"],
+        tentativas=app.config["AI_TENTATIVAS"],
+        backoff=app.config["AI_BACKOFF_SEGUNDOS"],
+    )
+    fila_ia.registrar("resumo", resumir_os_ia)
+    fila_ia.registrar("pre_diagnostico", pre_diagnosticar_os_ia)
+    app.extensions["fila_ia"] = fila_ia
+    if servicos_em_segundo_plano:
+        fila_ia.iniciar()
+
+    # Agendador de tarefas em segundo plano
+    from agendador import Agendador, tarefa_to_dict
+    from routes_notificacoes import (
+        aplicar_retencao_notificacoes,
+        verificar_e_criar_notificacoes,
+    )
+    from routes_financeiro import atualizar_resumos_recentes
+
+    agendador = Agendador(app)
+    agendador.registrar(
+        "verificar_notificacoes",
+        verificar_e_criar_notificacoes,
+        app.config["INTERVALO_VERIFICAR_NOTIFICACOES"],
+    )
+    agendador.registrar(
+        "retencao_notificacoes",
+        lambda: aplicar_retencao_notificacoes(app.config["RETENCAO_NOTIFICACOES_DIAS"]),
+        app.config["INTERVALO_RETENCAO_NOTIFICACOES"],
+    )
+    agendador.registrar(
+        "resumo_financeiro",
+        lambda: atualizar_resumos_recentes(app.config["RESUMO_FINANCEIRO_DIAS_RECENTES"]),
+        app.config["INTERVALO_RESUMO_FINANCEIRO"],
+    )
+    agendador.registrar(
+        "limpar_cache_ia",
+        cache_respostas_ia.limpar_persistente,
+        app.config["INTERVALO_LIMPEZA_CACHE_IA"],
+    )
+    agendador.registrar(
+        "limpar_conversas_ia",
+        conversas_ia.limpar_expiradas,
+        app.config["INTERVALO_LIMPEZA_CONVERSAS_IA"],
+    )
+    app.extensions["agendador"] = agendador
+    if servicos_em_segundo_plano and app.config["AGENDADOR_ATIVO"]:
+        agendador.iniciar()
 
     @app.get("/api/health")
     def health_check():
         return {"status": "ok"}
 
+    @app.get("/api/agendador/tarefas")
+    @login_required
+    def listar_tarefas_agendadas():
+        """Última execução, duração e próxima execução de cada tarefa agendada."""
+        registros = {t.nome: t for t in TarefaAgendada.query.all()}
+        return jsonify(
+            [
+                tarefa_to_dict(
+                    registros.get(nome) or TarefaAgendada(nome=nome), intervalo
+                )
+                for nome, (_, intervalo) in agendador.tarefas.items()
+            ]
+        )
+
     # Rota para verificação automática de notificações
     @app.post("/api/notificacoes/verificar")
     def verificar_notificacoes():
@@ -243,8 +362,16 @@ def create_app():
     return app
 
 
-app = create_app()
+def __getattr__(nome):
+    # Instância do servidor (app:app) criada só no primeiro acesso: scripts que
+    # importam create_app não sobem um segundo app com workers e agendador
+    if nome == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
 
 if __name__ == "__main__":
+    app = create_app()
     app.run(debug=True)
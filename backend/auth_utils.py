@@ -1,8 +1,12 @@
+import calendar
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 import jwt
 from flask import request, jsonify, g
+from sqlalchemy import event
 from werkzeug.security import check_password_hash
 
 from models import Usuario
@@ -12,6 +16,21 @@ JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "mude-esta-chave-jwt-em-producao")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Ticket do stream SSE: o EventSource não envia cabeçalhos, então o stream é
+# autenticado por um token de uso exclusivo e curta duração na URL, em vez do
+# token de sessão (que ficaria gravado nos logs de acesso)
+FINALIDADE_STREAM = "stream"
+STREAM_TICKET_SEGUNDOS = 60
+
+# Cache (por processo) do status dos usuários (ativo e última troca de
+# senha), evita uma consulta ao banco em toda requisição autenticada.
+# Alterações são refletidas em no máximo USUARIO_CACHE_TTL segundos em
+# outros workers.
+USUARIO_CACHE_TTL = int(os.getenv("USUARIO_CACHE_TTL", "60"))
+
+_usuarios_ativos_cache = {}  # usuario_id -> (ativo, senha_alterada_em, expira_em)
+_usuarios_ativos_lock = threading.Lock()
+
 
 def gerar_token_jwt(usuario_id, usuario_nome):
     """Gera um token JWT para o usuário."""
@@ -26,16 +45,96 @@ def gerar_token_jwt(usuario_id, usuario_nome):
     return token
 
 
-def verificar_token_jwt(token):
-    """Verifica e decodifica um token JWT."""
+def gerar_ticket_stream(payload_sessao):
+    """
+    Ticket para abrir o stream SSE, derivado do token de sessão já validado.
+    Vale STREAM_TICKET_SEGUNDOS para conectar; o stream em si é encerrado
+    quando o token de sessão expira (sessao_exp).
+    """
+    payload = {
+        "user_id": payload_sessao["user_id"],
+        "usuario": payload_sessao["usuario"],
+        "finalidade": FINALIDADE_STREAM,
+        "sessao_exp": payload_sessao["exp"],
+        "sessao_iat": payload_sessao["iat"],
+        "exp": datetime.utcnow() + timedelta(seconds=STREAM_TICKET_SEGUNDOS),
+        "iat": datetime.utcnow(),
+    }
+    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def _status_usuario(usuario_id):
+    """(ativo, senha_alterada_em em segundos UTC ou None), usando o cache com TTL."""
+    agora = time.monotonic()
+    with _usuarios_ativos_lock:
+        entrada = _usuarios_ativos_cache.get(usuario_id)
+    if entrada and entrada[2] > agora:
+        return entrada[:2]
+
+    usuario = Usuario.query.get(usuario_id)
+    ativo = bool(usuario and usuario.ativo)
+    senha_alterada_em = (
+        calendar.timegm(usuario.senha_alterada_em.utctimetuple())
+        if usuario and usuario.senha_alterada_em else None
+    )
+
+    with _usuarios_ativos_lock:
+        _usuarios_ativos_cache[usuario_id] = (ativo, senha_alterada_em, agora + USUARIO_CACHE_TTL)
+    return ativo, senha_alterada_em
+
+
+def usuario_esta_ativo(usuario_id):
+    """Retorna se o usuário existe e está ativo, usando o cache com TTL."""
+    return _status_usuario(usuario_id)[0]
+
+
+def sessao_valida(payload):
+    """
+    Retorna se a sessão do token continua válida: usuário ativo e senha não
+    alterada depois da emissão (iat do token de sessão; tickets levam o dele).
+    """
+    ativo, senha_alterada_em = _status_usuario(payload["user_id"])
+    if not ativo:
+        return False
+    emitido_em = payload.get("sessao_iat", payload["iat"])
+    return senha_alterada_em is None or emitido_em >= senha_alterada_em
+
+
+def invalidar_cache_usuario(usuario_id=None):
+    """Remove um usuário do cache (ou todos, se usuario_id for None)."""
+    with _usuarios_ativos_lock:
+        if usuario_id is None:
+            _usuarios_ativos_cache.clear()
+        else:
+            _usuarios_ativos_cache.pop(usuario_id, None)
+
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _invalidar_usuario_alterado(mapper, connection, target):
+    """Desativações, exclusões e trocas de senha feitas neste processo revogam o acesso na hora."""
+    invalidar_cache_usuario(target.id)
+
+
+def verificar_token_jwt(token, finalidade=None):
+    """
+    Verifica e decodifica um token JWT. Tokens de sessão não têm finalidade;
+    tickets (ex: FINALIDADE_STREAM) só valem onde essa finalidade é exigida.
+    """
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
 
+        if payload.get("finalidade") != finalidade:
+            raise jwt.InvalidTokenError("Finalidade do token inválida")
+
         # Verifica se o usuário ainda existe e está ativo
-        usuario = Usuario.query.get(payload["user_id"])
-        if not usuario or not usuario.ativo:
+        if not usuario_esta_ativo(payload["user_id"]):
             raise jwt.InvalidTokenError("Usuário inativo ou não encontrado")
 
+        # Tokens emitidos antes da última troca de senha
+        if not sessao_valida(payload):
+            raise jwt.InvalidTokenError("Senha alterada após a emissão do token")
+
         return payload
     except jwt.ExpiredSignatureError:
         raise jwt.InvalidTokenError("Token expirado")
@@ -71,6 +170,7 @@ def login_required(f):
             payload = verificar_token_jwt(token)
             g.usuario_id = payload["user_id"]
             g.usuario_nome = payload["usuario"]
+            g.token_payload = payload
         except jwt.InvalidTokenError as e:
             return jsonify({
                 "erro": "Token inválido",
@@ -0,0 +1,236 @@
+import re
+import threading
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models import Cliente, OrdemServico, ProdutoEstoque
+from similaridade_utils import normalizar_texto
+
+# Código de cada tipo de documento; o rowid do índice é ref_id * 4 + código,
+# então atualizar/remover um documento é uma operação por chave primária.
+TIPOS_BUSCA = {"cliente": 1, "os": 2, "produto": 3}
+TIPOS_POR_CODIGO = {codigo: tipo for tipo, codigo in TIPOS_BUSCA.items()}
+
+# Campos indexados de cada modelo (mudanças em outros campos não reindexam)
+CAMPOS_BUSCA = {
+    Cliente: ("nome", "cpf_cnpj", "telefone", "email"),
+    OrdemServico: ("numero_os", "imei_serial", "marca_modelo", "tipo_aparelho", "problema_relatado"),
+    ProdutoEstoque: ("codigo", "nome"),
+}
+
+MAX_TERMOS_BUSCA = 8
+LOTE_REINDEXACAO = 1000
+
+# Menor termo indexado pelo FULLTEXT do InnoDB (innodb_ft_min_token_size)
+MYSQL_TAMANHO_MINIMO_TERMO = 3
+
+DDL_INDICE_BUSCA = {
+    "sqlite": (
+        "CREATE VIRTUAL TABLE busca_fts USING fts5("
+        "titulo, texto, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+    ),
+    "mysql": (
+        "CREATE TABLE busca_fts ("
+        "id BIGINT NOT NULL PRIMARY KEY, "
+        "titulo VARCHAR(255) NOT NULL, "
+        "texto TEXT NOT NULL, "
+        "FULLTEXT KEY ft_busca_fts (titulo, texto)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    ),
+}
+
+# Chave do documento em cada banco (no FTS5 é o rowid da tabela virtual)
+COLUNA_ID = {"sqlite": "rowid", "mysql": "id"}
+
+
+def _digitos(valor) -> str:
+    return re.sub(r"\D", "", valor or "")
+
+
+def documento_busca(target) -> tuple:
+    """(rowid, titulo, texto) indexados para um cliente, OS ou produto."""
+    if isinstance(target, Cliente):
+        telefone = _digitos(target.telefone)
+        texto = [target.cpf_cnpj, _digitos(target.cpf_cnpj), telefone, target.email]
+        if len(telefone) >= 10:
+            texto.append(telefone[2:])  # Sem DDD
+        return target.id * 4 + TIPOS_BUSCA["cliente"], target.nome, texto
+
+    if isinstance(target, OrdemServico):
+        numero = _digitos(target.numero_os)
+        texto = [target.imei_serial, target.tipo_aparelho, target.problema_relatado]
+        titulo = f"{target.numero_os} {numero} {numero.lstrip('0')} {target.marca_modelo}"
+        return target.id * 4 + TIPOS_BUSCA["os"], titulo, texto
+
+    titulo = f"{target.codigo} {target.nome}"
+    return target.id * 4 + TIPOS_BUSCA["produto"], titulo, []
+
+
+def termos_busca(consulta: str) -> list:
+    """
+    Termos da consulta. CPF, telefone e IMEI digitados com pontuação viram um
+    único termo numérico (como estão no índice).
+    """
+    numerico = re.sub(r"[\s.\-/()#]", "", consulta or "")
+    if numerico.isdigit():
+        return [numerico]
+    return re.findall(r"\w+", normalizar_texto(consulta))[:MAX_TERMOS_BUSCA]
+
+
+class IndiceBusca:
+    """
+    Índice de texto completo sobre clientes, OS e produtos (tabela busca_fts):
+    - SQLite: tabela virtual FTS5, ranqueada por bm25;
+    - MySQL: tabela InnoDB com índice FULLTEXT, consultada em BOOLEAN MODE.
+    Os documentos são gravados pelos eventos de mapper na mesma conexão do
+    flush, então o índice acompanha o commit/rollback de cada escrita.
+    Outros bancos ficam sem índice (a busca responde 503).
+    """
+
+    def __init__(self):
+        self._ativo = {}  # url do banco -> índice disponível
+        self._lock = threading.Lock()
+
+    def preparar(self) -> bool:
+        """
+        Cria a tabela do índice se ainda não existir e a popula a partir dos
+        dados atuais. Retorna se o índice está disponível neste banco.
+        """
+        engine = db.engine
+        ddl = DDL_INDICE_BUSCA.get(engine.dialect.name)
+        disponivel = False
+        if ddl:
+            try:
+                if not inspect(engine).has_table("busca_fts"):
+                    with engine.begin() as conexao:
+                        conexao.execute(text(ddl))
+                    with engine.begin() as conexao:
+                        total = self.reindexar(conexao)
+                    print(f"Índice de busca criado: {total} documentos")
+                disponivel = True
+            except SQLAlchemyError as e:
+                print(f"Aviso: Índice de busca indisponível: {e}")
+        with self._lock:
+            self._ativo[str(engine.url)] = disponivel
+        return disponivel
+
+    def ativo(self, conexao) -> bool:
+        return self._ativo.get(str(conexao.engine.url), False)
+
+    def reindexar(self, conexao) -> int:
+        """Reconstrói todos os documentos. Retorna quantos foram indexados."""
+        conexao.execute(text("DELETE FROM busca_fts"))
+        total = 0
+        for modelo, campos in CAMPOS_BUSCA.items():
+            colunas = [getattr(modelo, campo) for campo in ("id", *campos)]
+            ultimo_id = 0
+            while True:
+                linhas = conexao.execute(
+                    db.select(*colunas)
+                    .where(modelo.id > ultimo_id)
+                    .order_by(modelo.id)
+                    .limit(LOTE_REINDEXACAO)
+                ).all()
+                if not linhas:
+                    break
+                self._gravar(conexao, [documento_busca(modelo(**l._asdict())) for l in linhas])
+                total += len(linhas)
+                ultimo_id = linhas[-1].id
+        return total
+
+    def indexar(self, conexao, target) -> None:
+        if not self.ativo(conexao):
+            return
+        self.remover(conexao, target)
+        self._gravar(conexao, [documento_busca(target)])
+
+    def remover(self, conexao, target) -> None:
+        if not self.ativo(conexao):
+            return
+        coluna = COLUNA_ID[conexao.dialect.name]
+        conexao.execute(
+            text(f"DELETE FROM busca_fts WHERE {coluna} = :id"),
+            {"id": documento_busca(target)[0]},
+        )
+
+    def buscar(self, conexao, consulta: str, tipos=None, limite=20, offset=0):
+        """
+        Documentos que contêm todos os termos (por prefixo), do mais relevante
+        para o menos. Retorna [(tipo, ref_id, pontuacao)] ou None sem índice.
+        """
+        if not self.ativo(conexao):
+            return None
+        termos = termos_busca(consulta)
+        coluna = COLUNA_ID[conexao.dialect.name]
+        filtro_tipo = ""
+        if tipos:
+            codigos = ", ".join(str(TIPOS_BUSCA[t]) for t in tipos)
+            filtro_tipo = f" AND {coluna} % 4 IN ({codigos})"
+
+        if conexao.dialect.name == "mysql":
+            termos = [t for t in termos if len(t) >= MYSQL_TAMANHO_MINIMO_TERMO]
+            if not termos:
+                return []
+            sql = (
+                "SELECT id AS rowid, MATCH(titulo, texto) AGAINST (:expr IN BOOLEAN MODE) AS pontuacao "
+                "FROM busca_fts WHERE MATCH(titulo, texto) AGAINST (:expr IN BOOLEAN MODE)"
+                + filtro_tipo
+                + " ORDER BY pontuacao DESC, id DESC LIMIT :limite OFFSET :offset"
+            )
+            expr = " ".join(f"+{t}*" for t in termos)
+        else:
+            if not termos:
+                return []
+            # Nome/número (título) pesa mais que os demais campos
+            sql = (
+                "SELECT rowid, -bm25(busca_fts, 10.0, 1.0) AS pontuacao "
+                "FROM busca_fts WHERE busca_fts MATCH :expr"
+                + filtro_tipo
+                + " ORDER BY bm25(busca_fts, 10.0, 1.0), rowid DESC LIMIT :limite OFFSET :offset"
+            )
+            expr = " ".join(f'"{t}"*' for t in termos)
+
+        linhas = conexao.execute(
+            text(sql), {"expr": expr, "limite": limite, "offset": offset}
+        ).all()
+        return [
+            (TIPOS_POR_CODIGO[linha.rowid % 4], linha.rowid // 4, float(linha.pontuacao))
+            for linha in linhas
+        ]
+
+    @staticmethod
+    def _gravar(conexao, documentos) -> None:
+        coluna = COLUNA_ID[conexao.dialect.name]
+        conexao.execute(
+            text(f"INSERT INTO busca_fts ({coluna}, titulo, texto) VALUES (:id, :titulo, :texto)"),
+            [
+                {"id": rowid, "titulo": titulo or "", "texto": " ".join(t for t in texto if t)}
+                for rowid, titulo, texto in documentos
+            ],
+        )
+
+
+indice_busca = IndiceBusca()
+
+
+# Mantém o índice na mesma transação das escritas (commit/rollback juntos)
+def _indexar_inserido(mapper, connection, target):
+    indice_busca.indexar(connection, target)
+
+
+def _indexar_alterado(mapper, connection, target):
+    estado = inspect(target)
+    if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_BUSCA[mapper.class_]):
+        indice_busca.indexar(connection, target)
+
+
+def _remover_do_indice(mapper, connection, target):
+    indice_busca.remover(connection, target)
+
+
+for _modelo in CAMPOS_BUSCA:
+    event.listen(_modelo, "after_insert", _indexar_inserido)
+    event.listen(_modelo, "after_update", _indexar_alterado)
+    event.listen(_modelo, "after_delete", _remover_do_indice)
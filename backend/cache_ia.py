@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from extensions import db
+from models import RespostaIACache
+
+
+class CacheRespostasIA:
+    """
+    Cache de respostas da IA endereçado pelo conteúdo (modelo + entradas
+    normalizadas), em duas camadas:
+    - memória: LRU por processo, com TTL;
+    - persistente: tabela cache_respostas_ia, compartilhada entre workers
+      (usada apenas com app context; lida/gravada em conexão própria para
+      não interferir na transação do chamador).
+    """
+
+    def __init__(self, max_memoria=500, ttl_segundos=7 * 86400, max_persistente=10000):
+        self.configurar(max_memoria, ttl_segundos, max_persistente)
+        self._memoria = OrderedDict()  # chave -> (expira_em, resposta)
+        self._lock = threading.Lock()
+        self._contadores = {"acertosMemoria": 0, "acertosPersistente": 0, "falhas": 0}
+
+    def configurar(self, max_memoria, ttl_segundos, max_persistente):
+        self.max_memoria = max_memoria
+        self.ttl_segundos = ttl_segundos
+        self.max_persistente = max_persistente
+
+    @staticmethod
+    def chave(modelo, funcao, *entradas) -> str:
+        bruto = "\x1f".join([modelo, funcao, *entradas])
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+    def obter(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item and item[0] > agora:
+                self._memoria.move_to_end(chave)
+                self._contadores["acertosMemoria"] += 1
+                return item[1]
+            self._memoria.pop(chave, None)
+
+        resposta = self._obter_persistente(chave)
+        with self._lock:
+            if resposta is None:
+                self._contadores["falhas"] += 1
+                return None
+            self._contadores["acertosPersistente"] += 1
+        self._guardar_memoria(chave, resposta)
+        return resposta
+
+    def guardar(self, chave, modelo, resposta) -> None:
+        self._guardar_memoria(chave, resposta)
+        if not has_app_context():
+            return
+        valores = {"modelo": modelo, "resposta": resposta, "criado_em": datetime.now()}
+        try:
+            try:
+                with db.engine.begin() as conexao:
+                    conexao.execute(insert(RespostaIACache).values(chave=chave, **valores))
+            except IntegrityError:
+                with db.engine.begin() as conexao:
+                    conexao.execute(
+                        update(RespostaIACache)
+                        .where(RespostaIACache.chave == chave)
+                        .values(**valores)
+                    )
+        except SQLAlchemyError as e:
+            print(f"Aviso: Não foi possível gravar no cache de IA: {e}")
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = sum(self._contadores.values())
+            acertos = self._contadores["acertosMemoria"] + self._contadores["acertosPersistente"]
+            return {
+                **self._contadores,
+                "taxaAcerto": acertos / total if total else 0,
+                "itensMemoria": len(self._memoria),
+            }
+
+    def limpar_persistente(self) -> int:
+        """Remove entradas expiradas e as mais antigas além do limite. Retorna removidas."""
+        limite = datetime.now() - timedelta(seconds=self.ttl_segundos)
+        with db.engine.begin() as conexao:
+            removidas = conexao.execute(
+                delete(RespostaIACache).where(RespostaIACache.criado_em < limite)
+            ).rowcount
+            corte = conexao.execute(
+                select(RespostaIACache.criado_em)
+                .order_by(RespostaIACache.criado_em.desc())
+                .offset(self.max_persistente)
+                .limit(1)
+            ).scalar()
+            if corte is not None:
+                removidas += conexao.execute(
+                    delete(RespostaIACache).where(RespostaIACache.criado_em <= corte)
+                ).rowcount
+        return removidas
+
+    def _guardar_memoria(self, chave, resposta):
+        with self._lock:
+            self._memoria[chave] = (time.monotonic() + self.ttl_segundos, resposta)
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def _obter_persistente(self, chave):
+        if not has_app_context():
+            return None
+        try:
+            with db.engine.connect() as conexao:
+                linha = conexao.execute(
+                    select(RespostaIACache.resposta, RespostaIACache.criado_em).where(
+                        RespostaIACache.chave == chave
+                    )
+                ).first()
+        except SQLAlchemyError as e:
+            print(f"Aviso: Não foi possível ler o cache de IA: {e}")
+            return None
+        if not linha or linha.criado_em < datetime.now() - timedelta(seconds=self.ttl_segundos):
+            return None
+        return linha.resposta
+
+
+cache_respostas_ia = CacheRespostasIA()
@@ -19,6 +19,39 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "mude-esta-chave-em-producao")
     MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
+    # Números de OS reservados por worker a cada ida ao banco (1 = sem lacunas)
+    OS_NUMERO_BLOCO = int(os.getenv("OS_NUMERO_BLOCO", "1"))
+
+    # Fila persistente de tarefas de IA (AI_WORKERS=0 deixa a fila para worker_ia.py)
+    AI_WORKERS = int(os.getenv("AI_WORKERS", "2"))
+    AI_TENTATIVAS = int(os.getenv("AI_TENTATIVAS", "3"))
+    AI_BACKOFF_SEGUNDOS = float(os.getenv("AI_BACKOFF_SEGUNDOS", "2"))
+
+    # Cache de respostas da IA (memória LRU + tabela cache_respostas_ia)
+    AI_CACHE_MAX_MEMORIA = int(os.getenv("AI_CACHE_MAX_MEMORIA", "500"))
+    AI_CACHE_MAX_PERSISTENTE = int(os.getenv("AI_CACHE_MAX_PERSISTENTE", "10000"))
+    AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 86400)))
+    INTERVALO_LIMPEZA_CACHE_IA = int(os.getenv("INTERVALO_LIMPEZA_CACHE_IA", "86400"))
+
+    # Sessões de conversa do assistente (PERSISTIR=1 usa a tabela conversas_ia)
+    CONVERSAS_IA_MAX = int(os.getenv("CONVERSAS_IA_MAX", "1000"))
+    CONVERSAS_IA_TTL = int(os.getenv("CONVERSAS_IA_TTL", "1800"))
+    CONVERSAS_IA_PERSISTIR = os.getenv("CONVERSAS_IA_PERSISTIR", "1") == "1"
+    INTERVALO_LIMPEZA_CONVERSAS_IA = int(os.getenv("INTERVALO_LIMPEZA_CONVERSAS_IA", "3600"))
+
+    # Casos similares no pré-diagnóstico (similaridade de cosseno, 0 a 1)
+    SIMILARIDADE_LIMIAR = float(os.getenv("SIMILARIDADE_LIMIAR", "0.75"))
+    SIMILARIDADE_TOP_K = int(os.getenv("SIMILARIDADE_TOP_K", "3"))
+
+    # Agendador em segundo plano (intervalos em segundos; 0 desativa a tarefa)
+    AGENDADOR_ATIVO = os.getenv("AGENDADOR_ATIVO", "1") == "1"
+    INTERVALO_VERIFICAR_NOTIFICACOES = int(os.getenv("INTERVALO_VERIFICAR_NOTIFICACOES", "300"))
+    INTERVALO_RETENCAO_NOTIFICACOES = int(os.getenv("INTERVALO_RETENCAO_NOTIFICACOES", "86400"))
+    INTERVALO_RESUMO_FINANCEIRO = int(os.getenv("INTERVALO_RESUMO_FINANCEIRO", "3600"))
+    RETENCAO_NOTIFICACOES_DIAS = int(os.getenv("RETENCAO_NOTIFICACOES_DIAS", "90"))
+    # Dias recentes recalculados a cada atualização do resumo financeiro
+    RESUMO_FINANCEIRO_DIAS_RECENTES = int(os.getenv("RESUMO_FINANCEIRO_DIAS_RECENTES", "7"))
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,97 @@
+"""
+Fixtures dos testes automatizados (python -m pytest, na pasta backend): app
+com banco SQLite temporário, sem agendador nem workers de IA, e tabelas
+limpas a cada teste. Dependências: pip install -r requirements-dev.txt.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+_pasta_testes = tempfile.mkdtemp(prefix="assistencia-testes-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_pasta_testes, 'testes.db')}"
+os.environ["AGENDADOR_ATIVO"] = "0"
+os.environ["AI_WORKERS"] = "0"
+
+# Scripts manuais: exigem o servidor rodando (requests) ou a API da IA
+collect_ignore = ["test_ai.py", "test_api.py", "test_auth.py", "test_financeiro.py"]
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+
+    return create_app(servicos_em_segundo_plano=False)
+
+
+@pytest.fixture(autouse=True)
+def banco_limpo(app):
+    from sqlalchemy import text
+
+    from auth_utils import invalidar_cache_usuario
+    from extensions import db
+
+    with app.app_context():
+        yield
+        db.session.remove()
+        with db.engine.begin() as conexao:
+            for tabela in reversed(db.metadata.sorted_tables):
+                conexao.execute(tabela.delete())
+            conexao.execute(text("DELETE FROM busca_fts"))
+        invalidar_cache_usuario()  # Os ids dos usuários se repetem entre testes
+
+
+@pytest.fixture
+def cliente_http(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def usuario():
+    from extensions import db
+    from models import Usuario
+
+    usuario = Usuario(usuario="tecnico", nome="Técnico", senha_hash="x")
+    db.session.add(usuario)
+    db.session.commit()
+    return usuario
+
+
+@pytest.fixture
+def cabecalhos(usuario):
+    from auth_utils import gerar_token_jwt
+
+    return {"Authorization": f"Bearer {gerar_token_jwt(usuario.id, usuario.usuario)}"}
+
+
+@pytest.fixture
+def criar_cliente(cliente_http, cabecalhos):
+    contador = iter(range(1, 10_000))
+
+    def criar(**campos):
+        numero = next(contador)
+        dados = {"nome": f"Cliente {numero}", "cpfCnpj": f"{numero:011d}", "telefone": f"1199999{numero:04d}"}
+        dados.update(campos)
+        resposta = cliente_http.post("/api/clientes/", json=dados, headers=cabecalhos)
+        assert resposta.status_code == 201, resposta.get_json()
+        return resposta.get_json()
+
+    return criar
+
+
+@pytest.fixture
+def criar_os(cliente_http, cabecalhos):
+    def criar(cliente_id, **campos):
+        dados = {
+            "clienteId": cliente_id,
+            "tipoAparelho": "Celular",
+            "marcaModelo": "Samsung Galaxy A10",
+            "problemaRelatado": "Tela quebrada",
+        }
+        dados.update(campos)
+        resposta = cliente_http.post("/api/os/", json=dados, headers=cabecalhos)
+        assert resposta.status_code == 201, resposta.get_json()
+        return resposta.get_json()
+
+    return criar
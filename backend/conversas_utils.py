@@ -0,0 +1,104 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from extensions import db
+from models import ConversaIA
+
+
+class ArmazemConversas:
+    """
+    Sessões de conversa do assistente no servidor: o navegador envia só o
+    conversaId e o estado do fluxo (e as entidades já resolvidas) ficam aqui.
+    - Sem persistência: memória do processo, LRU limitada e com TTL.
+    - Com persistência: tabela conversas_ia (compartilhada entre workers),
+      lida e gravada em conexão própria; expiradas são removidas pelo agendador.
+    """
+
+    def __init__(self, max_conversas=1000, ttl_segundos=1800, persistir=False):
+        self.configurar(max_conversas, ttl_segundos, persistir)
+        self._memoria = OrderedDict()  # id -> (expira_em, usuario_id, conversa)
+        self._lock = threading.Lock()
+
+    def configurar(self, max_conversas, ttl_segundos, persistir):
+        self.max_conversas = max_conversas
+        self.ttl_segundos = ttl_segundos
+        self.persistir = persistir
+
+    @staticmethod
+    def nova() -> tuple:
+        return uuid.uuid4().hex, {"estado": None, "entidades": {}}
+
+    def obter(self, conversa_id, usuario_id):
+        """Conversa do usuário ou None (inexistente, expirada ou de outro usuário)."""
+        if self.persistir:
+            with db.engine.connect() as conexao:
+                linha = conexao.execute(
+                    select(ConversaIA.estado, ConversaIA.entidades).where(
+                        ConversaIA.id == conversa_id,
+                        ConversaIA.usuario_id == usuario_id,
+                        ConversaIA.expira_em > datetime.now(),
+                    )
+                ).first()
+            if not linha:
+                return None
+            return {"estado": linha.estado, "entidades": linha.entidades or {}}
+
+        with self._lock:
+            item = self._memoria.get(conversa_id)
+            if not item or item[0] <= time.monotonic() or item[1] != usuario_id:
+                return None
+            self._memoria.move_to_end(conversa_id)
+            return item[2]
+
+    def salvar(self, conversa_id, usuario_id, conversa) -> None:
+        if self.persistir:
+            valores = {
+                "estado": conversa["estado"],
+                "entidades": conversa["entidades"],
+                "expira_em": datetime.now() + timedelta(seconds=self.ttl_segundos),
+                "atualizado_em": datetime.now(),
+            }
+            with db.engine.begin() as conexao:
+                atualizadas = conexao.execute(
+                    update(ConversaIA)
+                    .where(ConversaIA.id == conversa_id, ConversaIA.usuario_id == usuario_id)
+                    .values(**valores)
+                ).rowcount
+                if not atualizadas:
+                    conexao.execute(
+                        insert(ConversaIA).values(
+                            id=conversa_id, usuario_id=usuario_id, criado_em=datetime.now(), **valores
+                        )
+                    )
+            return
+
+        with self._lock:
+            self._memoria[conversa_id] = (
+                time.monotonic() + self.ttl_segundos, usuario_id, conversa
+            )
+            self._memoria.move_to_end(conversa_id)
+            while len(self._memoria) > self.max_conversas:
+                self._memoria.popitem(last=False)
+
+    def limpar_expiradas(self) -> int:
+        """Remove conversas expiradas. Retorna quantas foram removidas."""
+        if self.persistir:
+            with db.engine.begin() as conexao:
+                return conexao.execute(
+                    delete(ConversaIA).where(ConversaIA.expira_em <= datetime.now())
+                ).rowcount
+
+        agora = time.monotonic()
+        with self._lock:
+            expiradas = [cid for cid, item in self._memoria.items() if item[0] <= agora]
+            for cid in expiradas:
+                del self._memoria[cid]
+        return len(expiradas)
+
+
+conversas_ia = ArmazemConversas()
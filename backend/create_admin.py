@@ -11,7 +11,7 @@ from werkzeug.security import generate_password_hash
 
 def criar_admin():
     """Cria usuário admin se não existir."""
-    app = create_app()
+    app = create_app(servicos_em_segundo_plano=False)
 
     with app.app_context():
         # Verifica se já existe usuário admin
@@ -0,0 +1,103 @@
+import json
+import queue
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+
+
+class HubEventos:
+    """
+    Publish/subscribe em memória (por processo) para entregar eventos aos
+    usuários conectados via Server-Sent Events.
+    Cada conexão recebe uma fila própria; filas cheias descartam eventos
+    (o cliente ressincroniza ao reconectar).
+
+    Só alcança conexões do mesmo processo. Com vários workers (gunicorn -w N)
+    ou várias máquinas, um evento publicado em um processo não chega aos
+    streams abertos nos outros: o heartbeat do stream relê o contador do
+    banco para limitar o atraso, mas a entrega imediata entre processos
+    exige um broker externo (ex.: Redis pub/sub ou LISTEN/NOTIFY do
+    PostgreSQL) repassando para o hub de cada processo.
+    """
+
+    TAMANHO_FILA = 100
+
+    def __init__(self):
+        self._assinantes = {}  # usuario_id -> set de filas
+        self._lock = threading.Lock()
+
+    def assinar(self, usuario_id: int) -> queue.Queue:
+        fila = queue.Queue(maxsize=self.TAMANHO_FILA)
+        with self._lock:
+            self._assinantes.setdefault(usuario_id, set()).add(fila)
+        return fila
+
+    def cancelar(self, usuario_id: int, fila: queue.Queue) -> None:
+        with self._lock:
+            filas = self._assinantes.get(usuario_id)
+            if filas:
+                filas.discard(fila)
+                if not filas:
+                    del self._assinantes[usuario_id]
+
+    def tem_assinantes(self, usuario_id: int) -> bool:
+        with self._lock:
+            return bool(self._assinantes.get(usuario_id))
+
+    def publicar(self, usuario_id: int, evento: str, dados: dict) -> None:
+        """Publica para um usuário; usuario_id=None publica para todos os conectados."""
+        with self._lock:
+            if usuario_id is None:
+                filas = [f for filas in self._assinantes.values() for f in filas]
+            else:
+                filas = list(self._assinantes.get(usuario_id, ()))
+        for fila in filas:
+            try:
+                fila.put_nowait((evento, dados))
+            except queue.Full:
+                pass
+
+
+hub_eventos = HubEventos()
+
+
+def formatar_sse(evento: str, dados: dict) -> str:
+    """Serializa um evento no formato text/event-stream."""
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+def publicar_apos_commit(usuario_id: int, evento: str, dados_fn) -> None:
+    """
+    Agenda a publicação de um evento para depois do commit da sessão atual
+    (usuario_id=None para todos os usuários).
+    `dados_fn` é chamada logo antes do commit (com os ids já gerados) e deve
+    retornar o dicionário do evento. Em rollback, nada é publicado.
+    """
+    db.session.info.setdefault("eventos_pendentes", []).append(
+        (usuario_id, evento, dados_fn)
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _serializar_eventos(session):
+    pendentes = session.info.pop("eventos_pendentes", None)
+    if pendentes:
+        session.flush()
+        session.info.setdefault("eventos_prontos", []).extend(
+            (usuario_id, evento, dados_fn()) for usuario_id, evento, dados_fn in pendentes
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _publicar_eventos(session):
+    for usuario_id, evento, dados in session.info.pop("eventos_prontos", []):
+        hub_eventos.publicar(usuario_id, evento, dados)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_eventos(session):
+    session.info.pop("eventos_pendentes", None)
+    session.info.pop("eventos_prontos", None)
@@ -0,0 +1,175 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, update
+
+from extensions import db
+from models import TarefaIA
+
+
+class FilaTarefasIA:
+    """
+    Fila persistente (tabela tarefas_ia) para chamadas de IA em segundo plano.
+    - Tarefas são gravadas na mesma transação da OS e sobrevivem a reinícios.
+    - Cada worker reivindica uma tarefa por UPDATE condicional na linha, então
+      vários workers (threads ou processos worker_ia.py) podem drenar a fila
+      sem executar a mesma tarefa duas vezes.
+    - Falhas voltam para a fila com backoff exponencial até o limite de
+      tentativas; travas de workers mortos expiram e a tarefa é retomada.
+    """
+
+    # Tempo máximo que um worker mantém a tarefa antes de outro poder retomá-la
+    DURACAO_TRAVA = timedelta(minutes=10)
+
+    # Threads de worker iniciadas uma vez por processo
+    _iniciada_no_processo = False
+    _lock_processo = threading.Lock()
+
+    def __init__(self, app, workers=2, tentativas=3, backoff=2.0, intervalo_ociosa=2.0):
+        self.app = app
+        self.workers = workers
+        self.tentativas = tentativas
+        self.backoff = backoff
+        self.intervalo_ociosa = intervalo_ociosa
+        self.handlers = {}  # tipo -> funcao(os_id) que retorna o texto gerado
+        self.identificador = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def registrar(self, tipo, funcao):
+        self.handlers[tipo] = funcao
+
+    def enfileirar(self, tipo, os_id) -> TarefaIA:
+        """
+        Adiciona a tarefa à sessão atual (o chamador faz o commit e, depois,
+        chama acordar()). Não duplica tarefas ainda pendentes da mesma OS.
+        """
+        existente = TarefaIA.query.filter(
+            TarefaIA.tipo == tipo,
+            TarefaIA.os_id == os_id,
+            TarefaIA.status.in_(("pendente", "executando")),
+        ).first()
+        if existente:
+            return existente
+
+        tarefa = TarefaIA(tipo=tipo, os_id=os_id, status="pendente", disponivel_em=datetime.now())
+        db.session.add(tarefa)
+        return tarefa
+
+    def acordar(self):
+        """Avisa os workers deste processo que há tarefa nova."""
+        self._acordar.set()
+
+    def iniciar(self):
+        if self.workers <= 0 or not self.handlers:
+            return
+        with FilaTarefasIA._lock_processo:
+            if FilaTarefasIA._iniciada_no_processo:
+                return
+            FilaTarefasIA._iniciada_no_processo = True
+        for i in range(self.workers):
+            threading.Thread(target=self.executar_worker, name=f"ia-worker-{i}", daemon=True).start()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def executar_worker(self):
+        """Loop de um worker; também usado pelo processo dedicado worker_ia.py."""
+        # Aguarda antes da primeira busca (scripts curtos encerram antes)
+        self._acordar.wait(self.intervalo_ociosa)
+        while not self._parar.is_set():
+            processou = False
+            with self.app.app_context():
+                try:
+                    processou = self.processar_proxima()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Erro no worker de IA: {e}")
+                finally:
+                    db.session.remove()
+            if not processou:
+                self._acordar.wait(self.intervalo_ociosa)
+                self._acordar.clear()
+
+    def _disponivel(self, agora):
+        return or_(
+            and_(TarefaIA.status == "pendente", TarefaIA.disponivel_em <= agora),
+            and_(TarefaIA.status == "executando", TarefaIA.bloqueado_ate < agora),
+        )
+
+    def processar_proxima(self) -> bool:
+        """Reivindica e executa a tarefa disponível mais antiga. Retorna se executou."""
+        agora = datetime.now()
+        candidatas = (
+            db.session.query(TarefaIA.id)
+            .filter(self._disponivel(agora))
+            .order_by(TarefaIA.id)
+            .limit(5)
+            .all()
+        )
+        for (tarefa_id,) in candidatas:
+            resultado = db.session.execute(
+                update(TarefaIA)
+                .where(TarefaIA.id == tarefa_id, self._disponivel(agora))
+                .values(
+                    status="executando",
+                    tentativas=TarefaIA.tentativas + 1,
+                    bloqueado_por=self.identificador,
+                    bloqueado_ate=agora + self.DURACAO_TRAVA,
+                )
+            )
+            db.session.commit()
+            if resultado.rowcount == 1:
+                self._executar(tarefa_id)
+                return True
+        return False
+
+    def _executar(self, tarefa_id):
+        tarefa = db.session.get(TarefaIA, tarefa_id)
+        tipo, os_id, tentativa = tarefa.tipo, tarefa.os_id, tarefa.tentativas
+        valores = {"bloqueado_por": None, "bloqueado_ate": None}
+
+        try:
+            if tentativa > self.tentativas:
+                raise RuntimeError("Limite de tentativas excedido (worker interrompido)")
+            funcao = self.handlers.get(tipo)
+            if not funcao:
+                raise RuntimeError(f"Tipo de tarefa desconhecido: {tipo}")
+            valores.update(status="concluida", resultado=funcao(os_id), ultimo_erro=None)
+        except Exception as e:
+            db.session.rollback()
+            valores["ultimo_erro"] = str(e)
+            if tentativa >= self.tentativas:
+                valores["status"] = "falhou"
+                print(f"Aviso: Tarefa de IA {tipo} da OS {os_id} falhou: {e}")
+            else:
+                valores["status"] = "pendente"
+                valores["disponivel_em"] = datetime.now() + timedelta(
+                    seconds=self.backoff * 2 ** (tentativa - 1)
+                )
+
+        db.session.execute(
+            update(TarefaIA)
+            .where(TarefaIA.id == tarefa_id, TarefaIA.bloqueado_por == self.identificador)
+            .values(**valores)
+        )
+        db.session.commit()
+
+
+def tarefa_ia_to_dict(tarefa: TarefaIA) -> dict:
+    return {
+        "id": tarefa.id,
+        "tipo": tarefa.tipo,
+        "osId": tarefa.os_id,
+        "status": tarefa.status,
+        "tentativas": tarefa.tentativas,
+        "resultado": tarefa.resultado,
+        "ultimoErro": tarefa.ultimo_erro,
+        "disponivelEm": tarefa.disponivel_em.isoformat() if tarefa.disponivel_em else None,
+        "criadoEm": tarefa.criado_em.isoformat() if tarefa.criado_em else None,
+        "atualizadoEm": tarefa.atualizado_em.isoformat() if tarefa.atualizado_em else None,
+    }
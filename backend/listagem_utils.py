@@ -0,0 +1,103 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import Response, abort, stream_with_context
+from sqlalchemy import Select, and_, or_
+
+from extensions import db
+
+# Paginação por keyset (parâmetro `limite` das listagens)
+LIMITE_PADRAO_PAGINA = 50
+LIMITE_MAXIMO_PAGINA = 200
+
+# Linhas lidas do banco por vez (yield_per; cursor no servidor no MySQL)
+LOTE_STREAM = 1000
+
+# Tamanho aproximado de cada trecho enviado ao cliente
+TAMANHO_TRECHO = 64 * 1024
+
+
+def codificar_cursor(registro) -> str:
+    """
+    Gera o cursor opaco (criado_em + id) usado na paginação por keyset.
+    Registros antigos sem criado_em geram cursor com a data vazia.
+    """
+    data = registro.criado_em.isoformat() if registro.criado_em else ""
+    bruto = f"{data}|{registro.id}"
+    return base64.urlsafe_b64encode(bruto.encode()).decode()
+
+
+def decodificar_cursor(cursor: str) -> tuple:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor.encode()).decode()
+        data_str, id_str = bruto.rsplit("|", 1)
+        return (datetime.fromisoformat(data_str) if data_str else None), int(id_str)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        abort(400, description="Cursor de paginação inválido")
+
+
+def ordem_keyset(coluna_data, coluna_id) -> tuple:
+    """
+    ORDER BY da paginação: criado_em DESC com os nulos por último, depois id
+    DESC. SQLite e MySQL já põem NULL por último no DESC (e usam o índice
+    (criado_em, id)); o PostgreSQL põe primeiro, então lá o NULLS LAST é
+    explícito. filtro_apos_cursor depende dessa ordem.
+    """
+    if db.engine.dialect.name == "postgresql":
+        return coluna_data.desc().nulls_last(), coluna_id.desc()
+    return coluna_data.desc(), coluna_id.desc()
+
+
+def filtro_apos_cursor(coluna_data, coluna_id, criado_em, ref_id):
+    """
+    Registros depois do cursor na ordem de ordem_keyset (criado_em DESC com
+    os nulos por último, id DESC).
+    """
+    if criado_em is None:
+        return and_(coluna_data.is_(None), coluna_id < ref_id)
+    return or_(
+        coluna_data < criado_em,
+        and_(coluna_data == criado_em, coluna_id < ref_id),
+        coluna_data.is_(None),
+    )
+
+
+def _linhas_em_lotes(consulta):
+    if isinstance(consulta, Select):
+        return db.session.execute(consulta.execution_options(yield_per=LOTE_STREAM))
+    return consulta.yield_per(LOTE_STREAM)
+
+
+def _array_json(consulta, serializar):
+    # O "[" sai antes da consulta: o primeiro byte não depende do tamanho da tabela
+    yield "["
+    linhas = _linhas_em_lotes(consulta)
+    partes, tamanho, primeiro = [], 0, True
+    for linha in linhas:
+        parte = json.dumps(serializar(linha), ensure_ascii=False)
+        if not primeiro:
+            parte = "," + parte
+        primeiro = False
+        partes.append(parte)
+        tamanho += len(parte)
+        if tamanho >= TAMANHO_TRECHO:
+            yield "".join(partes)
+            partes, tamanho = [], 0
+    partes.append("]")
+    yield "".join(partes)
+
+
+def resposta_json_stream(consulta, serializar) -> Response:
+    """
+    Resposta com um array JSON escrito item a item enquanto as linhas são
+    lidas em lotes, sem montar a lista de objetos/dicts nem a string inteira.
+    `consulta` é uma Query do ORM ou um select() do Core (executado só
+    durante o envio) e `serializar` converte cada linha em dict.
+    Erros no meio do envio truncam a resposta (o status 200 já foi enviado).
+    """
+    return Response(
+        stream_with_context(_array_json(consulta, serializar)),
+        mimetype="application/json",
+    )
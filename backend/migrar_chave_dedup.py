@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Script de migração da chave de deduplicação das notificações.
+Adiciona a coluna notificacoes.chave_dedup (e seu índice único) em bancos
+criados antes dela. As notificações antigas ficam sem chave; a próxima
+verificação automática grava as chaves das condições ainda ativas.
+Pode ser executado mais de uma vez.
+
+Uso: python migrar_chave_dedup.py
+"""
+
+from sqlalchemy import Index, inspect, text
+
+from app import create_app
+from extensions import db
+from models import Notificacao
+
+
+def adicionar_coluna_chave_dedup():
+    """Cria a coluna e o índice único se ainda não existirem. Retorna se criou."""
+    colunas = {c["name"] for c in inspect(db.engine).get_columns("notificacoes")}
+    if "chave_dedup" in colunas:
+        return False
+
+    coluna = Notificacao.__table__.c.chave_dedup
+    # Índice único (e não UNIQUE na coluna): o SQLite não aceita ADD COLUMN ... UNIQUE
+    indice = Index("uq_notificacoes_chave_dedup", coluna, unique=True)
+    with db.engine.begin() as conexao:
+        tipo = coluna.type.compile(dialect=conexao.dialect)
+        conexao.execute(text(f"ALTER TABLE notificacoes ADD COLUMN chave_dedup {tipo}"))
+        indice.create(conexao)
+    return True
+
+
+def main():
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        if adicionar_coluna_chave_dedup():
+            print("✅ Coluna notificacoes.chave_dedup criada")
+        else:
+            print("✅ Coluna notificacoes.chave_dedup já existe")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Script de migração dos contadores de notificações dos usuários.
+Adiciona as colunas usuarios.notificacoes_nao_lidas e
+usuarios.notificacoes_lidas_ate (NOT NULL DEFAULT 0) em bancos criados antes
+delas e recalcula o contador de não lidas. Pode ser executado mais de uma vez.
+
+Execute antes de iniciar o servidor: toda consulta a Usuario lê essas colunas.
+
+Uso: python migrar_contadores_notificacoes.py
+"""
+
+from sqlalchemy import create_engine, inspect, text
+
+from app import create_app
+from config import Config
+from models import Usuario
+from routes_notificacoes import reconciliar_contadores_nao_lidas
+
+COLUNAS_CONTADORES = ("notificacoes_nao_lidas", "notificacoes_lidas_ate")
+
+
+def adicionar_colunas_contadores(engine):
+    """
+    Cria as colunas que ainda não existirem. Usa uma engine própria, sem a
+    aplicação, porque create_app já poderia consultar usuarios.
+    Retorna os nomes das colunas criadas.
+    """
+    colunas = {c["name"] for c in inspect(engine).get_columns("usuarios")}
+    criadas = []
+    with engine.begin() as conexao:
+        for nome in COLUNAS_CONTADORES:
+            if nome in colunas:
+                continue
+            tipo = Usuario.__table__.c[nome].type.compile(dialect=conexao.dialect)
+            conexao.execute(text(f"ALTER TABLE usuarios ADD COLUMN {nome} {tipo} NOT NULL DEFAULT 0"))
+            criadas.append(nome)
+    return criadas
+
+
+def main():
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+    try:
+        for nome in adicionar_colunas_contadores(engine):
+            print(f"✅ Coluna usuarios.{nome} criada")
+    finally:
+        engine.dispose()
+
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        corrigidos = reconciliar_contadores_nao_lidas()
+        print(f"✅ Contadores recalculados: {corrigidos} usuários corrigidos")
+
+
+if __name__ == '__main__':
+    main()
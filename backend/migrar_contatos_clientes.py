@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Script de migração da normalização de contatos dos clientes.
+Adiciona a coluna clientes.telefone_normalizado (e seu índice) em bancos
+criados antes dela e preenche telefone_normalizado e o CPF/CNPJ só com dígitos.
+Pode ser executado mais de uma vez.
+
+Uso: python migrar_contatos_clientes.py
+"""
+
+from sqlalchemy import inspect, text
+
+from app import create_app
+from extensions import db
+from models import Cliente
+from routes_clientes import preencher_contatos_normalizados
+
+
+def adicionar_coluna_telefone_normalizado():
+    """Cria a coluna e o índice se ainda não existirem. Retorna se criou."""
+    colunas = {c["name"] for c in inspect(db.engine).get_columns("clientes")}
+    if "telefone_normalizado" in colunas:
+        return False
+
+    coluna = Cliente.__table__.c.telefone_normalizado
+    indice = next(
+        i for i in Cliente.__table__.indexes if i.name == "ix_clientes_telefone_normalizado"
+    )
+    with db.engine.begin() as conexao:
+        tipo = coluna.type.compile(dialect=conexao.dialect)
+        conexao.execute(text(f"ALTER TABLE clientes ADD COLUMN telefone_normalizado {tipo}"))
+        indice.create(conexao)
+    return True
+
+
+def main():
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        if adicionar_coluna_telefone_normalizado():
+            print("✅ Coluna clientes.telefone_normalizado criada")
+
+        atualizados, conflitos = preencher_contatos_normalizados()
+        print(f"✅ Contatos normalizados: {atualizados} clientes atualizados")
+
+        for cliente_id, cpf_cnpj in conflitos:
+            print(f"⚠️  Cliente {cliente_id}: CPF/CNPJ '{cpf_cnpj}' não normalizado (duplicado ou inválido)")
+
+
+if __name__ == '__main__':
+    main()
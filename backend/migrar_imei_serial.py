@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Script de migração do IMEI/serial normalizado das OS.
+Adiciona a coluna ordens_servico.imei_serial_normalizado (e seu índice) em
+bancos criados antes dela e preenche o valor das OS existentes.
+Pode ser executado mais de uma vez.
+
+Uso: python migrar_imei_serial.py
+"""
+
+from sqlalchemy import inspect, text
+
+from app import create_app
+from extensions import db
+from models import OrdemServico
+from routes_dispositivos import preencher_imei_serial_normalizado
+
+
+def adicionar_coluna_imei_serial_normalizado():
+    """Cria a coluna e o índice se ainda não existirem. Retorna se criou."""
+    colunas = {c["name"] for c in inspect(db.engine).get_columns("ordens_servico")}
+    if "imei_serial_normalizado" in colunas:
+        return False
+
+    coluna = OrdemServico.__table__.c.imei_serial_normalizado
+    indice = next(
+        i for i in OrdemServico.__table__.indexes
+        if i.name == "ix_ordens_servico_imei_serial_normalizado_criado_em"
+    )
+    with db.engine.begin() as conexao:
+        tipo = coluna.type.compile(dialect=conexao.dialect)
+        conexao.execute(text(f"ALTER TABLE ordens_servico ADD COLUMN imei_serial_normalizado {tipo}"))
+        indice.create(conexao)
+    return True
+
+
+def main():
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        if adicionar_coluna_imei_serial_normalizado():
+            print("✅ Coluna ordens_servico.imei_serial_normalizado criada")
+
+        preencher_imei_serial_normalizado()
+        print("✅ IMEI/serial normalizado preenchido")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Script de migração das notificações gerais.
+Torna notificacoes.usuario_id opcional (NULL = notificação geral, visível a
+todos os usuários) em bancos criados quando a coluna era NOT NULL.
+Pode ser executado mais de uma vez.
+
+Uso: python migrar_notificacoes_gerais.py
+"""
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import inspect
+
+from app import create_app
+from extensions import db
+
+
+def permitir_usuario_id_nulo():
+    """
+    Remove o NOT NULL de notificacoes.usuario_id. No MySQL/PostgreSQL vira um
+    ALTER TABLE; o SQLite não altera colunas, então o Alembic recria a tabela
+    copiando os dados. Retorna se alterou.
+    """
+    coluna = next(
+        c for c in inspect(db.engine).get_columns("notificacoes") if c["name"] == "usuario_id"
+    )
+    if coluna["nullable"]:
+        return False
+
+    with db.engine.begin() as conexao:
+        operacoes = Operations(MigrationContext.configure(conexao))
+        with operacoes.batch_alter_table("notificacoes") as tabela:
+            tabela.alter_column("usuario_id", existing_type=db.Integer(), nullable=True)
+    return True
+
+
+def main():
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        if permitir_usuario_id_nulo():
+            print("✅ Coluna notificacoes.usuario_id agora aceita NULL")
+        else:
+            print("✅ Coluna notificacoes.usuario_id já aceita NULL")
+
+
+if __name__ == '__main__':
+    main()
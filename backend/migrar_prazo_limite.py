@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Script de migração do prazo limite das OS.
+Adiciona a coluna ordens_servico.prazo_limite (e seu índice) em bancos
+criados antes dela e preenche o valor das OS existentes.
+Pode ser executado mais de uma vez.
+
+Uso: python migrar_prazo_limite.py
+"""
+
+from sqlalchemy import inspect, text
+
+from app import create_app
+from extensions import db
+from models import OrdemServico
+from routes_notificacoes import preencher_prazos_limite
+
+
+def adicionar_coluna_prazo_limite():
+    """Cria a coluna e o índice se ainda não existirem. Retorna se criou."""
+    colunas = {c["name"] for c in inspect(db.engine).get_columns("ordens_servico")}
+    if "prazo_limite" in colunas:
+        return False
+
+    coluna = OrdemServico.__table__.c.prazo_limite
+    indice = next(
+        i for i in OrdemServico.__table__.indexes
+        if list(i.columns) == [coluna]
+    )
+    with db.engine.begin() as conexao:
+        tipo = coluna.type.compile(dialect=conexao.dialect)
+        conexao.execute(text(f"ALTER TABLE ordens_servico ADD COLUMN prazo_limite {tipo}"))
+        indice.create(conexao)
+    return True
+
+
+def main():
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        if adicionar_coluna_prazo_limite():
+            print("✅ Coluna ordens_servico.prazo_limite criada")
+
+        preencher_prazos_limite()
+        print("✅ Prazos limite preenchidos")
+
+
+if __name__ == '__main__':
+    main()
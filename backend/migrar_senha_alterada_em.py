@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Script de migração da data de troca de senha dos usuários.
+Adiciona a coluna usuarios.senha_alterada_em em bancos criados antes dela.
+Usuários existentes ficam com NULL (nenhum token revogado).
+Pode ser executado mais de uma vez.
+
+Execute antes de iniciar o servidor: toda consulta a Usuario lê essa coluna.
+
+Uso: python migrar_senha_alterada_em.py
+"""
+
+from sqlalchemy import create_engine, inspect, text
+
+from config import Config
+from models import Usuario
+
+
+def adicionar_coluna_senha_alterada_em(engine):
+    """
+    Cria a coluna se ainda não existir. Usa uma engine própria, sem a
+    aplicação, porque create_app já poderia consultar usuarios.
+    Retorna se criou.
+    """
+    colunas = {c["name"] for c in inspect(engine).get_columns("usuarios")}
+    if "senha_alterada_em" in colunas:
+        return False
+
+    with engine.begin() as conexao:
+        tipo = Usuario.__table__.c.senha_alterada_em.type.compile(dialect=conexao.dialect)
+        conexao.execute(text(f"ALTER TABLE usuarios ADD COLUMN senha_alterada_em {tipo}"))
+    return True
+
+
+def main():
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+    try:
+        if adicionar_coluna_senha_alterada_em(engine):
+            print("✅ Coluna usuarios.senha_alterada_em criada")
+        else:
+            print("✅ Coluna usuarios.senha_alterada_em já existe")
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from datetime import datetime
+import re
+from datetime import datetime, timedelta
 
 from extensions import db
 
@@ -12,6 +13,11 @@ class TimestampMixin:
 
 class Cliente(TimestampMixin, db.Model):
     __tablename__ = "clientes"
+    __table_args__ = (
+        db.Index("ix_clientes_atualizado_em", "atualizado_em"),
+        # Paginação por keyset em listar_clientes (ORDER BY criado_em DESC, id DESC)
+        db.Index("ix_clientes_criado_em_id", "criado_em", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(150), nullable=False, index=True)
@@ -20,6 +26,8 @@ class Cliente(TimestampMixin, db.Model):
     endereco = db.Column(db.String(200))
     email = db.Column(db.String(120), index=True)
     telefone = db.Column(db.String(20), nullable=False)
+    # Telefone só com dígitos (DDD + número), mantido pelos eventos de Cliente
+    telefone_normalizado = db.Column(db.String(20), index=True)
     observacoes = db.Column(db.Text)
     status = db.Column(db.String(20), nullable=False, default="ativo", index=True)
 
@@ -28,8 +36,42 @@ class Cliente(TimestampMixin, db.Model):
     )
 
 
+def normalizar_cpf_cnpj(valor) -> str:
+    """CPF/CNPJ só com dígitos (forma gravada em Cliente.cpf_cnpj)."""
+    return re.sub(r"\D", "", valor or "")
+
+
+def normalizar_telefone(valor):
+    """
+    Telefone só com dígitos, sem o prefixo de operadora (0) e sem o código do
+    país (55), para que "+55 (11) 98765-4321" e "11987654321" coincidam.
+    """
+    digitos = re.sub(r"\D", "", valor or "").lstrip("0")
+    if digitos.startswith("55") and len(digitos) in (12, 13):
+        digitos = digitos[2:]
+    return digitos or None
+
+
+@db.event.listens_for(Cliente, "before_insert")
+def _normalizar_contatos_cliente_novo(mapper, connection, target):
+    target.cpf_cnpj = normalizar_cpf_cnpj(target.cpf_cnpj)
+    target.telefone_normalizado = normalizar_telefone(target.telefone)
+
+
+@db.event.listens_for(Cliente, "before_update")
+def _normalizar_contatos_cliente(mapper, connection, target):
+    # CPF/CNPJ só quando foi alterado: clientes antigos com pontuação que
+    # colidem com outro após normalizar continuam editáveis nos demais campos
+    if db.inspect(target).attrs.cpf_cnpj.history.has_changes():
+        target.cpf_cnpj = normalizar_cpf_cnpj(target.cpf_cnpj)
+    target.telefone_normalizado = normalizar_telefone(target.telefone)
+
+
 class ProdutoEstoque(TimestampMixin, db.Model):
     __tablename__ = "produtos_estoque"
+    __table_args__ = (
+        db.Index("ix_produtos_estoque_atualizado_em", "atualizado_em"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(20), nullable=False, unique=True)
@@ -46,6 +88,18 @@ class ProdutoEstoque(TimestampMixin, db.Model):
 
 class OrdemServico(TimestampMixin, db.Model):
     __tablename__ = "ordens_servico"
+    __table_args__ = (
+        # Paginação por keyset em listar_os (ORDER BY criado_em DESC, id DESC)
+        db.Index("ix_ordens_servico_criado_em_id", "criado_em", "id"),
+        # Varredura incremental de notificações (alterações desde o checkpoint)
+        db.Index("ix_ordens_servico_atualizado_em", "atualizado_em"),
+        # Histórico do aparelho (WHERE imei_serial_normalizado = ? ORDER BY criado_em DESC)
+        db.Index(
+            "ix_ordens_servico_imei_serial_normalizado_criado_em",
+            "imei_serial_normalizado",
+            "criado_em",
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     numero_os = db.Column(db.String(20), nullable=False, unique=True, index=True)
@@ -56,12 +110,17 @@ class OrdemServico(TimestampMixin, db.Model):
     tipo_aparelho = db.Column(db.String(50), nullable=False)
     marca_modelo = db.Column(db.String(100), nullable=False)
     imei_serial = db.Column(db.String(100))
+    # Identidade do aparelho (IMEI/serial sem separadores, em maiúsculas), mantida por
+    # _normalizar_imei_serial
+    imei_serial_normalizado = db.Column(db.String(100))
     cor_aparelho = db.Column(db.String(50))
 
     problema_relatado = db.Column(db.String(400), nullable=False)
     diagnostico_tecnico = db.Column(db.String(400))
 
     prazo_estimado = db.Column(db.Integer, nullable=False, default=3)
+    # criado_em + prazo_estimado, mantido por _calcular_prazo_limite
+    prazo_limite = db.Column(db.DateTime, index=True)
     valor_orcamento = db.Column(db.Numeric(10, 2))
 
     status = db.Column(
@@ -74,11 +133,37 @@ class OrdemServico(TimestampMixin, db.Model):
         db.String(20),
         nullable=False,
         default="normal",  # baixa, normal, alta, urgente
+        index=True
     )
 
     observacoes = db.Column(db.Text)
 
 
+@db.event.listens_for(OrdemServico, "before_insert")
+@db.event.listens_for(OrdemServico, "before_update")
+def _calcular_prazo_limite(mapper, connection, target):
+    if target.criado_em is None:
+        target.criado_em = datetime.now()
+    target.prazo_limite = target.criado_em + timedelta(days=target.prazo_estimado or 3)
+
+
+def normalizar_imei_serial(valor):
+    """IMEI/serial só com letras e dígitos, em maiúsculas (None se vazio)."""
+    normalizado = re.sub(r"[^0-9A-Za-z]", "", valor or "").upper()
+    return normalizado or None
+
+
+@db.event.listens_for(OrdemServico, "before_insert")
+@db.event.listens_for(OrdemServico, "before_update")
+def _normalizar_imei_serial(mapper, connection, target):
+    # "" (e não None) para IMEIs informados sem letras/dígitos: o backfill só
+    # relê as OS com imei_serial preenchido e normalizado None
+    normalizado = normalizar_imei_serial(target.imei_serial)
+    if normalizado is None and target.imei_serial is not None:
+        normalizado = ""
+    target.imei_serial_normalizado = normalizado
+
+
 class Usuario(TimestampMixin, db.Model):
     __tablename__ = "usuarios"
 
@@ -90,6 +175,13 @@ class Usuario(TimestampMixin, db.Model):
     telefone = db.Column(db.String(20))
     email = db.Column(db.String(120), unique=True)
     ativo = db.Column(db.Boolean, default=True)
+    # Última troca de senha (UTC); tokens emitidos antes dela são recusados
+    senha_alterada_em = db.Column(db.DateTime)
+    # Contador desnormalizado das notificações pessoais não lidas; as gerais são
+    # contadas pela marca d'água abaixo (ver contar_gerais_nao_lidas)
+    notificacoes_nao_lidas = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # "Marcar todas como lidas": notificações gerais com id <= este valor contam como lidas
+    notificacoes_lidas_ate = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     # Relacionamento com notificações
     notificacoes = db.relationship(
@@ -107,6 +199,129 @@ class Notificacao(TimestampMixin, db.Model):
     dados_referencia = db.Column(db.JSON)  # Dados para link/ação (ex: {"os_id": 123})
     lida = db.Column(db.Boolean, default=False, index=True)
     prioridade = db.Column(db.String(20), default="normal")  # baixa, normal, alta, urgente
+    # Chave de deduplicação das notificações automáticas (ex: "os_atrasada:123")
+    chave_dedup = db.Column(db.String(100), unique=True)
 
-    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=False, index=True)
+    # None = notificação geral, armazenada uma única vez e visível a todos os usuários
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=True, index=True)
     usuario = db.relationship("Usuario", back_populates="notificacoes")
+
+    leituras = db.relationship(
+        "NotificacaoLeitura", back_populates="notificacao", cascade="all, delete-orphan"
+    )
+
+
+class NotificacaoLeitura(db.Model):
+    """Recibo por usuário (lida/dispensada) das notificações gerais."""
+
+    __tablename__ = "notificacao_leituras"
+
+    notificacao_id = db.Column(
+        db.Integer, db.ForeignKey("notificacoes.id", ondelete="CASCADE"), primary_key=True
+    )
+    usuario_id = db.Column(
+        db.Integer, db.ForeignKey("usuarios.id", ondelete="CASCADE"), primary_key=True
+    )
+    lida = db.Column(db.Boolean, nullable=False, default=True)
+    excluida = db.Column(db.Boolean, nullable=False, default=False)
+    criado_em = db.Column(db.DateTime, default=datetime.now)
+
+    notificacao = db.relationship("Notificacao", back_populates="leituras")
+
+
+class ResumoFinanceiroDiario(TimestampMixin, db.Model):
+    """Rollup diário das OS (pela data de criação), mantido por criar_os/atualizar_os."""
+
+    __tablename__ = "resumo_financeiro_diario"
+
+    dia = db.Column(db.Date, primary_key=True)
+    total_os = db.Column(db.Integer, nullable=False, default=0)
+    receitas = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    dias_entrega_total = db.Column(db.Float, nullable=False, default=0)
+
+    # Contagem por status
+    aguardando = db.Column(db.Integer, nullable=False, default=0)
+    em_reparo = db.Column(db.Integer, nullable=False, default=0)
+    pronto = db.Column(db.Integer, nullable=False, default=0)
+    entregue = db.Column(db.Integer, nullable=False, default=0)
+    cancelado = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CheckpointVerificacao(db.Model):
+    """Marca d'água da verificação incremental de notificações, por fonte."""
+
+    __tablename__ = "checkpoints_verificacao"
+
+    fonte = db.Column(db.String(50), primary_key=True)  # ordens_servico, produtos_estoque, prazos
+    processado_ate = db.Column(db.DateTime, nullable=False)
+
+
+class TarefaAgendada(db.Model):
+    """Estado e trava (lock row) das tarefas do agendador em segundo plano."""
+
+    __tablename__ = "tarefas_agendadas"
+
+    nome = db.Column(db.String(50), primary_key=True)
+    bloqueado_por = db.Column(db.String(100))
+    bloqueado_ate = db.Column(db.DateTime)
+    proxima_execucao = db.Column(db.DateTime)
+    ultima_execucao = db.Column(db.DateTime)
+    duracao_segundos = db.Column(db.Float)
+    ultimo_erro = db.Column(db.Text)
+
+
+class Sequencia(db.Model):
+    """Contadores nomeados (ex.: numeração das OS), incrementados atomicamente."""
+
+    __tablename__ = "sequencias"
+
+    nome = db.Column(db.String(50), primary_key=True)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class TarefaIA(TimestampMixin, db.Model):
+    """Fila persistente de chamadas de IA em segundo plano (resumo, pré-diagnóstico)."""
+
+    __tablename__ = "tarefas_ia"
+    __table_args__ = (
+        db.Index("ix_tarefas_ia_status_disponivel_em", "status", "disponivel_em"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(30), nullable=False)  # resumo, pre_diagnostico
+    os_id = db.Column(
+        db.Integer, db.ForeignKey("ordens_servico.id", ondelete="CASCADE"),
+        nullable=False, index=True
+    )
+    status = db.Column(db.String(20), nullable=False, default="pendente")  # pendente, executando, concluida, falhou
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    disponivel_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    bloqueado_por = db.Column(db.String(100))
+    bloqueado_ate = db.Column(db.DateTime)
+    resultado = db.Column(db.Text)
+    ultimo_erro = db.Column(db.Text)
+
+
+class RespostaIACache(db.Model):
+    """Camada persistente do cache de respostas da IA (chave = hash do modelo + entradas)."""
+
+    __tablename__ = "cache_respostas_ia"
+
+    chave = db.Column(db.String(64), primary_key=True)
+    modelo = db.Column(db.String(50), nullable=False)
+    resposta = db.Column(db.Text, nullable=False)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+
+class ConversaIA(TimestampMixin, db.Model):
+    """Sessão de conversa do assistente (estado do fluxo e entidades resolvidas)."""
+
+    __tablename__ = "conversas_ia"
+
+    id = db.Column(db.String(32), primary_key=True)
+    usuario_id = db.Column(
+        db.Integer, db.ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    estado = db.Column(db.JSON)
+    entidades = db.Column(db.JSON)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
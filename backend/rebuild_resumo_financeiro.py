@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir o resumo financeiro diário (backfill).
+Execute após importar dados ou se o resumo divergir das OS.
+
+Uso: python rebuild_resumo_financeiro.py [AAAA-MM-DD inicio] [AAAA-MM-DD fim]
+"""
+
+import sys
+from datetime import date
+
+from app import create_app
+from routes_financeiro import reconstruir_resumos
+
+
+def main():
+    """Reconstrói o rollup no intervalo informado (padrão: todo o histórico)."""
+    inicio = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    fim = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        dias = reconstruir_resumos(inicio, fim)
+        print(f"✅ Resumo financeiro reconstruído: {dias} dias processados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Script para reconciliar o contador de notificações não lidas dos usuários.
+Recalcula Usuario.notificacoes_nao_lidas (notificações pessoais) a partir da
+tabela de notificações; as gerais são contadas pela marca d'água de leitura.
+"""
+
+from app import create_app
+from routes_notificacoes import reconciliar_contadores_nao_lidas
+
+
+def main():
+    """Corrige divergências no contador de não lidas."""
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        corrigidos = reconciliar_contadores_nao_lidas()
+        print(f"✅ Contadores reconciliados: {corrigidos} usuários corrigidos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir o índice de busca (tabela busca_fts).
+Execute após importar dados direto no banco ou se a busca divergir dos cadastros.
+
+Uso: python reindexar_busca.py
+"""
+
+from app import create_app
+from extensions import db
+from busca_utils import indice_busca
+
+
+def main():
+    """Reindexa todos os clientes, OS e produtos."""
+    app = create_app(servicos_em_segundo_plano=False)
+
+    with app.app_context():
+        if not indice_busca.ativo(db.engine):
+            print("❌ Índice de busca indisponível neste banco de dados")
+            return
+        with db.engine.begin() as conexao:
+            total = indice_busca.reindexar(conexao)
+        print(f"✅ Índice de busca reconstruído: {total} documentos")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,33 @@
-from flask import Blueprint, jsonify, request
-from sqlalchemy.orm import joinedload
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, joinedload, object_session
 from datetime import datetime, timedelta
 
-from ai_utils import gerar_pre_diagnostico, gerar_resumo, interpretar_consulta_ia
+from ai_utils import (
+    classificar_consulta,
+    detectar_intencao_criacao,
+    gerar_pre_diagnostico,
+    gerar_pre_diagnostico_stream,
+    gerar_resumo,
+    interpretar_consulta_ia,
+    interpretar_consulta_ia_stream,
+)
 from auth_utils import login_required
-from models import Cliente, OrdemServico, ProdutoEstoque, Usuario, Notificacao
+from cache_ia import cache_respostas_ia
+from conversas_utils import conversas_ia
+from eventos_utils import formatar_sse
+from similaridade_utils import indice_clientes, indice_diagnosticos
+from models import (
+    Cliente,
+    OrdemServico,
+    ProdutoEstoque,
+    ResumoFinanceiroDiario,
+    normalizar_cpf_cnpj,
+)
 from extensions import db
 
 bp = Blueprint("ai", __name__)
@@ -66,10 +89,20 @@ def gerar_diagnostico_api():
         )
 
     try:
-        diagnostico = gerar_pre_diagnostico(tipo_aparelho, marca_modelo, problema)
+        # Casos parecidos já diagnosticados; a IA só é chamada se nenhum for próximo o bastante
+        similares = indice_diagnosticos.buscar(
+            tipo_aparelho, marca_modelo, problema, k=current_app.config["SIMILARIDADE_TOP_K"]
+        )
+        if similares and similares[0]["similaridade"] >= current_app.config["SIMILARIDADE_LIMIAR"]:
+            diagnostico, fonte = similares[0]["diagnostico"], "historico"
+        else:
+            diagnostico, fonte = gerar_pre_diagnostico(tipo_aparelho, marca_modelo, problema), "ia"
+
         return jsonify(
             {
                 "diagnostico": diagnostico,
+                "fonte": fonte,
+                "similares": similares,
                 "tipoAparelho": tipo_aparelho,
                 "marcaModelo": marca_modelo,
                 "problema": problema,
@@ -95,7 +128,6 @@ def consulta_ia_api():
     data = request.get_json() or {}
 
     consulta = data.get("consulta", "").strip()
-    estado_conversacional = data.get("estado_conversacional")  # Estado para fluxos conversacionais
 
     if not consulta:
         return (
@@ -108,30 +140,23 @@ def consulta_ia_api():
             400,
         )
 
+    # Sessão da conversa no servidor (estado do fluxo e entidades resolvidas)
+    conversa_id, conversa = abrir_conversa(data)
+    estado_conversacional = conversa["estado"]
+
     try:
         # Coletar dados de contexto do sistema
-        dados_contexto = coletar_dados_contexto()
+        dados_contexto = coletar_dados_contexto(
+            consulta, estado_conversacional, conversa["entidades"]
+        )
 
         # Interpretar consulta usando IA (com suporte a estado conversacional)
         resultado = interpretar_consulta_ia(consulta, dados_contexto, estado_conversacional)
 
         # Se há uma ação para executar (como criar cliente), executa
-        if resultado.get('acao'):
-            acao = resultado['acao']
-            if acao['tipo'] == 'criar_cliente':
-                # Criar cliente via API
-                try:
-                    from routes_clientes import criar_cliente_interno
-
-                    # Simular request para criar cliente
-                    cliente_criado = criar_cliente_interno(acao['dados'])
-                    resultado['dados']['cliente_criado'] = cliente_criado
-
-                except Exception as e:
-                    print(f"Erro ao criar cliente via IA: {e}")
-                    resultado['resposta'] = "Cliente não pôde ser cadastrado devido a um erro técnico."
-                    resultado['dados'] = {}
+        executar_acao_consulta(resultado)
 
+        concluir_turno(conversa_id, conversa, resultado)
         return jsonify(resultado)
 
     except Exception as e:
@@ -143,6 +168,7 @@ def consulta_ia_api():
                     "mensagem": "Não foi possível processar sua consulta. Tente novamente.",
                     "resposta": "Desculpe, houve um erro ao processar sua consulta.",
                     "consulta": consulta,
+                    "conversaId": conversa_id,
                     "estado_conversacional": estado_conversacional
                 }
             ),
@@ -150,71 +176,457 @@ def consulta_ia_api():
         )
 
 
-def coletar_dados_contexto() -> dict:
+def executar_acao_consulta(resultado: dict) -> None:
+    """Executa a ação pedida pelo fluxo conversacional (ex.: criar cliente)."""
+    if resultado.get('acao'):
+        acao = resultado['acao']
+        if acao['tipo'] == 'criar_cliente':
+            # Criar cliente via API
+            try:
+                from routes_clientes import criar_cliente_interno
+
+                # Simular request para criar cliente
+                cliente_criado = criar_cliente_interno(acao['dados'])
+                resultado['dados']['cliente_criado'] = cliente_criado
+
+            except Exception as e:
+                print(f"Erro ao criar cliente via IA: {e}")
+                resultado['resposta'] = "Cliente não pôde ser cadastrado devido a um erro técnico."
+                resultado['dados'] = {}
+
+
+def abrir_conversa(data: dict) -> tuple:
+    """
+    Recupera a conversa do usuário pelo conversaId (ou inicia uma nova).
+    Clientes antigos que ainda enviam estado_conversacional continuam funcionando.
+    """
+    conversa = None
+    conversa_id = data.get("conversaId")
+    if conversa_id:
+        conversa = conversas_ia.obter(conversa_id, g.usuario_id)
+    if conversa is None:
+        conversa_id, conversa = conversas_ia.nova()
+        conversa["estado"] = data.get("estado_conversacional")
+    return conversa_id, conversa
+
+
+def concluir_turno(conversa_id: str, conversa: dict, resultado: dict) -> None:
+    """Guarda o novo estado e as entidades resolvidas no turno e devolve o conversaId."""
+    conversa["estado"] = resultado.get("estado_conversacional")
+
+    dados = resultado.get("dados") or {}
+    if dados.get("tipo") == "os" and dados.get("dados"):
+        conversa["entidades"] = {
+            "os_id": dados["dados"]["id"], "cliente_id": dados["dados"]["clienteId"]
+        }
+    elif dados.get("tipo") == "cliente" and dados.get("dados"):
+        conversa["entidades"] = {"cliente_id": dados["dados"]["id"]}
+
+    conversas_ia.salvar(conversa_id, g.usuario_id, conversa)
+    resultado["conversaId"] = conversa_id
+
+
+# ================================
+# STREAMING (Server-Sent Events)
+# ================================
+# Eventos: "token" ({"texto"}) a cada trecho do modelo, "fim" com o
+# resultado completo (mesmo formato das rotas síncronas) e "erro".
+
+def resposta_sse(eventos) -> Response:
+    return Response(
+        stream_with_context(eventos),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@bp.post("/diagnostico/stream")
+@login_required
+def gerar_diagnostico_stream_api():
+    """Pré-diagnóstico em streaming: casos similares primeiro, depois os trechos da IA."""
+    data = request.get_json() or {}
+
+    tipo_aparelho = data.get("tipoAparelho", "").strip()
+    marca_modelo = data.get("marcaModelo", "").strip()
+    problema = data.get("problema", "").strip()
+
+    if not all([tipo_aparelho, marca_modelo, problema]):
+        return (
+            jsonify(
+                {
+                    "erro": "Campos obrigatórios",
+                    "mensagem": "Os campos 'tipoAparelho', 'marcaModelo' e 'problema' são obrigatórios",
+                }
+            ),
+            400,
+        )
+
+    similares = indice_diagnosticos.buscar(
+        tipo_aparelho, marca_modelo, problema, k=current_app.config["SIMILARIDADE_TOP_K"]
+    )
+    limiar = current_app.config["SIMILARIDADE_LIMIAR"]
+
+    def eventos():
+        resultado = {
+            "similares": similares,
+            "tipoAparelho": tipo_aparelho,
+            "marcaModelo": marca_modelo,
+            "problema": problema,
+        }
+        if similares and similares[0]["similaridade"] >= limiar:
+            resultado.update(diagnostico=similares[0]["diagnostico"], fonte="historico")
+            yield formatar_sse("fim", resultado)
+            return
+
+        partes = []
+        try:
+            for trecho in gerar_pre_diagnostico_stream(tipo_aparelho, marca_modelo, problema):
+                partes.append(trecho)
+                yield formatar_sse("token", {"texto": trecho})
+        except Exception as e:
+            print(f"Erro na geração de diagnóstico: {e}")
+            yield formatar_sse(
+                "erro",
+                {
+                    "erro": "Erro na geração de diagnóstico",
+                    "mensagem": "Não foi possível gerar o pré-diagnóstico. Tente novamente.",
+                },
+            )
+            return
+
+        resultado.update(diagnostico="".join(partes).strip(), fonte="ia")
+        yield formatar_sse("fim", resultado)
+
+    return resposta_sse(eventos())
+
+
+@bp.post("/consulta/stream")
+@login_required
+def consulta_ia_stream_api():
+    """Consulta em linguagem natural com a resposta da IA em streaming."""
+    data = request.get_json() or {}
+
+    consulta = data.get("consulta", "").strip()
+
+    if not consulta:
+        return (
+            jsonify(
+                {
+                    "erro": "Campo obrigatório",
+                    "mensagem": "O campo 'consulta' é obrigatório",
+                }
+            ),
+            400,
+        )
+
+    conversa_id, conversa = abrir_conversa(data)
+    estado_conversacional = conversa["estado"]
+    dados_contexto = coletar_dados_contexto(
+        consulta, estado_conversacional, conversa["entidades"]
+    )
+
+    def eventos():
+        try:
+            for tipo, valor in interpretar_consulta_ia_stream(
+                consulta, dados_contexto, estado_conversacional
+            ):
+                if tipo == "token":
+                    yield formatar_sse("token", {"texto": valor})
+                else:
+                    executar_acao_consulta(valor)
+                    concluir_turno(conversa_id, conversa, valor)
+                    yield formatar_sse("fim", valor)
+        except Exception as e:
+            print(f"Erro na consulta IA: {e}")
+            yield formatar_sse(
+                "erro",
+                {
+                    "erro": "Erro na consulta IA",
+                    "mensagem": "Não foi possível processar sua consulta. Tente novamente.",
+                    "resposta": "Desculpe, houve um erro ao processar sua consulta.",
+                    "consulta": consulta,
+                    "conversaId": conversa_id,
+                    "estado_conversacional": estado_conversacional,
+                },
+            )
+
+    return resposta_sse(eventos())
+
+
+@bp.get("/cache")
+@login_required
+def estatisticas_cache_ia():
+    """Acertos/falhas do cache de respostas da IA neste processo."""
+    return jsonify(cache_respostas_ia.estatisticas())
+
+
+LIMITE_AMOSTRA_CONTEXTO = 10
+LIMITE_LISTA_CONTEXTO = 20
+
+
+def cliente_contexto(c: Cliente) -> dict:
+    return {
+        "id": c.id,
+        "nome": c.nome,
+        "cpf_cnpj": c.cpf_cnpj,
+        "email": c.email,
+        "telefone": c.telefone,
+        "endereco": c.endereco
+    }
+
+
+def os_contexto(os_obj: OrdemServico) -> dict:
+    return {
+        "id": os_obj.id,
+        "numeroOS": os_obj.numero_os,
+        "clienteId": os_obj.cliente_id,
+        "clienteNome": os_obj.cliente.nome if os_obj.cliente else "Cliente não informado",
+        "tipoAparelho": os_obj.tipo_aparelho,
+        "marcaModelo": os_obj.marca_modelo,
+        "problemaRelatado": os_obj.problema_relatado,
+        "status": os_obj.status,
+        "valorOrcamento": float(os_obj.valor_orcamento or 0),
+        "dataCriacao": os_obj.criado_em.isoformat() if os_obj.criado_em else None
+    }
+
+
+def produto_contexto(p: ProdutoEstoque) -> dict:
+    return {
+        "id": p.id,
+        "codigo": p.codigo,
+        "nome": p.nome,
+        "categoria": p.categoria,
+        "quantidade": p.quantidade,
+        "estoqueMinimo": p.estoque_minimo,
+        "precoCusto": float(p.preco_custo or 0),
+        "precoVenda": float(p.preco_venda or 0)
+    }
+
+
+def clientes_citados(consulta: str) -> list:
+    """
+    Clientes ativos citados na consulta, do mais provável para o menos, via
+    índice de nomes (sem acentos, tolerante a erros de digitação).
+    Cada item é (cliente, pontuacao).
+    """
+    candidatos = indice_clientes.buscar(consulta)
+    if not candidatos:
+        return []
+    clientes = {
+        c.id: c
+        for c in Cliente.query.filter(Cliente.id.in_([cliente_id for cliente_id, _ in candidatos]))
+    }
+    return [
+        (clientes[cliente_id], pontuacao)
+        for cliente_id, pontuacao in candidatos
+        if cliente_id in clientes
+    ]
+
+
+def contexto_fluxo_criacao(consulta: str, estado: dict) -> dict:
+    """Contexto dos fluxos conversacionais: só o necessário para validar a etapa atual."""
+    if estado.get("modo") == "criacao_cliente" and estado.get("etapa") == 2:
+        # Verificação de CPF/CNPJ duplicado
+        # Consulta direta pelo índice único (cpf_cnpj é gravado só com dígitos)
+        cpf_limpo = normalizar_cpf_cnpj(consulta)
+        clientes = Cliente.query.filter_by(cpf_cnpj=cpf_limpo).limit(1).all() if cpf_limpo else []
+        return {"clientes": [cliente_contexto(c) for c in clientes]}
+    return {}
+
+
+# ================================
+# SNAPSHOT DO CONTEXTO GERAL
+# ================================
+# Visão geral (totais, amostras recentes, estoque baixo, receitas) compartilhada
+# por todas as conversas do processo. A versão é incrementada após o commit de
+# qualquer alteração em clientes, OS ou estoque feita neste processo; alterações
+# de outros workers aparecem em no máximo CONTEXTO_IA_TTL segundos.
+CONTEXTO_IA_TTL = int(os.getenv("CONTEXTO_IA_TTL", "60"))
+
+_versao_contexto = 0
+_snapshot_contexto = {"versao": -1, "expira_em": 0.0, "dados": None}
+_snapshot_lock = threading.Lock()
+
+
+@event.listens_for(Cliente, "after_insert")
+@event.listens_for(Cliente, "after_update")
+@event.listens_for(Cliente, "after_delete")
+@event.listens_for(OrdemServico, "after_insert")
+@event.listens_for(OrdemServico, "after_update")
+@event.listens_for(OrdemServico, "after_delete")
+@event.listens_for(ProdutoEstoque, "after_insert")
+@event.listens_for(ProdutoEstoque, "after_update")
+@event.listens_for(ProdutoEstoque, "after_delete")
+def _marcar_contexto_alterado(mapper, connection, target):
+    sessao = object_session(target)
+    if sessao is not None:
+        sessao.info["contexto_ia_alterado"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _incrementar_versao_contexto(session):
+    global _versao_contexto
+    if session.info.pop("contexto_ia_alterado", False):
+        with _snapshot_lock:
+            _versao_contexto += 1
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracao_contexto(session):
+    session.info.pop("contexto_ia_alterado", None)
+
+
+def montar_contexto_geral() -> dict:
+    abaixo_minimo = ProdutoEstoque.quantidade < ProdutoEstoque.estoque_minimo
+    receitas, entregues = db.session.query(
+        func.coalesce(func.sum(ResumoFinanceiroDiario.receitas), 0),
+        func.coalesce(func.sum(ResumoFinanceiroDiario.entregue), 0),
+    ).one()
+    return {
+        "total_clientes": Cliente.query.filter_by(status="ativo").count(),
+        "total_os": db.session.query(func.count(OrdemServico.id)).scalar(),
+        "clientes": [
+            cliente_contexto(c)
+            for c in Cliente.query.filter_by(status="ativo")
+            .order_by(Cliente.id.desc())
+            .limit(LIMITE_AMOSTRA_CONTEXTO)
+        ],
+        "os": [
+            os_contexto(o)
+            for o in OrdemServico.query.options(joinedload(OrdemServico.cliente))
+            .order_by(OrdemServico.criado_em.desc())
+            .limit(LIMITE_AMOSTRA_CONTEXTO)
+        ],
+        "total_produtos": db.session.query(func.count(ProdutoEstoque.id)).scalar(),
+        "produtos": [
+            produto_contexto(p)
+            for p in ProdutoEstoque.query.filter(abaixo_minimo)
+            .order_by(ProdutoEstoque.quantidade)
+            .limit(LIMITE_AMOSTRA_CONTEXTO)
+        ],
+        "produtos_baixo_estoque": (
+            db.session.query(func.count(ProdutoEstoque.id)).filter(abaixo_minimo).scalar()
+        ),
+        "receitas_totais": float(receitas or 0),
+        "os_entregues": int(entregues or 0),
+    }
+
+
+def obter_contexto_geral() -> dict:
+    """Snapshot da visão geral, reconstruído só quando a versão mudou ou expirou."""
+    with _snapshot_lock:
+        versao = _versao_contexto
+        if (
+            _snapshot_contexto["dados"] is not None
+            and _snapshot_contexto["versao"] == versao
+            and _snapshot_contexto["expira_em"] > time.monotonic()
+        ):
+            return _snapshot_contexto["dados"]
+
+    # Reconstrói fora do lock; a versão lida antes garante que uma alteração
+    # concorrente torne este snapshot obsoleto na próxima consulta
+    dados = montar_contexto_geral()
+    with _snapshot_lock:
+        _snapshot_contexto.update(
+            versao=versao, expira_em=time.monotonic() + CONTEXTO_IA_TTL, dados=dados
+        )
+    return dados
+
+
+def contexto_entidades(entidades: dict, geral: dict) -> dict:
+    """Visão geral com o cliente/OS citados nos turnos anteriores no topo (perguntas de seguimento)."""
+    contexto = dict(geral)
+    if entidades.get("os_id"):
+        os_obj = db.session.get(OrdemServico, entidades["os_id"])
+        if os_obj:
+            contexto["os"] = [os_contexto(os_obj)] + geral["os"]
+    if entidades.get("cliente_id"):
+        cliente = db.session.get(Cliente, entidades["cliente_id"])
+        if cliente:
+            contexto["clientes"] = [cliente_contexto(cliente)] + geral["clientes"]
+    return contexto
+
+
+def coletar_dados_contexto(
+    consulta: str = "", estado_conversacional: dict = None, entidades: dict = None
+) -> dict:
     """
-    Coleta dados de contexto de todas as tabelas para fornecer à IA.
+    Monta o contexto da IA apenas com o que a consulta pede, usando os mesmos
+    critérios de extrair_dados_consulta (número de OS, nome de cliente,
+    financeiro, estoque). Sem alvo específico, usa o snapshot da visão geral
+    com as entidades já citadas na conversa.
+    Intenções de criação não usam contexto.
     """
     try:
-        # Buscar clientes
-        clientes = Cliente.query.filter_by(status="ativo").limit(50).all()
-        clientes_data = []
-        for c in clientes:
-            clientes_data.append({
-                "id": c.id,
-                "nome": c.nome,
-                "cpf_cnpj": c.cpf_cnpj,
-                "email": c.email,
-                "telefone": c.telefone,
-                "endereco": c.endereco
-            })
-
-        # Buscar OS com clientes
-        os_data = []
-        ordens = OrdemServico.query.options(joinedload(OrdemServico.cliente)).limit(100).all()
-        for os in ordens:
-            os_dict = {
-                "id": os.id,
-                "numeroOS": os.numero_os,
-                "clienteId": os.cliente_id,
-                "clienteNome": os.cliente.nome if os.cliente else "Cliente não informado",
-                "tipoAparelho": os.tipo_aparelho,
-                "marcaModelo": os.marca_modelo,
-                "problemaRelatado": os.problema_relatado,
-                "status": os.status,
-                "valorOrcamento": float(os.valor_orcamento or 0),
-                "dataCriacao": os.criado_em.isoformat() if os.criado_em else None
-            }
-            os_data.append(os_dict)
-
-        # Buscar produtos
-        produtos = ProdutoEstoque.query.limit(100).all()
-        produtos_data = []
-        for p in produtos:
-            produtos_data.append({
-                "id": p.id,
-                "codigo": p.codigo,
-                "nome": p.nome,
-                "categoria": p.categoria,
-                "quantidade": p.quantidade,
-                "estoqueMinimo": p.estoque_minimo,
-                "precoCusto": float(p.preco_custo or 0),
-                "precoVenda": float(p.preco_venda or 0)
-            })
-
-        # Calcular métricas financeiras
-        os_entregues = [os for os in ordens if os.status == 'entregue']
-        receitas_totais = sum(float(os.valor_orcamento or 0) for os in os_entregues)
-
-        return {
-            "clientes": clientes_data,
-            "total_clientes": len(clientes_data),
-            "os": os_data,
-            "total_os": len(os_data),
-            "produtos": produtos_data,
-            "total_produtos": len(produtos_data),
-            "receitas_totais": receitas_totais,
-            "os_entregues": len(os_entregues)
+        if estado_conversacional and estado_conversacional.get("modo"):
+            return contexto_fluxo_criacao(consulta, estado_conversacional)
+        if detectar_intencao_criacao(consulta.lower()):
+            return {}
+
+        alvo = classificar_consulta(consulta)
+        geral = obter_contexto_geral()
+        contexto = {
+            "total_clientes": geral["total_clientes"],
+            "total_os": geral["total_os"],
         }
+        especifico = False
+
+        # OS citada pelo número (índice único de numero_os)
+        if alvo["numero_os"]:
+            ordens = (
+                OrdemServico.query.options(joinedload(OrdemServico.cliente))
+                .filter(OrdemServico.numero_os == alvo["numero_os"])
+                .all()
+            )
+            contexto["os"] = [os_contexto(o) for o in ordens]
+            especifico = True
+
+        # Clientes citados pelo nome, com suas OS mais recentes
+        citados = clientes_citados(consulta)
+        if citados:
+            clientes = [c for c, _ in citados]
+            contexto["clientes"] = [
+                dict(cliente_contexto(c), similaridadeNome=pontuacao) for c, pontuacao in citados
+            ]
+            ordens = (
+                OrdemServico.query.options(joinedload(OrdemServico.cliente))
+                .filter(OrdemServico.cliente_id.in_([c.id for c in clientes]))
+                .order_by(OrdemServico.criado_em.desc())
+                .limit(LIMITE_LISTA_CONTEXTO)
+                .all()
+            )
+            contexto["os"] = contexto.get("os", []) + [os_contexto(o) for o in ordens]
+            especifico = True
+
+        # Financeiro a partir do snapshot (rollup diário)
+        if alvo["financeiro"]:
+            contexto["receitas_totais"] = geral["receitas_totais"]
+            contexto["os_entregues"] = geral["os_entregues"]
+            especifico = True
+
+        if alvo["estoque"]:
+            contexto["total_produtos"] = geral["total_produtos"]
+            contexto["produtos_baixo_estoque"] = geral["produtos_baixo_estoque"]
+            criticos = (
+                ProdutoEstoque.query.filter(ProdutoEstoque.quantidade < ProdutoEstoque.estoque_minimo)
+                .order_by(ProdutoEstoque.quantidade)
+                .limit(LIMITE_LISTA_CONTEXTO)
+                .all()
+            )
+            demais = (
+                ProdutoEstoque.query.order_by(ProdutoEstoque.nome)
+                .limit(LIMITE_LISTA_CONTEXTO)
+                .all()
+            )
+            produtos = {p.id: p for p in criticos + demais}
+            contexto["produtos"] = [produto_contexto(p) for p in produtos.values()]
+            especifico = True
+
+        # Sem alvo específico: visão geral do snapshot (mais as entidades da conversa)
+        if not especifico:
+            return contexto_entidades(entidades or {}, geral)
+
+        return contexto
 
     except Exception as e:
         print(f"Erro ao coletar dados de contexto: {e}")
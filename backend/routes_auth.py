@@ -1,9 +1,11 @@
+from datetime import datetime
+
 from flask import Blueprint, jsonify, request
 from werkzeug.security import generate_password_hash
 
 from extensions import db
 from models import Usuario
-from auth_utils import autenticar_usuario, gerar_token_jwt
+from auth_utils import autenticar_usuario, gerar_token_jwt, invalidar_cache_usuario, login_required
 
 bp = Blueprint("auth", __name__)
 
@@ -111,6 +113,7 @@ def register():
 
 
 @bp.get("/me")
+@login_required
 def get_current_user():
     """Endpoint para obter informações do usuário atual."""
     from auth_utils import get_usuario_atual
@@ -143,6 +146,7 @@ def get_current_user():
 
 
 @bp.put("/me")
+@login_required
 def update_current_user():
     """Endpoint para atualizar informações do usuário atual."""
     from auth_utils import get_usuario_atual
@@ -179,9 +183,12 @@ def update_current_user():
             "mensagem": "A senha deve ter pelo menos 6 caracteres"
         }), 400
     user.senha_hash = generate_password_hash(senha)
+    # Revoga os tokens já emitidos (inclusive em outros workers, após o TTL do cache)
+    user.senha_alterada_em = datetime.utcnow().replace(microsecond=0)
 
     # Salva alterações
     db.session.commit()
+    invalidar_cache_usuario(user.id)
 
     return jsonify({
         "id": user.id,
@@ -190,5 +197,7 @@ def update_current_user():
         "email": user.email,
         "ativo": user.ativo,
         "dataCadastro": user.criado_em.isoformat() if user.criado_em else None,
+        # O token usado nesta requisição foi revogado pela troca de senha
+        "token": gerar_token_jwt(user.id, user.usuario),
         "mensagem": "Perfil atualizado com sucesso"
     }), 200
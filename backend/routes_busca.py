@@ -0,0 +1,89 @@
+from flask import Blueprint, abort, jsonify, request
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import Cliente, OrdemServico, ProdutoEstoque
+from auth_utils import login_required
+from busca_utils import TIPOS_BUSCA, indice_busca
+from routes_clientes import cliente_to_dict
+from routes_estoque import produto_to_dict
+from routes_os import os_to_dict
+
+bp = Blueprint("busca", __name__)
+
+LIMITE_PADRAO_BUSCA = 20
+LIMITE_MAXIMO_BUSCA = 100
+
+# tipo -> (modelo, opções de carga, serializador) usados para montar os resultados
+CARREGADORES = {
+    "cliente": (Cliente, (), cliente_to_dict),
+    "os": (OrdemServico, (joinedload(OrdemServico.cliente),), os_to_dict),
+    "produto": (ProdutoEstoque, (), produto_to_dict),
+}
+
+
+def _inteiro(args, campo, padrao) -> int:
+    try:
+        return int(args.get(campo) or padrao)
+    except ValueError:
+        abort(400, description=f"{campo} deve ser numérico")
+
+
+@bp.get("/")
+@login_required
+def buscar():
+    """
+    Busca de texto completo em clientes (nome, CPF/CNPJ, telefone, e-mail),
+    OS (número, IMEI, aparelho, problema) e produtos (código, nome).
+    Parâmetros: q, tipos (cliente,os,produto), limite e pagina.
+    Resultados ranqueados por relevância; `temMais` indica próxima página.
+    """
+    args = request.args
+    consulta = (args.get("q") or "").strip()
+    if not consulta:
+        abort(400, description="Parâmetro q é obrigatório")
+
+    tipos = [t for t in (args.get("tipos") or "").split(",") if t]
+    invalidos = [t for t in tipos if t not in TIPOS_BUSCA]
+    if invalidos:
+        abort(400, description=f"tipos inválidos: {', '.join(invalidos)} (use cliente, os, produto)")
+
+    limite = max(1, min(_inteiro(args, "limite", LIMITE_PADRAO_BUSCA), LIMITE_MAXIMO_BUSCA))
+    pagina = max(1, _inteiro(args, "pagina", 1))
+
+    # Busca um resultado a mais para saber se existe próxima página
+    acertos = indice_busca.buscar(
+        db.session.connection(),
+        consulta,
+        tipos=tipos,
+        limite=limite + 1,
+        offset=(pagina - 1) * limite,
+    )
+    if acertos is None:
+        return jsonify({
+            "erro": "Busca indisponível",
+            "mensagem": "O banco de dados atual não possui índice de busca."
+        }), 503
+
+    tem_mais = len(acertos) > limite
+    acertos = acertos[:limite]
+
+    # Carrega os registros da página com uma consulta por tipo
+    registros = {}
+    for tipo, (modelo, opcoes, _) in CARREGADORES.items():
+        ids = [ref_id for t, ref_id, _ in acertos if t == tipo]
+        if ids:
+            for registro in modelo.query.options(*opcoes).filter(modelo.id.in_(ids)):
+                registros[(tipo, registro.id)] = registro
+
+    itens = []
+    for tipo, ref_id, pontuacao in acertos:
+        registro = registros.get((tipo, ref_id))
+        if registro is not None:
+            itens.append({
+                "tipo": tipo,
+                "pontuacao": round(pontuacao, 4),
+                "dados": CARREGADORES[tipo][2](registro),
+            })
+
+    return jsonify({"itens": itens, "pagina": pagina, "limite": limite, "temMais": tem_mais})
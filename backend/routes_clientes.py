@@ -1,13 +1,40 @@
+from datetime import datetime
+
 from flask import Blueprint, jsonify, request, abort
+from sqlalchemy import and_, bindparam, case, func, or_, select, update
 from sqlalchemy.exc import IntegrityError
 
 from extensions import db
-from models import Cliente, Usuario
+from models import Cliente, normalizar_cpf_cnpj, normalizar_telefone
 from auth_utils import login_required, get_usuario_atual
 from routes_notificacoes import criar_notificacao_cliente_novo
+from listagem_utils import (
+    LIMITE_MAXIMO_PAGINA,
+    LIMITE_PADRAO_PAGINA,
+    codificar_cursor,
+    decodificar_cursor,
+    filtro_apos_cursor,
+    ordem_keyset,
+    resposta_json_stream,
+)
 
 bp = Blueprint("clientes", __name__)
 
+# Campo da API -> coluna (mesmos campos de cliente_to_dict), usados em `fields`
+CAMPOS_CLIENTE = {
+    "id": "id",
+    "nome": "nome",
+    "cpfCnpj": "cpf_cnpj",
+    "tipoPessoa": "tipo_pessoa",
+    "telefone": "telefone",
+    "email": "email",
+    "endereco": "endereco",
+    "observacoes": "observacoes",
+    "status": "status",
+    "dataCadastro": "criado_em",
+    "dataAtualizacao": "atualizado_em",
+}
+
 
 def cliente_to_dict(cliente: Cliente) -> dict:
     return {
@@ -32,10 +59,7 @@ def criar_cliente_interno(dados_cliente: dict) -> dict:
     Função interna para criar cliente (usada pela IA conversacional).
     Retorna os dados do cliente criado.
     """
-    # Limpa o CPF/CNPJ removendo caracteres especiais
-    cpf_cnpj_limpo = (
-        dados_cliente["cpfCnpj"].replace(".", "").replace("-", "").replace("/", "").strip()
-    )
+    cpf_cnpj_limpo = normalizar_cpf_cnpj(dados_cliente["cpfCnpj"])
 
     # Verifica se o CPF/CNPJ já existe
     cliente_existente = Cliente.query.filter_by(cpf_cnpj=cpf_cnpj_limpo).first()
@@ -57,11 +81,9 @@ def criar_cliente_interno(dados_cliente: dict) -> dict:
         db.session.add(cliente)
         db.session.commit()
 
-        # Criar notificações para todos os usuários após cadastrar cliente
+        # Criar notificação geral (visível a todos os usuários) após cadastrar cliente
         try:
-            usuarios = Usuario.query.filter_by(ativo=True).all()
-            for usuario in usuarios:
-                criar_notificacao_cliente_novo(cliente, usuario.id)
+            criar_notificacao_cliente_novo(cliente)
             db.session.commit()
         except Exception as e:
             print(f"Aviso: Não foi possível criar notificações para novo cliente: {e}")
@@ -77,11 +99,153 @@ def criar_cliente_interno(dados_cliente: dict) -> dict:
         raise
 
 
+def preencher_contatos_normalizados(lote=1000) -> tuple:
+    """
+    Backfill de Cliente.telefone_normalizado e da forma só com dígitos de
+    cpf_cnpj para clientes gravados antes da normalização. Mantém atualizado_em.
+    CPF/CNPJ que colidiriam com outro cliente ficam como estão e são
+    retornados para revisão manual. Retorna (atualizados, conflitos).
+    """
+    tabela = Cliente.__table__
+    atualizados, conflitos = 0, []
+    reservados = set()  # CPF/CNPJ normalizados nesta execução
+    ultimo_id = 0
+    while True:
+        linhas = db.session.execute(
+            select(Cliente.id, Cliente.cpf_cnpj, Cliente.telefone, Cliente.telefone_normalizado)
+            .where(Cliente.id > ultimo_id)
+            .order_by(Cliente.id)
+            .limit(lote)
+        ).all()
+        if not linhas:
+            db.session.commit()
+            return atualizados, conflitos
+
+        alteracoes = []
+        for linha in linhas:
+            cpf_cnpj = normalizar_cpf_cnpj(linha.cpf_cnpj)
+            telefone = normalizar_telefone(linha.telefone)
+            if cpf_cnpj == linha.cpf_cnpj and telefone == linha.telefone_normalizado:
+                continue
+            if cpf_cnpj != linha.cpf_cnpj:
+                if (
+                    not cpf_cnpj
+                    or cpf_cnpj in reservados
+                    or Cliente.query.filter_by(cpf_cnpj=cpf_cnpj).first()
+                ):
+                    conflitos.append((linha.id, linha.cpf_cnpj))
+                    cpf_cnpj = linha.cpf_cnpj
+                    if telefone == linha.telefone_normalizado:
+                        continue
+                else:
+                    reservados.add(cpf_cnpj)
+            alteracoes.append({"cliente_id": linha.id, "cpf_normalizado": cpf_cnpj, "telefone_limpo": telefone})
+
+        if alteracoes:
+            db.session.execute(
+                update(tabela)
+                .where(tabela.c.id == bindparam("cliente_id"))
+                .values(
+                    cpf_cnpj=bindparam("cpf_normalizado"),
+                    telefone_normalizado=bindparam("telefone_limpo"),
+                    atualizado_em=tabela.c.atualizado_em,
+                ),
+                alteracoes,
+            )
+            atualizados += len(alteracoes)
+        ultimo_id = linhas[-1].id
+
+
+def _valor_json(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def linha_cliente_to_dict(linha, campos: dict) -> dict:
+    return {nome: _valor_json(getattr(linha, coluna)) for nome, coluna in campos.items()}
+
+
+def campos_listagem(args) -> dict:
+    """Campos pedidos em `fields` (padrão: todos os de cliente_to_dict)."""
+    if not args.get("fields"):
+        return CAMPOS_CLIENTE
+    nomes = [c.strip() for c in args["fields"].split(",") if c.strip()]
+    invalidos = [c for c in nomes if c not in CAMPOS_CLIENTE]
+    if invalidos:
+        abort(400, description=f"Campos inválidos em fields: {', '.join(invalidos)}")
+    return {nome: CAMPOS_CLIENTE[nome] for nome in nomes}
+
+
 @bp.get("/")
 @login_required
 def listar_clientes():
-    clientes = Cliente.query.order_by(Cliente.criado_em.desc()).all()
-    return jsonify([cliente_to_dict(c) for c in clientes])
+    """
+    Lista clientes (mais recentes primeiro) com filtros opcionais por `status`
+    e `tipoPessoa` e `fields` com os campos desejados (ex.: fields=id,nome
+    para selects).
+    Com `limite` ou `cursor` a resposta é paginada por keyset em
+    (criado_em, id); sem eles a lista completa é enviada em streaming.
+    """
+    args = request.args
+    campos = campos_listagem(args)
+
+    colunas = {"id", "criado_em", *campos.values()}
+    query = select(*(getattr(Cliente, c) for c in sorted(colunas))).order_by(
+        *ordem_keyset(Cliente.criado_em, Cliente.id)
+    )
+    if args.get("status"):
+        query = query.where(Cliente.status.in_(args["status"].split(",")))
+    if args.get("tipoPessoa"):
+        query = query.where(Cliente.tipo_pessoa == args["tipoPessoa"])
+
+    paginado = "limite" in args or "cursor" in args
+    if not paginado:
+        return resposta_json_stream(query, lambda linha: linha_cliente_to_dict(linha, campos))
+
+    try:
+        limite = int(args.get("limite") or LIMITE_PADRAO_PAGINA)
+    except ValueError:
+        abort(400, description="limite deve ser numérico")
+    limite = max(1, min(limite, LIMITE_MAXIMO_PAGINA))
+
+    if args.get("cursor"):
+        criado_em, cliente_id = decodificar_cursor(args["cursor"])
+        query = query.where(
+            filtro_apos_cursor(Cliente.criado_em, Cliente.id, criado_em, cliente_id)
+        )
+
+    # Busca um registro a mais para saber se existe próxima página
+    linhas = db.session.execute(query.limit(limite + 1)).all()
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    return jsonify({
+        "itens": [linha_cliente_to_dict(linha, campos) for linha in linhas],
+        "proximoCursor": codificar_cursor(linhas[-1]) if tem_mais else None,
+    })
+
+
+def _contar(condicao):
+    return func.coalesce(func.sum(case((condicao, 1), else_=0)), 0)
+
+
+@bp.get("/estatisticas")
+@login_required
+def estatisticas_clientes():
+    """Totais dos cards da tela de clientes, em uma única consulta agregada."""
+    total, ativos, com_email, sem_telefone = db.session.execute(
+        select(
+            func.count(Cliente.id),
+            _contar(or_(Cliente.status.is_(None), Cliente.status != "inativo")),
+            _contar(and_(Cliente.email.isnot(None), func.trim(Cliente.email) != "")),
+            _contar(or_(Cliente.telefone.is_(None), func.trim(Cliente.telefone) == "")),
+        )
+    ).one()
+    return jsonify({
+        "total": total,
+        "ativos": int(ativos),
+        "comEmail": int(com_email),
+        "semTelefone": int(sem_telefone),
+    })
 
 
 @bp.post("/")
@@ -93,10 +257,9 @@ def criar_cliente():
     if not all(data.get(c) for c in obrigatorios):
         abort(400, description="Campos obrigatórios: nome, cpfCnpj, telefone")
 
-    # Limpa o CPF/CNPJ removendo caracteres especiais
-    cpf_cnpj_limpo = (
-        data["cpfCnpj"].replace(".", "").replace("-", "").replace("/", "").strip()
-    )
+    cpf_cnpj_limpo = normalizar_cpf_cnpj(data["cpfCnpj"])
+    if not cpf_cnpj_limpo:
+        abort(400, description="CPF/CNPJ inválido")
 
     # Verifica se o CPF/CNPJ já existe
     cliente_existente = Cliente.query.filter_by(cpf_cnpj=cpf_cnpj_limpo).first()
@@ -126,11 +289,9 @@ def criar_cliente():
         db.session.add(cliente)
         db.session.commit()
 
-        # Criar notificações para todos os usuários após cadastrar cliente
+        # Criar notificação geral (visível a todos os usuários) após cadastrar cliente
         try:
-            usuarios = Usuario.query.filter_by(ativo=True).all()
-            for usuario in usuarios:
-                criar_notificacao_cliente_novo(cliente, usuario.id)
+            criar_notificacao_cliente_novo(cliente)
             db.session.commit()
         except Exception as e:
             print(f"Aviso: Não foi possível criar notificações para novo cliente: {e}")
@@ -163,6 +324,21 @@ def obter_cliente(cliente_id: int):
     return jsonify(cliente_to_dict(cliente))
 
 
+@bp.get("/telefone/<telefone>")
+@login_required
+def buscar_clientes_por_telefone(telefone: str):
+    """Clientes com o telefone informado (qualquer formatação), via índice do número normalizado."""
+    telefone_normalizado = normalizar_telefone(telefone)
+    if not telefone_normalizado:
+        abort(400, description="Telefone inválido")
+    clientes = (
+        Cliente.query.filter_by(telefone_normalizado=telefone_normalizado)
+        .order_by(Cliente.id)
+        .all()
+    )
+    return jsonify([cliente_to_dict(c) for c in clientes])
+
+
 @bp.put("/<int:cliente_id>")
 @login_required
 def atualizar_cliente(cliente_id: int):
@@ -172,11 +348,13 @@ def atualizar_cliente(cliente_id: int):
     if "nome" in data:
         cliente.nome = data["nome"].strip()
     if "cpfCnpj" in data:
-        cpf_cnpj_limpo = (
-            data["cpfCnpj"].replace(".", "").replace("-", "").replace("/", "").strip()
-        )
-        # Verifica se o novo CPF/CNPJ já está sendo usado por outro cliente
-        if cpf_cnpj_limpo != cliente.cpf_cnpj:
+        cpf_cnpj_limpo = normalizar_cpf_cnpj(data["cpfCnpj"])
+        if not cpf_cnpj_limpo:
+            abort(400, description="CPF/CNPJ inválido")
+        # Verifica se o novo CPF/CNPJ já está sendo usado por outro cliente.
+        # O mesmo documento reenviado não altera o cadastro (clientes antigos
+        # com pontuação continuam editáveis mesmo colidindo após normalizar)
+        if cpf_cnpj_limpo != normalizar_cpf_cnpj(cliente.cpf_cnpj):
             cliente_existente = Cliente.query.filter_by(cpf_cnpj=cpf_cnpj_limpo).first()
             if cliente_existente and cliente_existente.id != cliente_id:
                 return (
@@ -188,7 +366,7 @@ def atualizar_cliente(cliente_id: int):
                     ),
                     409,
                 )
-        cliente.cpf_cnpj = cpf_cnpj_limpo
+            cliente.cpf_cnpj = cpf_cnpj_limpo
     if "tipoPessoa" in data:
         cliente.tipo_pessoa = data["tipoPessoa"]
     if "telefone" in data:
@@ -0,0 +1,78 @@
+from flask import Blueprint, abort, jsonify
+from sqlalchemy import bindparam, inspect, select, update
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import OrdemServico, normalizar_imei_serial
+from auth_utils import login_required
+from routes_os import os_to_dict
+
+bp = Blueprint("dispositivos", __name__)
+
+
+def preencher_imei_serial_normalizado(lote=1000):
+    """
+    Backfill de OrdemServico.imei_serial_normalizado para OS gravadas antes da
+    coluna existir. Mantém atualizado_em (não é uma alteração da OS).
+    IMEIs sem letras/dígitos ficam com "" para não serem relidos a cada início.
+    Sem a coluna no banco só avisa (crie com migrar_imei_serial.py).
+    """
+    colunas = {c["name"] for c in inspect(db.engine).get_columns("ordens_servico")}
+    if "imei_serial_normalizado" not in colunas:
+        print("Aviso: Coluna ordens_servico.imei_serial_normalizado ausente; execute migrar_imei_serial.py")
+        return
+
+    ultimo_id = 0
+    while True:
+        linhas = db.session.execute(
+            select(OrdemServico.id, OrdemServico.imei_serial)
+            .where(
+                OrdemServico.id > ultimo_id,
+                OrdemServico.imei_serial.isnot(None),
+                OrdemServico.imei_serial_normalizado.is_(None),
+            )
+            .order_by(OrdemServico.id)
+            .limit(lote)
+        ).all()
+        if not linhas:
+            db.session.commit()
+            return
+        db.session.execute(
+            update(OrdemServico.__table__)
+            .where(OrdemServico.__table__.c.id == bindparam("os_id"))
+            .values(
+                imei_serial_normalizado=bindparam("normalizado"),
+                atualizado_em=OrdemServico.__table__.c.atualizado_em,
+            ),
+            [
+                {"os_id": os_id, "normalizado": normalizar_imei_serial(imei) or ""}
+                for os_id, imei in linhas
+            ],
+        )
+        ultimo_id = linhas[-1].id
+
+
+@bp.get("/<imei>/historico")
+@login_required
+def historico_dispositivo(imei):
+    """
+    Todas as OS do aparelho (IMEI ou serial, com ou sem separadores), da mais
+    recente para a mais antiga. Consulta direta no índice do identificador.
+    """
+    dispositivo = normalizar_imei_serial(imei)
+    if not dispositivo:
+        abort(400, description="IMEI/serial inválido")
+
+    ordens = (
+        OrdemServico.query.options(joinedload(OrdemServico.cliente))
+        .filter(OrdemServico.imei_serial_normalizado == dispositivo)
+        .order_by(OrdemServico.criado_em.desc(), OrdemServico.id.desc())
+        .all()
+    )
+
+    return jsonify({
+        "imeiSerial": dispositivo,
+        "totalOrdens": len(ordens),
+        "ultimaOrdem": os_to_dict(ordens[0]) if ordens else None,
+        "ordens": [os_to_dict(o) for o in ordens],
+    })
@@ -3,6 +3,7 @@ from flask import Blueprint, jsonify, request, abort
 from extensions import db
 from models import ProdutoEstoque
 from auth_utils import login_required
+from listagem_utils import resposta_json_stream
 
 bp = Blueprint("estoque", __name__)
 
@@ -28,8 +29,8 @@ def produto_to_dict(produto: ProdutoEstoque) -> dict:
 @bp.get("/")
 @login_required
 def listar_produtos():
-    produtos = ProdutoEstoque.query.order_by(ProdutoEstoque.criado_em.desc()).all()
-    return jsonify([produto_to_dict(p) for p in produtos])
+    query = ProdutoEstoque.query.order_by(ProdutoEstoque.criado_em.desc())
+    return resposta_json_stream(query, produto_to_dict)
 
 
 @bp.post("/")
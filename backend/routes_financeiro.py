@@ -0,0 +1,333 @@
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, abort, jsonify, request
+from sqlalchemy import Integer, delete, event, func, update
+from sqlalchemy import insert as insert_padrao
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+from extensions import db
+from models import OrdemServico, ProdutoEstoque, ResumoFinanceiroDiario
+from auth_utils import login_required
+
+bp = Blueprint("financeiro", __name__)
+
+GRANULARIDADES = ("dia", "semana", "mes")
+
+# Formatos de agrupamento por dialeto (dia, semana ISO, mês). No SQLite a
+# semana ISO é montada em expr_periodo (o strftime não tem %G/%V)
+FORMATOS_PERIODO = {
+    "sqlite": {"dia": "%Y-%m-%d", "mes": "%Y-%m"},
+    "mysql": {"dia": "%Y-%m-%d", "semana": "%x-W%v", "mes": "%Y-%m"},
+    "postgresql": {"dia": "YYYY-MM-DD", "semana": 'IYYY-"W"IW', "mes": "YYYY-MM"},
+}
+
+LIMITE_REPOSICAO = 100
+
+STATUS_OS = ("aguardando", "em_reparo", "pronto", "entregue", "cancelado")
+
+
+def _dialeto() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def expr_periodo(coluna, granularidade: str):
+    """Expressão SQL que agrupa uma coluna de data no período pedido."""
+    dialeto = _dialeto()
+    if dialeto == "mysql":
+        return func.date_format(coluna, FORMATOS_PERIODO["mysql"][granularidade])
+    if dialeto == "postgresql":
+        return func.to_char(coluna, FORMATOS_PERIODO["postgresql"][granularidade])
+    if granularidade == "semana":
+        # Semana ISO (AAAA-Www, como %x-W%v do MySQL): a quinta-feira da semana
+        # define o ano, e a semana é o dia do ano dessa quinta dividido por 7
+        quinta = func.date(coluna, "-3 days", "weekday 4")
+        dia_do_ano = func.cast(func.strftime("%j", quinta), Integer)
+        return func.printf("%s-W%02d", func.strftime("%Y", quinta), (dia_do_ano - 1) / 7 + 1)
+    return func.strftime(FORMATOS_PERIODO["sqlite"][granularidade], coluna)
+
+
+def expr_dias_entre(inicio, fim):
+    """Diferença em dias (fracionária) entre duas colunas de data."""
+    dialeto = _dialeto()
+    if dialeto == "mysql":
+        return func.timestampdiff(db.text("SECOND"), inicio, fim) / 86400.0
+    if dialeto == "postgresql":
+        return func.extract("epoch", fim - inicio) / 86400.0
+    return func.julianday(fim) - func.julianday(inicio)
+
+
+def intervalo_periodo(args) -> tuple:
+    """Lê dataInicio/dataFim (AAAA-MM-DD, fim inclusivo). Padrão: mês atual."""
+    hoje = date.today()
+    try:
+        inicio = (
+            date.fromisoformat(args["dataInicio"])
+            if args.get("dataInicio")
+            else hoje.replace(day=1)
+        )
+        fim = date.fromisoformat(args["dataFim"]) if args.get("dataFim") else hoje
+    except ValueError:
+        abort(400, description="Datas devem estar no formato AAAA-MM-DD")
+
+    if fim < inicio:
+        abort(400, description="dataFim deve ser posterior a dataInicio")
+
+    return (
+        datetime.combine(inicio, datetime.min.time()),
+        datetime.combine(fim + timedelta(days=1), datetime.min.time()),
+    )
+
+
+# ================================
+# ROLLUP DIÁRIO
+# ================================
+
+def recalcular_resumo_dia(dia: date) -> None:
+    """
+    Recalcula a linha do rollup de um dia a partir das OS criadas nele.
+    Não faz commit: o chamador decide a transação.
+    """
+    inicio = datetime.combine(dia, datetime.min.time())
+    linhas = (
+        db.session.query(
+            OrdemServico.status,
+            func.count(OrdemServico.id),
+            func.sum(OrdemServico.valor_orcamento),
+            func.sum(expr_dias_entre(OrdemServico.criado_em, OrdemServico.atualizado_em)),
+        )
+        .filter(
+            OrdemServico.criado_em >= inicio,
+            OrdemServico.criado_em < inicio + timedelta(days=1),
+        )
+        .group_by(OrdemServico.status)
+        .all()
+    )
+
+    tabela = ResumoFinanceiroDiario.__table__
+    if not linhas:
+        db.session.execute(delete(tabela).where(tabela.c.dia == dia))
+        return
+
+    valores = {"total_os": 0, "receitas": 0, "dias_entrega_total": 0}
+    valores.update({status: 0 for status in STATUS_OS})
+    for status, quantidade, valor, dias in linhas:
+        valores["total_os"] += quantidade
+        if status in STATUS_OS:
+            valores[status] = quantidade
+        if status == "entregue":
+            valores["receitas"] = valor or 0
+            valores["dias_entrega_total"] = float(dias or 0)
+
+    gravar_resumo_dia(dia, valores)
+
+
+def gravar_resumo_dia(dia: date, valores: dict) -> None:
+    """
+    Grava a linha do dia com upsert atômico (INSERT ... ON CONFLICT / ON
+    DUPLICATE KEY UPDATE): a primeira gravação concorrente do mesmo dia não
+    falha com chave duplicada. Outros bancos: UPDATE e, sem linha, INSERT
+    (com nova tentativa como UPDATE se outra transação inseriu antes).
+    """
+    tabela = ResumoFinanceiroDiario.__table__
+    alteracao = {**valores, "atualizado_em": datetime.now()}
+    dialeto = _dialeto()
+
+    if dialeto in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialeto == "sqlite" else postgresql_insert
+        db.session.execute(
+            insert(tabela)
+            .values(dia=dia, **valores)
+            .on_conflict_do_update(index_elements=[tabela.c.dia], set_=alteracao)
+        )
+        return
+    if dialeto == "mysql":
+        db.session.execute(
+            mysql_insert(tabela).values(dia=dia, **valores).on_duplicate_key_update(**alteracao)
+        )
+        return
+
+    atualizar = update(tabela).where(tabela.c.dia == dia).values(**alteracao)
+    if db.session.execute(atualizar).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert_padrao(tabela).values(dia=dia, **valores))
+    except IntegrityError:
+        db.session.execute(atualizar)
+
+
+def atualizar_resumo_financeiro(os_obj: OrdemServico) -> None:
+    """
+    Mantém o rollup em dia após criar/alterar uma OS. Falhas aqui não devem
+    impedir a gravação da OS; a reconstrução (rebuild_resumo_financeiro.py)
+    corrige qualquer divergência.
+    """
+    db.session.flush()
+    try:
+        with db.session.begin_nested():
+            recalcular_resumo_dia(os_obj.criado_em.date())
+    except SQLAlchemyError as e:
+        print(f"Aviso: Não foi possível atualizar o resumo financeiro: {e}")
+
+
+# OS removidas pelo ORM (inclusive em cascata, ao excluir um cliente):
+# recalcula os dias afetados no mesmo flush, dentro da mesma transação
+@event.listens_for(OrdemServico, "after_delete")
+def _registrar_dia_os_removida(mapper, connection, target):
+    sessao = object_session(target)
+    if sessao is not None and target.criado_em is not None:
+        sessao.info.setdefault("dias_resumo_removidos", set()).add(target.criado_em.date())
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _recalcular_dias_os_removidas(session, flush_context):
+    dias = session.info.pop("dias_resumo_removidos", None)
+    for dia in sorted(dias or ()):
+        recalcular_resumo_dia(dia)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_dias_os_removidas(session):
+    session.info.pop("dias_resumo_removidos", None)
+
+
+def reconstruir_resumos(inicio: date = None, fim: date = None) -> int:
+    """Reconstrói o rollup (backfill) no intervalo dado. Retorna dias processados."""
+    dia_os = func.date(OrdemServico.criado_em)
+    query = db.session.query(dia_os).distinct()
+    if inicio:
+        query = query.filter(OrdemServico.criado_em >= datetime.combine(inicio, datetime.min.time()))
+    if fim:
+        query = query.filter(
+            OrdemServico.criado_em < datetime.combine(fim + timedelta(days=1), datetime.min.time())
+        )
+
+    dias = {
+        d if isinstance(d, date) else date.fromisoformat(str(d)) for (d,) in query.all()
+    }
+
+    # Remove linhas órfãs (dias sem OS) dentro do intervalo
+    obsoletos = ResumoFinanceiroDiario.query
+    if inicio:
+        obsoletos = obsoletos.filter(ResumoFinanceiroDiario.dia >= inicio)
+    if fim:
+        obsoletos = obsoletos.filter(ResumoFinanceiroDiario.dia <= fim)
+    if dias:
+        obsoletos = obsoletos.filter(ResumoFinanceiroDiario.dia.notin_(dias))
+    obsoletos.delete(synchronize_session=False)
+
+    for dia in sorted(dias):
+        recalcular_resumo_dia(dia)
+    db.session.commit()
+    return len(dias)
+
+
+def atualizar_resumos_recentes(dias: int) -> int:
+    """Recalcula os últimos `dias` dias do rollup (tarefa agendada)."""
+    return reconstruir_resumos(date.today() - timedelta(days=dias))
+
+
+# ================================
+# RESUMO
+# ================================
+
+def calcular_resumo(inicio: datetime, fim: datetime, granularidade: str) -> dict:
+    """Lê receitas e produtividade do rollup diário e custos de reposição via SQL."""
+    R = ResumoFinanceiroDiario
+    no_periodo = (R.dia >= inicio.date(), R.dia < fim.date())
+
+    totais = (
+        db.session.query(
+            func.coalesce(func.sum(R.receitas), 0),
+            func.coalesce(func.sum(R.entregue), 0),
+            func.coalesce(func.sum(R.dias_entrega_total), 0),
+            *[func.coalesce(func.sum(getattr(R, status)), 0) for status in STATUS_OS],
+        )
+        .filter(*no_periodo)
+        .one()
+    )
+    receitas = float(totais[0] or 0)
+    concluidas = int(totais[1] or 0)
+    tempo_medio = float(totais[2] or 0) / concluidas if concluidas else 0
+    por_status = {
+        status: int(qtd) for status, qtd in zip(STATUS_OS, totais[3:]) if qtd
+    }
+
+    periodo = expr_periodo(R.dia, granularidade).label("periodo")
+    serie = [
+        {"periodo": p, "receitas": float(r or 0), "osConcluidas": int(n or 0)}
+        for p, r, n in db.session.query(periodo, func.sum(R.receitas), func.sum(R.entregue))
+        .filter(R.entregue > 0, *no_periodo)
+        .group_by(periodo)
+        .order_by(periodo)
+        .all()
+    ]
+
+    # Custos estimados: reposição dos produtos abaixo do estoque mínimo
+    falta = ProdutoEstoque.estoque_minimo - ProdutoEstoque.quantidade
+    custo_reposicao = (falta * ProdutoEstoque.preco_custo).label("custo_total")
+    abaixo_minimo = ProdutoEstoque.quantidade < ProdutoEstoque.estoque_minimo
+
+    custos, qtd_reposicao = (
+        db.session.query(
+            func.coalesce(func.sum(custo_reposicao), 0), func.count(ProdutoEstoque.id)
+        )
+        .filter(abaixo_minimo)
+        .one()
+    )
+    custos = float(custos or 0)
+
+    reposicao = [
+        {
+            "id": p.id,
+            "nome": p.nome,
+            "categoria": p.categoria,
+            "quantidadeNecessaria": p.estoque_minimo - p.quantidade,
+            "custoUnitario": float(p.preco_custo or 0),
+            "custoTotal": float(total or 0),
+        }
+        for p, total in db.session.query(ProdutoEstoque, custo_reposicao)
+        .filter(abaixo_minimo)
+        .order_by(custo_reposicao.desc())
+        .limit(LIMITE_REPOSICAO)
+        .all()
+    ]
+
+    lucro = receitas - custos
+    return {
+        "periodo": {
+            "inicio": inicio.date().isoformat(),
+            "fim": (fim - timedelta(days=1)).date().isoformat(),
+            "granularidade": granularidade,
+        },
+        "receitas": receitas,
+        "custos": custos,
+        "lucro": lucro,
+        "margem": (lucro / receitas * 100) if receitas > 0 else 0,
+        "osConcluidas": concluidas,
+        "ticketMedio": receitas / concluidas if concluidas else 0,
+        "tempoMedioDias": tempo_medio,
+        "osPorStatus": por_status,
+        "serie": serie,
+        "produtosReposicao": qtd_reposicao,
+        "reposicao": reposicao,
+    }
+
+
+@bp.get("/resumo")
+@login_required
+def resumo_financeiro():
+    """
+    Resumo financeiro agregado no banco.
+    Parâmetros: dataInicio, dataFim (AAAA-MM-DD) e granularidade (dia, semana, mes).
+    """
+    granularidade = request.args.get("granularidade", "mes")
+    if granularidade not in GRANULARIDADES:
+        abort(400, description="granularidade deve ser dia, semana ou mes")
+
+    inicio, fim = intervalo_periodo(request.args)
+    return jsonify(calcular_resumo(inicio, fim, granularidade))
@@ -1,38 +1,189 @@
-from flask import Blueprint, request, jsonify, g
-from sqlalchemy import desc
+import queue
+import time
+from datetime import datetime, timedelta
+
+import jwt
+from flask import Blueprint, Response, current_app, request, jsonify, g
+from sqlalchemy import and_, bindparam, case, desc, func, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 from extensions import db
-from models import Notificacao, Usuario, OrdemServico, ProdutoEstoque, Cliente
-from auth_utils import login_required
+from models import (
+    CheckpointVerificacao, Cliente, Notificacao, NotificacaoLeitura, OrdemServico,
+    ProdutoEstoque, Usuario
+)
+from auth_utils import (
+    FINALIDADE_STREAM, STREAM_TICKET_SEGUNDOS, gerar_ticket_stream, login_required,
+    sessao_valida, verificar_token_jwt
+)
+from eventos_utils import formatar_sse, hub_eventos, publicar_apos_commit
 
 bp = Blueprint('notificacoes', __name__)
 
+# Intervalo (segundos) entre heartbeats do stream SSE; cada heartbeat
+# confere o contador no banco (cobre eventos publicados por outro processo)
+INTERVALO_HEARTBEAT = 15
+
+# Sobreposição entre verificações incrementais, cobre transações que
+# gravaram atualizado_em antes do checkpoint mas fizeram commit depois
+MARGEM_CHECKPOINT = timedelta(minutes=5)
+
+
+def notificacao_to_dict(notif, lida=None):
+    return {
+        "id": notif.id,
+        "tipo": notif.tipo,
+        "titulo": notif.titulo,
+        "mensagem": notif.mensagem,
+        "dados_referencia": notif.dados_referencia,
+        "lida": bool(notif.lida if lida is None else lida),
+        "prioridade": notif.prioridade,
+        "criado_em": notif.criado_em.isoformat() if notif.criado_em else None
+    }
+
+
+# ================================
+# NOTIFICAÇÕES GERAIS (FAN-OUT NA LEITURA)
+# ================================
+# Notificações com usuario_id=None são gravadas uma única vez e valem para
+# todos os usuários cadastrados antes delas. O estado por usuário fica em
+# NotificacaoLeitura (lida/dispensada) e em Usuario.notificacoes_lidas_ate.
+
+def expr_lida(usuario):
+    """Expressão SQL do estado 'lida' de uma notificação para o usuário."""
+    return case(
+        (Notificacao.usuario_id.isnot(None), Notificacao.lida),
+        else_=or_(
+            Notificacao.id <= usuario.notificacoes_lidas_ate,
+            func.coalesce(NotificacaoLeitura.lida, False)
+        )
+    )
+
+
+def consulta_visiveis(usuario):
+    """Notificações pessoais e gerais visíveis ao usuário, com o estado 'lida'."""
+    return db.session.query(Notificacao, expr_lida(usuario).label("lida"))\
+        .outerjoin(NotificacaoLeitura, and_(
+            NotificacaoLeitura.notificacao_id == Notificacao.id,
+            NotificacaoLeitura.usuario_id == usuario.id
+        ))\
+        .filter(or_(
+            Notificacao.usuario_id == usuario.id,
+            and_(Notificacao.usuario_id.is_(None), Notificacao.criado_em >= usuario.criado_em)
+        ))\
+        .filter(func.coalesce(NotificacaoLeitura.excluida, False) == False)  # noqa: E712
+
+
+def registrar_leitura(notificacao_id, usuario_id, **campos):
+    """Cria ou atualiza o recibo do usuário para uma notificação geral (sem commit)."""
+    leitura = db.session.get(NotificacaoLeitura, (notificacao_id, usuario_id))
+    if not leitura:
+        leitura = NotificacaoLeitura(notificacao_id=notificacao_id, usuario_id=usuario_id)
+        db.session.add(leitura)
+    for campo, valor in campos.items():
+        setattr(leitura, campo, valor)
+    return leitura
+
+
+# ================================
+# CONTADOR DE NÃO LIDAS
+# ================================
+
+def contar_gerais_nao_lidas(usuario):
+    """
+    Notificações gerais não lidas do usuário: as posteriores à marca d'água
+    (notificacoes_lidas_ate) sem recibo de lida/dispensada. Percorre só as
+    gerais acima da marca, com o recibo lido pela chave primária.
+    """
+    return consulta_visiveis(usuario)\
+        .filter(
+            Notificacao.usuario_id.is_(None),
+            Notificacao.id > usuario.notificacoes_lidas_ate,
+            func.coalesce(NotificacaoLeitura.lida, False) == False  # noqa: E712
+        )\
+        .order_by(None)\
+        .count()
+
+
+def contar_nao_lidas(usuario_id):
+    """Contador desnormalizado das pessoais + gerais derivadas da marca d'água."""
+    usuario = db.session.get(Usuario, usuario_id)
+    if not usuario:
+        return 0
+    return (usuario.notificacoes_nao_lidas or 0) + contar_gerais_nao_lidas(usuario)
+
+
+def ajustar_nao_lidas(usuario_id, delta):
+    """
+    Incrementa/decrementa o contador de notificações pessoais com UPDATE
+    atômico no banco (sem commit). Notificações gerais não passam por aqui:
+    são contadas por contar_gerais_nao_lidas, sem escrever em usuarios.
+    """
+    query = Usuario.query.filter(Usuario.id == usuario_id)
+    if delta < 0:
+        query = query.filter(Usuario.notificacoes_nao_lidas >= -delta)
+    query.update(
+        {Usuario.notificacoes_nao_lidas: Usuario.notificacoes_nao_lidas + delta},
+        synchronize_session=False
+    )
+
+
+def reconciliar_contadores_nao_lidas():
+    """
+    Recalcula o contador de notificações pessoais não lidas de todos os
+    usuários corrigindo qualquer divergência. Retorna quantos foram corrigidos.
+    """
+    pessoais = dict(
+        db.session.query(Notificacao.usuario_id, func.count(Notificacao.id))
+        .filter(Notificacao.usuario_id.isnot(None), Notificacao.lida == False)  # noqa: E712
+        .group_by(Notificacao.usuario_id)
+        .all()
+    )
+
+    # Só as colunas do contador: roda nas migrações, antes de usuarios ter
+    # todas as colunas do modelo
+    divergentes = [
+        {"ref_usuario": usuario_id, "nao_lidas": pessoais.get(usuario_id, 0)}
+        for usuario_id, atual in db.session.execute(
+            select(Usuario.id, Usuario.notificacoes_nao_lidas)
+        )
+        if atual != pessoais.get(usuario_id, 0)
+    ]
+    if divergentes:
+        tabela = Usuario.__table__
+        db.session.execute(
+            update(tabela)
+            .where(tabela.c.id == bindparam("ref_usuario"))
+            .values(notificacoes_nao_lidas=bindparam("nao_lidas"), atualizado_em=tabela.c.atualizado_em),
+            divergentes,
+        )
+
+    db.session.commit()
+    return len(divergentes)
+
+
+def publicar_contador(usuario_id):
+    """Envia o contador atualizado às conexões SSE do usuário (se houver)."""
+    if hub_eventos.tem_assinantes(usuario_id):
+        hub_eventos.publicar(usuario_id, "contador", {"nao_lidas": contar_nao_lidas(usuario_id)})
+
 
 @bp.get('/api/notificacoes')
 @login_required
 def listar_notificacoes():
-    """Lista notificações do usuário logado."""
+    """Lista notificações (pessoais e gerais) do usuário logado."""
     try:
+        usuario = db.session.get(Usuario, g.usuario_id)
+        lida = expr_lida(usuario)
+
         # Busca notificações não lidas primeiro, depois as lidas
-        notificacoes = Notificacao.query.filter_by(usuario_id=g.usuario_id)\
-            .order_by(Notificacao.lida.asc(), desc(Notificacao.criado_em))\
+        linhas = consulta_visiveis(usuario)\
+            .order_by(lida.asc(), desc(Notificacao.criado_em))\
             .limit(50)\
             .all()
 
-        resultado = []
-        for notif in notificacoes:
-            resultado.append({
-                "id": notif.id,
-                "tipo": notif.tipo,
-                "titulo": notif.titulo,
-                "mensagem": notif.mensagem,
-                "dados_referencia": notif.dados_referencia,
-                "lida": notif.lida,
-                "prioridade": notif.prioridade,
-                "criado_em": notif.criado_em.isoformat() if notif.criado_em else None
-            })
-
-        return jsonify(resultado)
+        return jsonify([notificacao_to_dict(notif, lida) for notif, lida in linhas])
 
     except Exception as e:
         print(f"Erro ao listar notificações: {e}")
@@ -44,16 +195,21 @@ def listar_notificacoes():
 def marcar_como_lida(notificacao_id):
     """Marca uma notificação como lida."""
     try:
-        notificacao = Notificacao.query.filter_by(
-            id=notificacao_id,
-            usuario_id=g.usuario_id
-        ).first()
+        usuario = db.session.get(Usuario, g.usuario_id)
+        linha = consulta_visiveis(usuario).filter(Notificacao.id == notificacao_id).first()
 
-        if not notificacao:
+        if not linha:
             return jsonify({"erro": "Notificação não encontrada"}), 404
 
-        notificacao.lida = True
+        notificacao, lida = linha
+        if not lida:
+            if notificacao.usuario_id is None:
+                registrar_leitura(notificacao.id, usuario.id, lida=True)
+            else:
+                notificacao.lida = True
+                ajustar_nao_lidas(usuario.id, -1)
         db.session.commit()
+        publicar_contador(g.usuario_id)
 
         return jsonify({"sucesso": True})
 
@@ -73,7 +229,19 @@ def marcar_todas_lidas():
             lida=False
         ).update({"lida": True})
 
+        # Notificações gerais: avança a marca d'água em vez de gravar um recibo por notificação
+        ultima_geral = db.session.query(func.max(Notificacao.id))\
+            .filter(Notificacao.usuario_id.is_(None)).scalar() or 0
+        Usuario.query.filter(Usuario.id == g.usuario_id).update(
+            {
+                Usuario.notificacoes_nao_lidas: 0,
+                Usuario.notificacoes_lidas_ate: ultima_geral
+            },
+            synchronize_session=False
+        )
+
         db.session.commit()
+        publicar_contador(g.usuario_id)
 
         return jsonify({"sucesso": True})
 
@@ -86,18 +254,23 @@ def marcar_todas_lidas():
 @bp.delete('/api/notificacoes/<int:notificacao_id>')
 @login_required
 def excluir_notificacao(notificacao_id):
-    """Exclui uma notificação."""
+    """Exclui uma notificação (notificações gerais são apenas dispensadas para o usuário)."""
     try:
-        notificacao = Notificacao.query.filter_by(
-            id=notificacao_id,
-            usuario_id=g.usuario_id
-        ).first()
+        usuario = db.session.get(Usuario, g.usuario_id)
+        linha = consulta_visiveis(usuario).filter(Notificacao.id == notificacao_id).first()
 
-        if not notificacao:
+        if not linha:
             return jsonify({"erro": "Notificação não encontrada"}), 404
 
-        db.session.delete(notificacao)
+        notificacao, lida = linha
+        if not lida and notificacao.usuario_id is not None:
+            ajustar_nao_lidas(usuario.id, -1)
+        if notificacao.usuario_id is None:
+            registrar_leitura(notificacao.id, usuario.id, excluida=True)
+        else:
+            db.session.delete(notificacao)
         db.session.commit()
+        publicar_contador(g.usuario_id)
 
         return jsonify({"sucesso": True})
 
@@ -112,10 +285,7 @@ def excluir_notificacao(notificacao_id):
 def contador_notificacoes():
     """Retorna o número de notificações não lidas."""
     try:
-        contador = Notificacao.query.filter_by(
-            usuario_id=g.usuario_id,
-            lida=False
-        ).count()
+        contador = contar_nao_lidas(g.usuario_id)
 
         return jsonify({"nao_lidas": contador})
 
@@ -124,189 +294,377 @@ def contador_notificacoes():
         return jsonify({"erro": "Erro interno do servidor"}), 500
 
 
+@bp.post('/api/notificacoes/stream/ticket')
+@login_required
+def ticket_stream_notificacoes():
+    """Ticket de curta duração para abrir o stream SSE (?ticket=)."""
+    return jsonify({
+        "ticket": gerar_ticket_stream(g.token_payload),
+        "expira_em": STREAM_TICKET_SEGUNDOS
+    })
+
+
+@bp.get('/api/notificacoes/stream')
+def stream_notificacoes():
+    """
+    Stream SSE com novas notificações e mudanças no contador de não lidas.
+    O EventSource do navegador não envia cabeçalhos, então aceita o ticket de
+    POST /api/notificacoes/stream/ticket em ?ticket= (o token de sessão só
+    pelo cabeçalho Authorization). A conexão é encerrada com o evento
+    "expirado" quando o token de sessão vence, o usuário é desativado ou
+    troca a senha.
+    O hub de eventos é por processo: com vários workers, o heartbeat relê o
+    contador do banco e o envia se mudou, então o badge nunca fica parado por
+    mais que INTERVALO_HEARTBEAT (novas notificações de outro worker chegam
+    pela lista ao abrir o painel).
+    Cada conexão mantém uma thread ocupada: use servidor com threads/gevent.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    ticket = request.args.get('ticket')
+    token = ticket or (auth_header.split(' ')[1] if auth_header.startswith('Bearer ') else None)
+    if not token:
+        return jsonify({
+            "erro": "Token de autenticação ausente",
+            "mensagem": "Acesso negado. Ticket do stream necessário."
+        }), 401
+
+    try:
+        payload = verificar_token_jwt(token, FINALIDADE_STREAM if ticket else None)
+    except jwt.InvalidTokenError as e:
+        return jsonify({"erro": "Token inválido", "mensagem": str(e)}), 401
+
+    usuario_id = payload["user_id"]
+    expira_em = payload["sessao_exp"] if ticket else payload["exp"]
+    app = current_app._get_current_object()
+    nao_lidas = contar_nao_lidas(usuario_id)
+    fila = hub_eventos.assinar(usuario_id)
+
+    def gerar_eventos():
+        ultimo_contador = nao_lidas
+        try:
+            yield formatar_sse("contador", {"nao_lidas": nao_lidas})
+            while True:
+                restante = expira_em - time.time()
+                if restante <= 0:
+                    break
+                try:
+                    evento, dados = fila.get(timeout=min(INTERVALO_HEARTBEAT, restante))
+                except queue.Empty:
+                    # Contexto próprio a cada verificação: o stream não segura conexão do banco
+                    with app.app_context():
+                        if not sessao_valida(payload):
+                            break
+                        contador = contar_nao_lidas(usuario_id)
+                    if contador != ultimo_contador:
+                        ultimo_contador = contador
+                        yield formatar_sse("contador", {"nao_lidas": contador})
+                    else:
+                        yield ": ping\n\n"
+                    continue
+                if evento == "contador":
+                    ultimo_contador = dados["nao_lidas"]
+                yield formatar_sse(evento, dados)
+            yield formatar_sse("expirado", {})
+        finally:
+            hub_eventos.cancelar(usuario_id, fila)
+
+    return Response(
+        gerar_eventos(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ================================
 # FUNÇÕES PARA CRIAR NOTIFICAÇÕES
 # ================================
-
-def criar_notificacao_os_atrasada(os, usuario_id):
-    """Cria notificação para OS atrasada."""
-    titulo = f"OS {os.numero_os} - Prazo Vencido"
-    mensagem = f"Cliente {os.cliente.nome} aguardando retorno. Prazo estimado excedido."
-
-    notificacao = Notificacao(
+# Sem usuario_id, as notificações são gerais (uma linha para todos os usuários).
+
+def chave_dedup(tipo, referencia_id):
+    return f"{tipo}:{referencia_id}"
+
+
+def chaves_existentes(chaves):
+    """Chaves de deduplicação já gravadas (busca pelo índice único)."""
+    if not chaves:
+        return set()
+    return {
+        chave for (chave,) in db.session.query(Notificacao.chave_dedup)
+        .filter(Notificacao.chave_dedup.in_(chaves)).all()
+    }
+
+
+def registrar_notificacoes(notificacoes):
+    """
+    Adiciona notificações à sessão, atualiza os contadores de não lidas e
+    agenda a publicação via SSE após o commit (não faz commit).
+    Notificações com chave_dedup funcionam como insert-or-ignore: se a chave
+    já existir, são descartadas. Retorna as notificações efetivamente criadas.
+    """
+    existentes = chaves_existentes({n.chave_dedup for n in notificacoes if n.chave_dedup})
+
+    novas = []
+    for notificacao in notificacoes:
+        if not notificacao.chave_dedup:
+            db.session.add(notificacao)
+        elif notificacao.chave_dedup in existentes:
+            continue
+        else:
+            # Savepoint por linha: outra execução concorrente pode ter gravado a mesma chave
+            try:
+                with db.session.begin_nested():
+                    db.session.add(notificacao)
+            except IntegrityError:
+                continue
+        existentes.add(notificacao.chave_dedup)
+        novas.append(notificacao)
+
+    novas_por_usuario = {}
+    for notificacao in novas:
+        novas_por_usuario[notificacao.usuario_id] = novas_por_usuario.get(notificacao.usuario_id, 0) + 1
+        publicar_apos_commit(
+            notificacao.usuario_id,
+            "notificacao",
+            lambda n=notificacao: notificacao_to_dict(n)
+        )
+
+    # Gerais (usuario_id=None) entram na contagem pela marca d'água, sem UPDATE em usuarios
+    for usuario_id, quantidade in novas_por_usuario.items():
+        if usuario_id is not None:
+            ajustar_nao_lidas(usuario_id, quantidade)
+
+    return novas
+
+
+def nova_notificacao_os_atrasada(os, usuario_id=None):
+    return Notificacao(
         tipo="os_atrasada",
-        titulo=titulo,
-        mensagem=mensagem,
+        titulo=f"OS {os.numero_os} - Prazo Vencido",
+        mensagem=f"Cliente {os.cliente.nome} aguardando retorno. Prazo estimado excedido.",
         dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
         prioridade="alta",
-        usuario_id=usuario_id
+        usuario_id=usuario_id,
+        # Deduplicação apenas das notificações gerais
+        chave_dedup=chave_dedup("os_atrasada", os.id) if usuario_id is None else None
     )
-    db.session.add(notificacao)
 
 
-def criar_notificacao_estoque_critico(produto, usuario_id):
-    """Cria notificação para estoque crítico."""
-    titulo = f"{produto.nome} - Estoque Crítico"
-    mensagem = f"Apenas {produto.quantidade} unidades disponíveis (mínimo: {produto.estoque_minimo})."
-
-    notificacao = Notificacao(
+def nova_notificacao_estoque_critico(produto, usuario_id=None):
+    return Notificacao(
         tipo="estoque_critico",
-        titulo=titulo,
-        mensagem=mensagem,
+        titulo=f"{produto.nome} - Estoque Crítico",
+        mensagem=f"Apenas {produto.quantidade} unidades disponíveis (mínimo: {produto.estoque_minimo}).",
         dados_referencia={"produto_id": produto.id},
         prioridade="alta",
-        usuario_id=usuario_id
+        usuario_id=usuario_id,
+        # Deduplicação apenas das notificações gerais
+        chave_dedup=chave_dedup("estoque_critico", produto.id) if usuario_id is None else None
     )
-    db.session.add(notificacao)
 
 
-def criar_notificacao_os_pronta(os, usuario_id):
-    """Cria notificação para OS pronta."""
-    titulo = f"OS {os.numero_os} - Pronta para Retirada"
-    mensagem = f"Aparelho de {os.cliente.nome} está pronto. Cliente deve ser contactado."
-
-    notificacao = Notificacao(
+def nova_notificacao_os_pronta(os, usuario_id=None):
+    return Notificacao(
         tipo="os_pronta",
-        titulo=titulo,
-        mensagem=mensagem,
+        titulo=f"OS {os.numero_os} - Pronta para Retirada",
+        mensagem=f"Aparelho de {os.cliente.nome} está pronto. Cliente deve ser contactado.",
         dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
         prioridade="normal",
-        usuario_id=usuario_id
+        usuario_id=usuario_id,
+        # Deduplicação apenas das notificações gerais
+        chave_dedup=chave_dedup("os_pronta", os.id) if usuario_id is None else None
     )
-    db.session.add(notificacao)
 
 
-def criar_notificacao_cliente_novo(cliente, usuario_id):
-    """Cria notificação para novo cliente."""
-    titulo = f"Novo Cliente Cadastrado"
-    mensagem = f"{cliente.nome} foi adicionado à base de dados."
+def criar_notificacao_os_atrasada(os, usuario_id=None):
+    """Cria notificação para OS atrasada."""
+    registrar_notificacoes([nova_notificacao_os_atrasada(os, usuario_id)])
+
 
-    notificacao = Notificacao(
+def criar_notificacao_estoque_critico(produto, usuario_id=None):
+    """Cria notificação para estoque crítico."""
+    registrar_notificacoes([nova_notificacao_estoque_critico(produto, usuario_id)])
+
+
+def criar_notificacao_os_pronta(os, usuario_id=None):
+    """
+    Cria notificação para OS pronta. Cada nova entrada em "pronto" gera um
+    aviso: a chave da notificação anterior desta OS é liberada e passa para a
+    nova, que a verificação automática continua deduplicando.
+    """
+    if usuario_id is None:
+        tabela = Notificacao.__table__
+        db.session.execute(
+            update(tabela)
+            .where(tabela.c.chave_dedup == chave_dedup("os_pronta", os.id))
+            .values(chave_dedup=None, atualizado_em=tabela.c.atualizado_em)
+        )
+    registrar_notificacoes([nova_notificacao_os_pronta(os, usuario_id)])
+
+
+def criar_notificacao_cliente_novo(cliente, usuario_id=None):
+    """Cria notificação para novo cliente."""
+    registrar_notificacoes([Notificacao(
         tipo="cliente_novo",
-        titulo=titulo,
-        mensagem=mensagem,
+        titulo="Novo Cliente Cadastrado",
+        mensagem=f"{cliente.nome} foi adicionado à base de dados.",
         dados_referencia={"cliente_id": cliente.id},
         prioridade="baixa",
         usuario_id=usuario_id
-    )
-    db.session.add(notificacao)
+    )])
+
+
+# ================================
+# VERIFICAÇÃO INCREMENTAL
+# ================================
+
+def ler_checkpoint(fonte):
+    """Início da janela a verificar para a fonte (None = varredura completa)."""
+    checkpoint = db.session.get(CheckpointVerificacao, fonte)
+    return checkpoint.processado_ate - MARGEM_CHECKPOINT if checkpoint else None
+
+
+def salvar_checkpoint(fonte, processado_ate):
+    checkpoint = db.session.get(CheckpointVerificacao, fonte)
+    if not checkpoint:
+        checkpoint = CheckpointVerificacao(fonte=fonte)
+        db.session.add(checkpoint)
+    checkpoint.processado_ate = processado_ate
+
+
+def preencher_prazos_limite(lote=1000):
+    """
+    Backfill de OrdemServico.prazo_limite para OS gravadas antes da coluna
+    existir (executado na inicialização). Mantém atualizado_em: a data de
+    entrega das OS entregues e a varredura incremental dependem dela.
+    Sem a coluna no banco só avisa (crie com migrar_prazo_limite.py).
+    """
+    colunas = {c["name"] for c in inspect(db.engine).get_columns("ordens_servico")}
+    if "prazo_limite" not in colunas:
+        print("Aviso: Coluna ordens_servico.prazo_limite ausente; execute migrar_prazo_limite.py")
+        return
+
+    tabela = OrdemServico.__table__
+    ultimo_id = 0
+    while True:
+        linhas = db.session.execute(
+            select(OrdemServico.id, OrdemServico.criado_em, OrdemServico.prazo_estimado)
+            .where(OrdemServico.id > ultimo_id, OrdemServico.prazo_limite.is_(None))
+            .order_by(OrdemServico.id)
+            .limit(lote)
+        ).all()
+        if not linhas:
+            db.session.commit()
+            return
+        db.session.execute(
+            update(tabela)
+            .where(tabela.c.id == bindparam("os_id"))
+            .values(prazo_limite=bindparam("prazo"), atualizado_em=tabela.c.atualizado_em),
+            [
+                {
+                    "os_id": linha.id,
+                    "prazo": (linha.criado_em or datetime.now())
+                    + timedelta(days=linha.prazo_estimado or 3),
+                }
+                for linha in linhas
+            ],
+        )
+        ultimo_id = linhas[-1].id
 
 
 def verificar_e_criar_notificacoes():
-    """Verifica condições do sistema e cria notificações automaticamente."""
+    """
+    Verifica condições do sistema e cria notificações gerais automaticamente.
+    A verificação é incremental: só avalia OS/produtos alterados desde o último
+    checkpoint e OS cujo prazo_limite venceu desde a última execução.
+    """
     try:
-        from datetime import datetime, timedelta
-        hoje = datetime.utcnow()
+        agora = datetime.now()
 
-        # Busca todos os usuários ativos
-        usuarios_ids = [u.id for u in Usuario.query.filter_by(ativo=True).all()]
-
-        if not usuarios_ids:
+        if not Usuario.query.filter_by(ativo=True).first():
             print("Nenhum usuário ativo encontrado")
             return
 
-        notificacoes_para_criar = []
+        desde_os = ler_checkpoint("ordens_servico")
+        desde_produtos = ler_checkpoint("produtos_estoque")
+        desde_prazos = ler_checkpoint("prazos")
+
+        # Chave de deduplicação -> função que monta a notificação (só chamada se for nova)
+        candidatas = {}
 
         # === VERIFICA OS ATRASADAS ===
-        os_atrasadas = OrdemServico.query.filter(
+        # Prazos que venceram desde a última execução + OS alteradas desde então
+        em_aberto = OrdemServico.query.options(joinedload(OrdemServico.cliente)).filter(
             OrdemServico.status.in_(['aguardando', 'em_reparo']),
-            OrdemServico.criado_em + timedelta(days=OrdemServico.prazo_estimado) < hoje
-        ).all()
+            OrdemServico.prazo_limite < agora
+        )
+        if desde_prazos and desde_os:
+            os_atrasadas = em_aberto.filter(OrdemServico.prazo_limite >= desde_prazos).all()
+            os_atrasadas += em_aberto.filter(OrdemServico.atualizado_em >= desde_os).all()
+        else:
+            os_atrasadas = em_aberto.all()
 
-        if os_atrasadas:
-            # Busca notificações existentes para OS atrasadas
-            os_ids_existentes = {os.id for os in os_atrasadas}
-            notificacoes_existentes_os = Notificacao.query.filter(
-                Notificacao.tipo == "os_atrasada",
-                Notificacao.usuario_id.in_(usuarios_ids),
-                Notificacao.dados_referencia['os_id'].astext.cast(db.Integer).in_(os_ids_existentes)
-            ).all()
-
-            # Mapeia quais combinações já existem
-            existentes_map = {(n.usuario_id, n.dados_referencia.get('os_id')) for n in notificacoes_existentes_os}
-
-            # Cria notificações apenas para combinações que não existem
-            for usuario_id in usuarios_ids:
-                for os in os_atrasadas:
-                    if (usuario_id, os.id) not in existentes_map:
-                        notificacao = Notificacao(
-                            tipo="os_atrasada",
-                            titulo=f"OS {os.numero_os} - Prazo Vencido",
-                            mensagem=f"Cliente {os.cliente.nome} aguardando retorno. Prazo estimado excedido.",
-                            dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
-                            prioridade="alta",
-                            usuario_id=usuario_id
-                        )
-                        notificacoes_para_criar.append(notificacao)
+        for os in os_atrasadas:
+            candidatas[chave_dedup("os_atrasada", os.id)] = lambda os=os: nova_notificacao_os_atrasada(os)
 
         # === VERIFICA ESTOQUE CRÍTICO ===
         produtos_criticos = ProdutoEstoque.query.filter(
             ProdutoEstoque.quantidade <= ProdutoEstoque.estoque_minimo
-        ).all()
+        )
+        if desde_produtos:
+            produtos_criticos = produtos_criticos.filter(ProdutoEstoque.atualizado_em >= desde_produtos)
 
-        if produtos_criticos:
-            # Busca notificações existentes para produtos críticos
-            produto_ids_existentes = {p.id for p in produtos_criticos}
-            notificacoes_existentes_prod = Notificacao.query.filter(
-                Notificacao.tipo == "estoque_critico",
-                Notificacao.usuario_id.in_(usuarios_ids),
-                Notificacao.dados_referencia['produto_id'].astext.cast(db.Integer).in_(produto_ids_existentes)
-            ).all()
-
-            # Mapeia quais combinações já existem
-            existentes_prod_map = {(n.usuario_id, n.dados_referencia.get('produto_id')) for n in notificacoes_existentes_prod}
-
-            # Cria notificações apenas para combinações que não existem
-            for usuario_id in usuarios_ids:
-                for produto in produtos_criticos:
-                    if (usuario_id, produto.id) not in existentes_prod_map:
-                        notificacao = Notificacao(
-                            tipo="estoque_critico",
-                            titulo=f"{produto.nome} - Estoque Crítico",
-                            mensagem=f"Apenas {produto.quantidade} unidades disponíveis (mínimo: {produto.estoque_minimo}).",
-                            dados_referencia={"produto_id": produto.id},
-                            prioridade="alta",
-                            usuario_id=usuario_id
-                        )
-                        notificacoes_para_criar.append(notificacao)
+        for produto in produtos_criticos.all():
+            candidatas[chave_dedup("estoque_critico", produto.id)] = lambda p=produto: nova_notificacao_estoque_critico(p)
 
         # === VERIFICA OS PRONTAS ===
-        os_prontas = OrdemServico.query.filter_by(status="pronto").all()
-
-        if os_prontas:
-            # Busca notificações existentes para OS prontas
-            os_prontas_ids = {os.id for os in os_prontas}
-            notificacoes_existentes_prontas = Notificacao.query.filter(
-                Notificacao.tipo == "os_pronta",
-                Notificacao.usuario_id.in_(usuarios_ids),
-                Notificacao.dados_referencia['os_id'].astext.cast(db.Integer).in_(os_prontas_ids)
-            ).all()
-
-            # Mapeia quais combinações já existem
-            existentes_prontas_map = {(n.usuario_id, n.dados_referencia.get('os_id')) for n in notificacoes_existentes_prontas}
-
-            # Cria notificações apenas para combinações que não existem
-            for usuario_id in usuarios_ids:
-                for os in os_prontas:
-                    if (usuario_id, os.id) not in existentes_prontas_map:
-                        notificacao = Notificacao(
-                            tipo="os_pronta",
-                            titulo=f"OS {os.numero_os} - Pronta para Retirada",
-                            mensagem=f"Aparelho de {os.cliente.nome} está pronto. Cliente deve ser contactado.",
-                            dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
-                            prioridade="normal",
-                            usuario_id=usuario_id
-                        )
-                        notificacoes_para_criar.append(notificacao)
-
-        # Insere todas as notificações de uma vez
-        if notificacoes_para_criar:
-            db.session.bulk_save_objects(notificacoes_para_criar)
-            db.session.commit()
-            print(f"✅ Criadas {len(notificacoes_para_criar)} notificações automaticamente")
+        os_prontas = OrdemServico.query.options(joinedload(OrdemServico.cliente))\
+            .filter_by(status="pronto")
+        if desde_os:
+            os_prontas = os_prontas.filter(OrdemServico.atualizado_em >= desde_os)
+
+        for os in os_prontas.all():
+            candidatas[chave_dedup("os_pronta", os.id)] = lambda os=os: nova_notificacao_os_pronta(os)
+
+        existentes = chaves_existentes(set(candidatas))
+        notificacoes_para_criar = [
+            montar() for chave, montar in candidatas.items() if chave not in existentes
+        ]
+
+        # Insert-or-ignore pela chave de deduplicação: só as novas são gravadas
+        novas = registrar_notificacoes(notificacoes_para_criar)
+
+        for fonte in ("ordens_servico", "produtos_estoque", "prazos"):
+            salvar_checkpoint(fonte, agora)
+        db.session.commit()
+
+        if novas:
+            print(f"✅ Criadas {len(novas)} notificações automaticamente")
         else:
             print("✅ Verificação de notificações concluída - nenhuma nova notificação necessária")
 
     except Exception as e:
         db.session.rollback()
         print(f"❌ Erro ao verificar notificações: {e}")
+        raise  # O agendador (e a rota de verificação) registram a falha
+
+
+def aplicar_retencao_notificacoes(dias):
+    """
+    Remove notificações (e seus recibos) com mais de `dias` dias e reconcilia
+    os contadores de não lidas. Retorna quantas notificações foram removidas.
+    """
+    limite = datetime.now() - timedelta(days=dias)
+    antigas = db.session.query(Notificacao.id).filter(Notificacao.criado_em < limite)
+
+    NotificacaoLeitura.query.filter(
+        NotificacaoLeitura.notificacao_id.in_(antigas)
+    ).delete(synchronize_session=False)
+    removidas = Notificacao.query.filter(
+        Notificacao.criado_em < limite
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    if removidas:
+        reconciliar_contadores_nao_lidas()
+        print(f"🧹 Retenção: {removidas} notificações antigas removidas")
+    return removidas
@@ -1,21 +1,34 @@
 from datetime import datetime, timedelta
 
-from flask import Blueprint, abort, jsonify, request
+from flask import Blueprint, abort, current_app, jsonify, request
+from sqlalchemy import func, select
 from sqlalchemy.orm import joinedload
 
 from extensions import db
-from models import Cliente, OrdemServico, Usuario
+from models import Cliente, OrdemServico, TarefaIA
 from auth_utils import login_required
+from sequencias_utils import proximo_valor
 from routes_notificacoes import criar_notificacao_os_pronta
-from ai_utils import gerar_resumo
+from routes_financeiro import atualizar_resumo_financeiro
+from ai_utils import gerar_pre_diagnostico, gerar_resumo
+from fila_ia import tarefa_ia_to_dict
+from listagem_utils import (
+    LIMITE_MAXIMO_PAGINA,
+    LIMITE_PADRAO_PAGINA,
+    codificar_cursor,
+    decodificar_cursor,
+    filtro_apos_cursor,
+    ordem_keyset,
+    resposta_json_stream,
+)
 
 bp = Blueprint("os", __name__)
 
-
 def os_to_dict(os_obj: OrdemServico, incluir_cliente: bool = True) -> dict:
     data_criacao = os_obj.criado_em or datetime.utcnow()
-    prazo_estimado = os_obj.prazo_estimado or 3
-    prazo_limite = data_criacao + timedelta(days=prazo_estimado)
+    prazo_limite = os_obj.prazo_limite or (
+        data_criacao + timedelta(days=os_obj.prazo_estimado or 3)
+    )
 
     base = {
         "id": os_obj.id,
@@ -43,32 +56,112 @@ def os_to_dict(os_obj: OrdemServico, incluir_cliente: bool = True) -> dict:
     return base
 
 
+def _maior_numero_os(conexao) -> int:
+    """Maior número já usado (semeia a sequência em bancos existentes)."""
+    maior = 0
+    for (numero_os,) in conexao.execute(select(OrdemServico.numero_os)):
+        try:
+            maior = max(maior, int((numero_os or "").replace("#", "").replace("OS", "")))
+        except ValueError:
+            continue
+    return maior
+
+
 def gerar_proximo_numero_os() -> str:
-    ultimo = (
-        OrdemServico.query.order_by(OrdemServico.id.desc()).with_entities(
-            OrdemServico.numero_os
-        )
-    ).first()
-    if not ultimo or not ultimo[0]:
-        return "#OS0001"
+    prox = proximo_valor(
+        "numero_os",
+        bloco=current_app.config["OS_NUMERO_BLOCO"],
+        valor_inicial=_maior_numero_os,
+    )
+    return f"#OS{prox:04d}"
+
 
-    numero = ultimo[0].replace("#", "").replace("OS", "")
+def _parse_data(valor: str, campo: str) -> datetime:
     try:
-        prox = int(numero) + 1
+        return datetime.fromisoformat(valor)
     except ValueError:
-        prox = 1
-    return f"#OS{prox:04d}"
+        abort(400, description=f"Data inválida em '{campo}' (use o formato AAAA-MM-DD)")
+
+
+def filtros_os(args) -> list:
+    """Monta os filtros de listagem a partir da query string."""
+    filtros = []
+
+    if args.get("status"):
+        filtros.append(OrdemServico.status.in_(args["status"].split(",")))
+    if args.get("prioridade"):
+        filtros.append(OrdemServico.prioridade.in_(args["prioridade"].split(",")))
+    if args.get("clienteId"):
+        try:
+            filtros.append(OrdemServico.cliente_id == int(args["clienteId"]))
+        except ValueError:
+            abort(400, description="clienteId deve ser numérico")
+    if args.get("dataInicio"):
+        filtros.append(
+            OrdemServico.criado_em >= _parse_data(args["dataInicio"], "dataInicio")
+        )
+    if args.get("dataFim"):
+        data_fim = _parse_data(args["dataFim"], "dataFim")
+        # Data sem horário inclui o dia inteiro
+        if len(args["dataFim"]) <= 10:
+            data_fim += timedelta(days=1)
+            filtros.append(OrdemServico.criado_em < data_fim)
+        else:
+            filtros.append(OrdemServico.criado_em <= data_fim)
+
+    return filtros
 
 
 @bp.get("/")
 @login_required
 def listar_os():
-    ordens = (
+    """
+    Lista OS com filtros opcionais (status, prioridade, clienteId, dataInicio,
+    dataFim). Com `limite` ou `cursor` a resposta é paginada por keyset em
+    (criado_em, id); `incluirTotal=1` adiciona a contagem total filtrada.
+    """
+    args = request.args
+    filtros = filtros_os(args)
+
+    query = (
         OrdemServico.query.options(joinedload(OrdemServico.cliente))
-        .order_by(OrdemServico.criado_em.desc())
-        .all()
+        .filter(*filtros)
+        .order_by(*ordem_keyset(OrdemServico.criado_em, OrdemServico.id))
     )
-    return jsonify([os_to_dict(o) for o in ordens])
+
+    paginado = "limite" in args or "cursor" in args
+    if not paginado:
+        # Modo legado: lista completa (apenas filtrada), enviada em streaming
+        return resposta_json_stream(query, os_to_dict)
+
+    try:
+        limite = int(args.get("limite") or LIMITE_PADRAO_PAGINA)
+    except ValueError:
+        abort(400, description="limite deve ser numérico")
+    limite = max(1, min(limite, LIMITE_MAXIMO_PAGINA))
+
+    if args.get("cursor"):
+        criado_em, os_id = decodificar_cursor(args["cursor"])
+        query = query.filter(
+            filtro_apos_cursor(OrdemServico.criado_em, OrdemServico.id, criado_em, os_id)
+        )
+
+    # Busca um registro a mais para saber se existe próxima página
+    ordens = query.limit(limite + 1).all()
+    tem_mais = len(ordens) > limite
+    ordens = ordens[:limite]
+
+    resultado = {
+        "itens": [os_to_dict(o) for o in ordens],
+        "proximoCursor": codificar_cursor(ordens[-1]) if tem_mais else None,
+    }
+
+    if args.get("incluirTotal") in ("1", "true"):
+        resultado["total"] = (
+            db.session.query(func.count(OrdemServico.id)).filter(*filtros).scalar()
+        )
+
+    return jsonify(resultado)
 
 
 @bp.post("/")
@@ -107,31 +200,17 @@ def criar_os():
     )
 
     db.session.add(os_obj)
+    atualizar_resumo_financeiro(os_obj)
+
+    # Resumo por IA na fila persistente (não bloqueia a resposta); o
+    # pré-diagnóstico só quando pedido (preDiagnosticoIa ou POST .../ia/pre-diagnostico)
+    fila_ia = current_app.extensions["fila_ia"]
+    db.session.flush()
+    fila_ia.enfileirar("resumo", os_obj.id)
+    if data.get("preDiagnosticoIa") and not os_obj.diagnostico_tecnico:
+        fila_ia.enfileirar("pre_diagnostico", os_obj.id)
     db.session.commit()
-
-    # Gera resumo automático usando IA em background (não bloqueia resposta)
-    try:
-        from threading import Thread
-
-        def gerar_resumo_background():
-            try:
-                resumo_ia = gerar_resumo(data["problemaRelatado"])
-                # Atualizar observações com o resumo da IA se não houver observações
-                if not os_obj.observacoes:
-                    os_obj.observacoes = f"[IA] Resumo: {resumo_ia}"
-                    db.session.commit()
-                print(f"✅ Resumo IA gerado para OS {os_obj.numero_os}")
-            except Exception as e:
-                print(
-                    f"Aviso: Não foi possível gerar resumo automático para OS {os_obj.numero_os}: {e}"
-                )
-
-        # Executa em thread separada para não bloquear resposta
-        thread = Thread(target=gerar_resumo_background, daemon=True)
-        thread.start()
-    except Exception as e:
-        print(f"Aviso: Não foi possível iniciar geração de resumo em background: {e}")
-        # Não afeta a criação da OS se falhar
+    fila_ia.acordar()
 
     return jsonify(os_to_dict(os_obj)), 201
 
@@ -182,14 +261,15 @@ def atualizar_os(os_id: int):
     if "valorOrcamento" in data:
         os_obj.valor_orcamento = data["valorOrcamento"]
 
+    if "status" in data or "valorOrcamento" in data:
+        atualizar_resumo_financeiro(os_obj)
+
     db.session.commit()
 
-    # Criar notificação se o status mudou para "pronto"
+    # Criar notificação geral se o status mudou para "pronto"
     if status_anterior != "pronto" and novo_status == "pronto":
         try:
-            usuarios = Usuario.query.filter_by(ativo=True).all()
-            for usuario in usuarios:
-                criar_notificacao_os_pronta(os_obj, usuario.id)
+            criar_notificacao_os_pronta(os_obj)
             db.session.commit()
         except Exception as e:
             print(f"Aviso: Não foi possível criar notificações para OS pronta: {e}")
@@ -198,6 +278,58 @@ def atualizar_os(os_id: int):
     return jsonify(os_to_dict(os_obj))
 
 
+@bp.get("/<int:os_id>/ia")
+@login_required
+def status_ia_os(os_id):
+    """Status das tarefas de IA em segundo plano da OS."""
+    OrdemServico.query.get_or_404(os_id)
+    tarefas = (
+        TarefaIA.query.filter_by(os_id=os_id).order_by(TarefaIA.id.desc()).all()
+    )
+    # Apenas a tarefa mais recente de cada tipo
+    por_tipo = {}
+    for tarefa in tarefas:
+        por_tipo.setdefault(tarefa.tipo, tarefa_ia_to_dict(tarefa))
+    return jsonify(por_tipo)
+
+
+@bp.post("/<int:os_id>/ia/pre-diagnostico")
+@login_required
+def solicitar_pre_diagnostico_os(os_id):
+    """Enfileira o pré-diagnóstico por IA da OS (resultado em /api/os/<id>/ia)."""
+    OrdemServico.query.get_or_404(os_id)
+    fila_ia = current_app.extensions["fila_ia"]
+    tarefa = fila_ia.enfileirar("pre_diagnostico", os_id)
+    db.session.commit()
+    fila_ia.acordar()
+    return jsonify(tarefa_ia_to_dict(tarefa)), 202
+
+
+# Tarefas da fila de IA: recebem o id da OS e retornam o texto gerado.
+# Alterações na sessão são gravadas junto com a conclusão da tarefa.
+
+def resumir_os_ia(os_id: int) -> str:
+    """Gera o resumo e grava nas observações, se estiverem vazias."""
+    os_obj = db.session.get(OrdemServico, os_id)
+    if not os_obj:
+        return None
+    resumo_ia = gerar_resumo(os_obj.problema_relatado, fallback=False)
+    if not os_obj.observacoes:
+        os_obj.observacoes = f"[IA] Resumo: {resumo_ia}"
+    print(f"✅ Resumo IA gerado para OS {os_obj.numero_os}")
+    return resumo_ia
+
+
+def pre_diagnosticar_os_ia(os_id: int) -> str:
+    """Gera o pré-diagnóstico da OS (consultável em /api/os/<id>/ia)."""
+    os_obj = db.session.get(OrdemServico, os_id)
+    if not os_obj:
+        return None
+    return gerar_pre_diagnostico(
+        os_obj.tipo_aparelho, os_obj.marca_modelo, os_obj.problema_relatado, fallback=False
+    )
+
+
 @bp.get("/status/<numero_os>")
 def consultar_status_os_publico(numero_os: str):
     """Rota pública para consulta de status da OS por clientes."""
@@ -232,7 +364,10 @@ def consultar_status_os_publico(numero_os: str):
                 os_obj.atualizado_em.isoformat() if os_obj.atualizado_em else None
             ),
             "prazoLimite": (
-                (os_obj.criado_em + timedelta(days=os_obj.prazo_estimado)).isoformat()
+                (
+                    os_obj.prazo_limite
+                    or os_obj.criado_em + timedelta(days=os_obj.prazo_estimado)
+                ).isoformat()
                 if os_obj.criado_em
                 else None
             ),
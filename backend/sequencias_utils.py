@@ -0,0 +1,73 @@
+import threading
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Sequencia
+
+
+class AlocadorSequencia:
+    """
+    Aloca valores de uma sequência nomeada (tabela sequencias).
+    Cada ida ao banco reserva um bloco com um único UPDATE atômico em
+    transação própria e curta; os valores do bloco são entregues em memória
+    pelo worker, sem consultas extras. Valores reservados e não usados
+    (ex.: reinício do processo) viram lacunas na numeração.
+    """
+
+    def __init__(self, nome, valor_inicial=None):
+        self.nome = nome
+        # Função (conexao) -> int usada para semear a sequência na primeira vez
+        self.valor_inicial = valor_inicial
+        self._ultimo = 0
+        self._limite = 0
+        self._lock = threading.Lock()
+
+    def proximo(self, bloco=1) -> int:
+        with self._lock:
+            if self._ultimo >= self._limite:
+                bloco = max(1, bloco)
+                self._limite = self._reservar(bloco)
+                self._ultimo = self._limite - bloco
+            self._ultimo += 1
+            return self._ultimo
+
+    def _reservar(self, bloco) -> int:
+        """Incrementa o contador em `bloco` e retorna o novo valor (fim do bloco)."""
+        for _ in range(2):
+            with db.engine.begin() as conexao:
+                resultado = conexao.execute(
+                    update(Sequencia)
+                    .where(Sequencia.nome == self.nome)
+                    .values(valor=Sequencia.valor + bloco)
+                )
+                if resultado.rowcount == 1:
+                    # A linha continua travada por esta transação até o commit
+                    return conexao.execute(
+                        select(Sequencia.valor).where(Sequencia.nome == self.nome)
+                    ).scalar_one()
+            self._criar_linha()
+        raise RuntimeError(f"Não foi possível reservar valores da sequência {self.nome}")
+
+    def _criar_linha(self) -> None:
+        try:
+            with db.engine.begin() as conexao:
+                inicial = self.valor_inicial(conexao) if self.valor_inicial else 0
+                conexao.execute(insert(Sequencia).values(nome=self.nome, valor=inicial))
+        except IntegrityError:
+            pass  # Outro worker criou a linha
+
+
+_alocadores = {}
+_alocadores_lock = threading.Lock()
+
+
+def proximo_valor(nome, bloco=1, valor_inicial=None) -> int:
+    """Próximo valor da sequência `nome` (um alocador por banco e processo)."""
+    chave = (str(db.engine.url), nome)
+    with _alocadores_lock:
+        alocador = _alocadores.get(chave)
+        if alocador is None:
+            alocador = _alocadores[chave] = AlocadorSequencia(nome, valor_inicial)
+    return alocador.proximo(bloco)
@@ -0,0 +1,487 @@
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from extensions import db
+from models import Cliente, OrdemServico
+
+STATUS_FECHADOS = ("pronto", "entregue")
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas e sem acentos."""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def trigramas(palavra: str) -> set:
+    marcada = f" {palavra} "
+    return {marcada[i:i + 3] for i in range(len(marcada) - 2)}
+
+
+def _termos(texto: str) -> Counter:
+    """Palavras e trigramas de caracteres (tolerantes a erros de digitação)."""
+    termos = Counter()
+    for palavra in re.findall(r"\w+", normalizar_texto(texto)):
+        termos[f"w:{palavra}"] += 1
+        marcada = f" {palavra} "
+        for i in range(len(marcada) - 2):
+            termos[f"c:{marcada[i:i + 3]}"] += 1
+    return termos
+
+
+def similaridade_modelo(modelo_a, modelo_b) -> float:
+    """Palavras de marca/modelo em comum (Jaccard, 0 a 1)."""
+    palavras_a = set(re.findall(r"\w+", normalizar_texto(modelo_a)))
+    palavras_b = set(re.findall(r"\w+", normalizar_texto(modelo_b)))
+    uniao = palavras_a | palavras_b
+    return len(palavras_a & palavras_b) / len(uniao) if uniao else 0.0
+
+
+class IndiceDiagnosticos:
+    """
+    Índice TF-IDF em memória (por processo) sobre as OS fechadas com
+    diagnóstico técnico: problema relatado -> diagnóstico.
+    A similaridade é o cosseno entre os textos do problema, só entre casos do
+    mesmo tipo de aparelho; marca/modelo acrescenta um bônus pequeno
+    (PESO_MODELO), então o mesmo modelo com outro defeito não passa por caso
+    parecido.
+    Usa vetores esparsos e índice invertido em Python puro, então a busca
+    só percorre os casos que compartilham termos com a consulta.
+    O índice é carregado sob demanda e sincronizado incrementalmente pelo
+    atualizado_em das OS, o que também captura alterações de outros workers;
+    OS excluídas saem no commit (neste processo) ou na reconciliação periódica.
+    """
+
+    # Fração da pontuação final que vem da semelhança de marca/modelo
+    PESO_MODELO = 0.1
+
+    def __init__(self, intervalo_sincronizacao=30, intervalo_reconciliacao=600):
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        self.intervalo_reconciliacao = intervalo_reconciliacao
+        self._lock = threading.Lock()
+        self._casos = {}  # os_id -> dict (termos, diagnostico, metadados)
+        self._postings = {}  # termo -> {os_id: tf}
+        # idf e normas da mesma época: ambos são descartados juntos quando o
+        # tamanho do índice varia, então o cosseno nunca passa de 1
+        self._idfs = {}  # termo -> idf
+        self._normas = {}  # os_id -> norma com os idfs de _idfs
+        self._total_normas = 0  # quantidade de casos no início da época
+        self._marca_dagua = None  # atualizado_em da última OS sincronizada
+        self._ultima_sincronizacao = 0.0
+        self._ultima_reconciliacao = 0.0
+
+    # ----------------- manutenção -----------------
+
+    def sincronizar(self, forcar=False) -> None:
+        with self._lock:
+            if not forcar and time.monotonic() - self._ultima_sincronizacao < self.intervalo_sincronizacao:
+                return
+            query = select(
+                OrdemServico.id,
+                OrdemServico.numero_os,
+                OrdemServico.tipo_aparelho,
+                OrdemServico.marca_modelo,
+                OrdemServico.problema_relatado,
+                OrdemServico.diagnostico_tecnico,
+                OrdemServico.status,
+                OrdemServico.atualizado_em,
+            ).order_by(OrdemServico.atualizado_em)
+            carga_completa = self._marca_dagua is None
+            if not carga_completa:
+                query = query.where(OrdemServico.atualizado_em >= self._marca_dagua)
+
+            # Conexão própria: não interfere na transação do chamador
+            with db.engine.connect() as conexao:
+                for linha in conexao.execute(query):
+                    if linha.status in STATUS_FECHADOS and (linha.diagnostico_tecnico or "").strip():
+                        self._adicionar(linha)
+                    else:
+                        self._remover(linha.id)
+                    if linha.atualizado_em:
+                        self._marca_dagua = linha.atualizado_em
+
+                # Exclusões feitas por outros workers não aparecem no atualizado_em
+                if carga_completa:
+                    self._ultima_reconciliacao = time.monotonic()
+                elif time.monotonic() - self._ultima_reconciliacao >= self.intervalo_reconciliacao:
+                    existentes = set(
+                        conexao.execute(
+                            select(OrdemServico.id).where(OrdemServico.status.in_(STATUS_FECHADOS))
+                        ).scalars()
+                    )
+                    for os_id in [i for i in self._casos if i not in existentes]:
+                        self._remover(os_id)
+                    self._ultima_reconciliacao = time.monotonic()
+
+            self._ultima_sincronizacao = time.monotonic()
+
+    def remover(self, ids) -> None:
+        """Retira OS excluídas (chamado após o commit)."""
+        with self._lock:
+            for os_id in ids:
+                self._remover(os_id)
+
+    def _adicionar(self, linha) -> None:
+        self._remover(linha.id)
+        termos = _termos(linha.problema_relatado)
+        self._casos[linha.id] = {
+            "termos": termos,
+            "tipo": normalizar_texto(linha.tipo_aparelho).strip(),
+            "diagnostico": linha.diagnostico_tecnico.strip(),
+            "numeroOS": linha.numero_os,
+            "tipoAparelho": linha.tipo_aparelho,
+            "marcaModelo": linha.marca_modelo,
+            "problema": linha.problema_relatado,
+        }
+        for termo, tf in termos.items():
+            self._postings.setdefault(termo, {})[linha.id] = tf
+
+    def _remover(self, os_id) -> None:
+        caso = self._casos.pop(os_id, None)
+        if not caso:
+            return
+        for termo in caso["termos"]:
+            docs = self._postings.get(termo)
+            if docs:
+                docs.pop(os_id, None)
+                if not docs:
+                    del self._postings[termo]
+        self._normas.pop(os_id, None)
+
+    def _nova_epoca_se_necessario(self) -> None:
+        # O idf muda conforme o índice cresce; recalcula idfs e normas juntos
+        # quando o tamanho variou mais de 10% desde o início da época
+        total = len(self._casos)
+        if abs(total - self._total_normas) > max(10, self._total_normas // 10):
+            self._idfs.clear()
+            self._normas.clear()
+            self._total_normas = total
+
+    def _idf(self, termo) -> float:
+        idf = self._idfs.get(termo)
+        if idf is None:
+            idf = math.log((1 + len(self._casos)) / (1 + len(self._postings.get(termo, ())))) + 1
+            if termo in self._postings:  # Termos só da consulta não ficam no cache
+                self._idfs[termo] = idf
+        return idf
+
+    def _norma(self, os_id) -> float:
+        norma = self._normas.get(os_id)
+        if norma is None:
+            termos = self._casos[os_id]["termos"]
+            norma = math.sqrt(sum((tf * self._idf(t)) ** 2 for t, tf in termos.items())) or 1.0
+            self._normas[os_id] = norma
+        return norma
+
+    # ----------------- consulta -----------------
+
+    def buscar(self, tipo_aparelho, marca_modelo, problema_relatado, k=3) -> list:
+        """
+        Top-k casos do mesmo tipo de aparelho mais parecidos (0 a 1): cosseno
+        do problema relatado mais o bônus de marca/modelo.
+        """
+        self.sincronizar()
+        consulta = _termos(problema_relatado)
+
+        with self._lock:
+            if not self._casos or not consulta:
+                return []
+            self._nova_epoca_se_necessario()
+
+            pesos = {t: tf * self._idf(t) for t, tf in consulta.items() if t in self._postings}
+            norma_consulta = math.sqrt(sum((tf * self._idf(t)) ** 2 for t, tf in consulta.items()))
+
+            pontuacoes = {}
+            for termo, peso in pesos.items():
+                idf = self._idf(termo)
+                for os_id, tf in self._postings[termo].items():
+                    pontuacoes[os_id] = pontuacoes.get(os_id, 0.0) + peso * tf * idf
+
+            tipo = normalizar_texto(tipo_aparelho).strip()
+
+            def similaridade(os_id, pontuacao):
+                cosseno = pontuacao / (norma_consulta * self._norma(os_id))
+                modelo = similaridade_modelo(marca_modelo, self._casos[os_id]["marcaModelo"])
+                return (1 - self.PESO_MODELO) * cosseno + self.PESO_MODELO * modelo
+
+            melhores = heapq.nlargest(
+                k,
+                (
+                    (similaridade(os_id, pontuacao), os_id)
+                    for os_id, pontuacao in pontuacoes.items()
+                    if self._casos[os_id]["tipo"] == tipo
+                ),
+            )
+
+            return [
+                {
+                    "osId": os_id,
+                    "numeroOS": self._casos[os_id]["numeroOS"],
+                    "tipoAparelho": self._casos[os_id]["tipoAparelho"],
+                    "marcaModelo": self._casos[os_id]["marcaModelo"],
+                    "problema": self._casos[os_id]["problema"],
+                    "diagnostico": self._casos[os_id]["diagnostico"],
+                    "similaridade": round(similaridade, 4),
+                }
+                for similaridade, os_id in melhores
+            ]
+
+
+indice_diagnosticos = IndiceDiagnosticos()
+
+
+@event.listens_for(OrdemServico, "after_delete")
+def _registrar_os_removida(mapper, connection, target):
+    sessao = object_session(target)
+    if sessao is not None:
+        sessao.info.setdefault("os_removidas", []).append(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_os_removidas(session):
+    removidas = session.info.pop("os_removidas", None)
+    if removidas:
+        indice_diagnosticos.remover(removidas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_os_removidas(session):
+    session.info.pop("os_removidas", None)
+
+
+# ================================
+# ÍNDICE DE NOMES DE CLIENTES
+# ================================
+
+# Palavras comuns nas consultas que não devem ser confundidas com nomes
+PALAVRAS_IGNORADAS_NOME = {
+    "qual", "quais", "quem", "cliente", "clientes", "telefone", "email", "endereco",
+    "dados", "status", "ordem", "ordens", "servico", "servicos", "para", "com", "sem",
+    "dos", "das", "que", "meu", "minha", "sobre", "mostrar", "mostre", "buscar", "busque",
+    # Conectivos de nomes ("João da Silva"): não identificam ninguém
+    "da", "de", "do", "e", "o",
+}
+
+
+def tokens_nome(texto: str) -> tuple:
+    """Palavras sem acento, sem repetição e sem as PALAVRAS_IGNORADAS_NOME."""
+    palavras = dict.fromkeys(re.findall(r"\w+", normalizar_texto(texto)))
+    return tuple(p for p in palavras if len(p) >= 2 and p not in PALAVRAS_IGNORADAS_NOME)
+
+
+def _distancia_edicao(a: str, b: str, limite: int) -> int:
+    """Levenshtein com parada antecipada quando passa do limite."""
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if min(atual) > limite:
+            return limite + 1
+        anterior = atual
+    return anterior[-1]
+
+
+class IndiceNomesClientes:
+    """
+    Índice em memória (por processo) dos nomes de todos os clientes, para
+    localizar clientes citados em consultas em linguagem natural.
+    - Tokens sem acento -> clientes (casamento exato, O(1));
+    - trigramas -> tokens do vocabulário (erros de digitação, com
+      confirmação por distância de edição);
+    - tamanho -> tokens, para palavras curtas, que têm poucos trigramas
+      ("Jaão" x "João") e são comparadas direto por distância de edição.
+    Alterações feitas neste processo entram no commit; as de outros
+    workers chegam pela sincronização incremental por atualizado_em.
+    """
+
+    def __init__(self, intervalo_sincronizacao=30):
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        self._lock = threading.Lock()
+        self._clientes = {}  # id -> (tokens, ativo)
+        self._por_token = {}  # token -> set(ids)
+        self._por_trigrama = {}  # trigrama -> set(tokens)
+        self._por_tamanho = {}  # len(token) -> set(tokens)
+        self._marca_dagua = None
+        self._ultima_sincronizacao = 0.0
+
+    # ----------------- manutenção -----------------
+
+    def sincronizar(self, forcar=False) -> None:
+        with self._lock:
+            if not forcar and time.monotonic() - self._ultima_sincronizacao < self.intervalo_sincronizacao:
+                return
+            query = select(
+                Cliente.id, Cliente.nome, Cliente.status, Cliente.atualizado_em
+            ).order_by(Cliente.atualizado_em)
+            if self._marca_dagua:
+                query = query.where(Cliente.atualizado_em >= self._marca_dagua)
+
+            with db.engine.connect() as conexao:
+                for linha in conexao.execute(query):
+                    self._indexar(linha.id, linha.nome, linha.status == "ativo")
+                    if linha.atualizado_em:
+                        self._marca_dagua = linha.atualizado_em
+
+            self._ultima_sincronizacao = time.monotonic()
+
+    def aplicar(self, alteracoes) -> None:
+        """Aplica alterações confirmadas: (id, nome, ativo) ou (id, None, None) para remoção."""
+        with self._lock:
+            if self._marca_dagua is None:
+                return  # Ainda não carregado; a carga inicial já trará os dados
+            for cliente_id, nome, ativo in alteracoes:
+                if nome is None:
+                    self._remover(cliente_id)
+                else:
+                    self._indexar(cliente_id, nome, ativo)
+
+    def _indexar(self, cliente_id, nome, ativo) -> None:
+        self._remover(cliente_id)
+        tokens = tokens_nome(nome)
+        self._clientes[cliente_id] = (tokens, ativo)
+        for token in tokens:
+            ids = self._por_token.setdefault(token, set())
+            if not ids:
+                for trigrama in trigramas(token):
+                    self._por_trigrama.setdefault(trigrama, set()).add(token)
+                self._por_tamanho.setdefault(len(token), set()).add(token)
+            ids.add(cliente_id)
+
+    def _remover(self, cliente_id) -> None:
+        registro = self._clientes.pop(cliente_id, None)
+        if not registro:
+            return
+        for token in registro[0]:
+            ids = self._por_token.get(token)
+            if ids is None:
+                continue
+            ids.discard(cliente_id)
+            if not ids:
+                del self._por_token[token]
+                for trigrama in trigramas(token):
+                    tokens = self._por_trigrama.get(trigrama)
+                    if tokens:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._por_trigrama[trigrama]
+                mesmo_tamanho = self._por_tamanho.get(len(token))
+                if mesmo_tamanho:
+                    mesmo_tamanho.discard(token)
+                    if not mesmo_tamanho:
+                        del self._por_tamanho[len(token)]
+
+    # ----------------- consulta -----------------
+
+    # Até este tamanho a palavra é comparada por distância de edição com os
+    # tokens de tamanho próximo, sem exigir trigramas em comum
+    TAMANHO_PALAVRA_CURTA = 5
+
+    def _tokens_parecidos(self, palavra) -> dict:
+        """Tokens do vocabulário parecidos com a palavra -> similaridade (0 a 1)."""
+        if palavra in self._por_token:
+            return {palavra: 1.0}
+        if len(palavra) < 3:
+            return {}
+
+        limite = 1 if len(palavra) < 7 else 2
+        if len(palavra) <= self.TAMANHO_PALAVRA_CURTA:
+            candidatos = set()
+            for tamanho in range(len(palavra) - limite, len(palavra) + limite + 1):
+                candidatos.update(self._por_tamanho.get(tamanho, ()))
+        else:
+            contagem = Counter()
+            tri_palavra = trigramas(palavra)
+            for trigrama in tri_palavra:
+                contagem.update(self._por_trigrama.get(trigrama, ()))
+            # Poucos trigramas em comum descartam o token sem calcular a distância
+            candidatos = [
+                token for token, comuns in contagem.items()
+                if comuns >= max(2, len(tri_palavra) * 0.4)
+            ]
+
+        parecidos = {}
+        for token in candidatos:
+            distancia = _distancia_edicao(palavra, token, limite)
+            if distancia <= limite:
+                parecidos[token] = 1 - distancia / max(len(palavra), len(token))
+        return parecidos
+
+    def buscar(self, consulta, limite=5, similaridade_minima=0.6, apenas_ativos=True) -> list:
+        """
+        Clientes cujo nome aparece na consulta, do mais para o menos provável:
+        [(cliente_id, pontuacao)]. A pontuação é a fração (ponderada pela
+        similaridade) das palavras de nome da consulta (as que existem em
+        algum nome) encontradas no nome do cliente, então "Pedro" ou
+        "Carlos Lima" acham "Pedro Alves" e "Carlos Eduardo Lima". No empate,
+        vem antes o nome com mais tokens citados.
+        """
+        self.sincronizar()
+        palavras = tokens_nome(consulta)
+
+        with self._lock:
+            palavras_nome = 0  # palavras da consulta parecidas com algum nome
+            encontrados = {}  # cliente_id -> {palavra: similaridade}
+            for palavra in palavras:
+                parecidos = self._tokens_parecidos(palavra)
+                if parecidos:
+                    palavras_nome += 1
+                for token, similaridade in parecidos.items():
+                    for cliente_id in self._por_token.get(token, ()):
+                        acertos = encontrados.setdefault(cliente_id, {})
+                        acertos[palavra] = max(acertos.get(palavra, 0), similaridade)
+
+            resultado = []
+            for cliente_id, acertos in encontrados.items():
+                nome_tokens, ativo = self._clientes[cliente_id]
+                if apenas_ativos and not ativo:
+                    continue
+                pontuacao = sum(acertos.values()) / palavras_nome
+                if pontuacao >= similaridade_minima:
+                    cobertura_nome = len(acertos) / len(nome_tokens)
+                    resultado.append((cliente_id, round(pontuacao, 4), cobertura_nome))
+
+        resultado.sort(key=lambda item: (-item[1], -item[2], item[0]))
+        return [(cliente_id, pontuacao) for cliente_id, pontuacao, _ in resultado[:limite]]
+
+
+indice_clientes = IndiceNomesClientes()
+
+
+@event.listens_for(Cliente, "after_insert")
+@event.listens_for(Cliente, "after_update")
+def _registrar_cliente_alterado(mapper, connection, target):
+    sessao = object_session(target)
+    if sessao is not None:
+        sessao.info.setdefault("clientes_alterados", []).append(
+            (target.id, target.nome, target.status == "ativo")
+        )
+
+
+@event.listens_for(Cliente, "after_delete")
+def _registrar_cliente_removido(mapper, connection, target):
+    sessao = object_session(target)
+    if sessao is not None:
+        sessao.info.setdefault("clientes_alterados", []).append((target.id, None, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_clientes_alterados(session):
+    alteracoes = session.info.pop("clientes_alterados", None)
+    if alteracoes:
+        indice_clientes.aplicar(alteracoes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_clientes_alterados(session):
+    session.info.pop("clientes_alterados", None)
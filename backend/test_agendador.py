@@ -0,0 +1,86 @@
+"""Testes da trava por tarefa do agendador (tarefas_agendadas)."""
+
+import threading
+from datetime import datetime, timedelta
+
+from agendador import Agendador
+from extensions import db
+from models import TarefaAgendada
+
+
+def agendador(app, execucoes=None, intervalo=60):
+    instancia = Agendador(app)
+    instancia.registrar("tarefa", lambda: execucoes.append(instancia.identificador), intervalo)
+    return instancia
+
+
+def tarefa():
+    db.session.expire_all()
+    return db.session.get(TarefaAgendada, "tarefa")
+
+
+def test_so_um_worker_reivindica_a_tarefa(app):
+    primeiro, segundo = agendador(app), agendador(app)
+
+    assert primeiro._reivindicar("tarefa") is True
+    assert segundo._reivindicar("tarefa") is False
+    assert tarefa().bloqueado_por == primeiro.identificador
+
+
+def test_reivindicacao_concorrente(app):
+    workers = [agendador(app) for _ in range(8)]
+    resultados = []
+    barreira = threading.Barrier(len(workers))
+
+    def tentar(worker):
+        with app.app_context():
+            barreira.wait()
+            resultados.append(worker._reivindicar("tarefa"))
+            db.session.remove()
+
+    threads = [threading.Thread(target=tentar, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(resultados) == [False] * 7 + [True]
+
+
+def test_execucao_libera_a_trava_e_agenda_a_proxima(app):
+    execucoes = []
+    primeiro, segundo = agendador(app, execucoes), agendador(app, execucoes)
+
+    assert primeiro._reivindicar("tarefa")
+    primeiro._executar("tarefa")
+
+    linha = tarefa()
+    assert execucoes == [primeiro.identificador]
+    assert linha.bloqueado_por is None and linha.ultimo_erro is None
+    assert linha.proxima_execucao > datetime.now() + timedelta(seconds=50)
+    # Livre, mas ainda não venceu
+    assert segundo._reivindicar("tarefa") is False
+
+
+def test_trava_vencida_de_worker_morto(app):
+    primeiro, segundo = agendador(app), agendador(app)
+    assert primeiro._reivindicar("tarefa")
+
+    linha = tarefa()
+    linha.bloqueado_ate = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert segundo._reivindicar("tarefa") is True
+    assert tarefa().bloqueado_por == segundo.identificador
+
+
+def test_erro_da_tarefa_fica_registrado(app):
+    instancia = Agendador(app)
+    instancia.registrar("tarefa", lambda: 1 / 0, 60)
+
+    assert instancia._reivindicar("tarefa")
+    instancia._executar("tarefa")
+
+    linha = tarefa()
+    assert "division by zero" in linha.ultimo_erro
+    assert linha.bloqueado_por is None
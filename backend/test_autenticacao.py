@@ -0,0 +1,62 @@
+"""Testes da verificação de tokens em login_required (cache de status do usuário)."""
+
+import time
+
+from werkzeug.security import generate_password_hash
+
+import auth_utils
+from auth_utils import gerar_token_jwt, invalidar_cache_usuario
+from extensions import db
+from models import Usuario
+
+
+def perfil(cliente_http, token):
+    return cliente_http.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_status_do_usuario_fica_em_cache(cliente_http, cabecalhos, usuario):
+    assert cliente_http.get("/api/auth/me", headers=cabecalhos).status_code == 200
+
+    # Desativado por fora do ORM deste processo (como faria outro worker)
+    db.session.execute(Usuario.__table__.update().values(ativo=False))
+    db.session.commit()
+    assert cliente_http.get("/api/auth/me", headers=cabecalhos).status_code == 200
+
+    invalidar_cache_usuario(usuario.id)  # Equivale ao fim do TTL
+    assert cliente_http.get("/api/auth/me", headers=cabecalhos).status_code == 401
+
+
+def test_cache_expira_pelo_ttl(cliente_http, cabecalhos, usuario, monkeypatch):
+    monkeypatch.setattr(auth_utils, "USUARIO_CACHE_TTL", 0)
+    invalidar_cache_usuario()
+
+    assert cliente_http.get("/api/auth/me", headers=cabecalhos).status_code == 200
+    db.session.execute(Usuario.__table__.update().values(ativo=False))
+    db.session.commit()
+    time.sleep(0.01)
+
+    assert cliente_http.get("/api/auth/me", headers=cabecalhos).status_code == 401
+
+
+def test_desativar_pelo_orm_revoga_na_hora(cliente_http, cabecalhos, usuario):
+    assert cliente_http.get("/api/auth/me", headers=cabecalhos).status_code == 200
+
+    usuario.ativo = False
+    db.session.commit()
+
+    assert cliente_http.get("/api/auth/me", headers=cabecalhos).status_code == 401
+
+
+def test_troca_de_senha_revoga_tokens_anteriores(cliente_http, usuario):
+    usuario.senha_hash = generate_password_hash("senha-antiga")
+    db.session.commit()
+    antigo = gerar_token_jwt(usuario.id, usuario.usuario)
+    time.sleep(1)  # iat tem resolução de segundos
+
+    resposta = cliente_http.put(
+        "/api/auth/me", json={"senha": "senha-nova"}, headers={"Authorization": f"Bearer {antigo}"}
+    )
+    assert resposta.status_code == 200
+
+    assert perfil(cliente_http, antigo).status_code == 401
+    assert perfil(cliente_http, resposta.get_json()["token"]).status_code == 200
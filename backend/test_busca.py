@@ -0,0 +1,81 @@
+"""Testes da busca de texto completo (GET /api/busca)."""
+
+
+def buscar(cliente_http, cabecalhos, **parametros):
+    resposta = cliente_http.get("/api/busca/", query_string=parametros, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.get_json()
+    return resposta.get_json()
+
+
+def ids_por_tipo(resultado, tipo):
+    return [item["dados"]["id"] for item in resultado["itens"] if item["tipo"] == tipo]
+
+
+def test_busca_por_prefixo_do_nome(cliente_http, cabecalhos, criar_cliente):
+    mariana = criar_cliente(nome="Mariana Souza")
+    criar_cliente(nome="Pedro Alves")
+
+    resultado = buscar(cliente_http, cabecalhos, q="mari")
+
+    assert ids_por_tipo(resultado, "cliente") == [mariana["id"]]
+
+
+def test_busca_ignora_acentos(cliente_http, cabecalhos, criar_cliente):
+    joao = criar_cliente(nome="João Conceição")
+
+    resultado = buscar(cliente_http, cabecalhos, q="joao conceicao")
+
+    assert ids_por_tipo(resultado, "cliente") == [joao["id"]]
+
+
+def test_cpf_e_telefone_com_pontuacao_viram_um_termo(cliente_http, cabecalhos, criar_cliente):
+    cliente = criar_cliente(nome="Ana Lima", cpfCnpj="123.456.789-01", telefone="(11) 98888-7777")
+    criar_cliente(nome="Outro", cpfCnpj="987.654.321-00", telefone="(21) 3333-4444")
+
+    for consulta in ("123.456.789-01", "12345678901", "(11) 98888-7777", "11988887777", "98888-7777"):
+        resultado = buscar(cliente_http, cabecalhos, q=consulta)
+        assert ids_por_tipo(resultado, "cliente") == [cliente["id"]], consulta
+
+
+def test_filtro_de_tipos(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente(nome="Carla Dias")
+    os_tela = criar_os(cliente["id"], problemaRelatado="Display trincado")
+    cliente_http.post(
+        "/api/estoque/",
+        json={"codigo": "DSP-01", "nome": "Display Samsung", "categoria": "pecas"},
+        headers=cabecalhos,
+    )
+
+    todos = buscar(cliente_http, cabecalhos, q="display")
+    so_os = buscar(cliente_http, cabecalhos, q="display", tipos="os")
+
+    assert {item["tipo"] for item in todos["itens"]} == {"os", "produto"}
+    assert [item["tipo"] for item in so_os["itens"]] == ["os"]
+    assert ids_por_tipo(so_os, "os") == [os_tela["id"]]
+
+
+def test_tipo_invalido(cliente_http, cabecalhos):
+    resposta = cliente_http.get("/api/busca/?q=tela&tipos=os,fornecedor", headers=cabecalhos)
+
+    assert resposta.status_code == 400
+    assert "fornecedor" in resposta.get_json()["mensagem"]
+
+
+def test_paginacao_e_tem_mais(cliente_http, cabecalhos, criar_cliente):
+    ids = {criar_cliente(nome=f"Silva {i}")["id"] for i in range(3)}
+
+    primeira = buscar(cliente_http, cabecalhos, q="silva", limite=2)
+    segunda = buscar(cliente_http, cabecalhos, q="silva", limite=2, pagina=2)
+
+    assert len(primeira["itens"]) == 2 and primeira["temMais"] is True
+    assert len(segunda["itens"]) == 1 and segunda["temMais"] is False
+    assert set(ids_por_tipo(primeira, "cliente") + ids_por_tipo(segunda, "cliente")) == ids
+
+
+def test_indice_acompanha_alteracoes(cliente_http, cabecalhos, criar_cliente):
+    cliente = criar_cliente(nome="Roberto Nunes")
+
+    cliente_http.put(f"/api/clientes/{cliente['id']}", json={"nome": "Roberta Nunes"}, headers=cabecalhos)
+
+    assert buscar(cliente_http, cabecalhos, q="roberto")["itens"] == []
+    assert ids_por_tipo(buscar(cliente_http, cabecalhos, q="roberta"), "cliente") == [cliente["id"]]
@@ -0,0 +1,81 @@
+"""Testes do cache de respostas da IA (memória + tabela cache_respostas_ia)."""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import ai_utils
+from cache_ia import CacheRespostasIA
+from extensions import db
+from models import RespostaIACache
+
+
+def chave(texto):
+    return CacheRespostasIA.chave("modelo", "resumo", texto)
+
+
+def test_chave_depende_do_modelo_e_da_funcao():
+    assert CacheRespostasIA.chave("a", "resumo", "x") == CacheRespostasIA.chave("a", "resumo", "x")
+    assert CacheRespostasIA.chave("a", "resumo", "x") != CacheRespostasIA.chave("b", "resumo", "x")
+    assert CacheRespostasIA.chave("a", "resumo", "x") != CacheRespostasIA.chave("a", "diagnostico", "x")
+
+
+def test_outro_worker_le_do_banco():
+    CacheRespostasIA().guardar(chave("tela"), "modelo", "Troca de tela")
+
+    outro = CacheRespostasIA()
+    assert outro.obter(chave("tela")) == "Troca de tela"
+    assert outro.obter(chave("tela")) == "Troca de tela"
+    assert outro.obter(chave("bateria")) is None
+
+    estatisticas = outro.estatisticas()
+    assert (estatisticas["acertosPersistente"], estatisticas["acertosMemoria"], estatisticas["falhas"]) == (1, 1, 1)
+
+
+def test_regravar_a_mesma_chave_atualiza():
+    cache = CacheRespostasIA()
+    cache.guardar(chave("tela"), "modelo", "Primeira")
+    cache.guardar(chave("tela"), "modelo", "Segunda")
+
+    assert CacheRespostasIA().obter(chave("tela")) == "Segunda"
+    assert RespostaIACache.query.count() == 1
+
+
+def test_memoria_descarta_a_menos_usada():
+    cache = CacheRespostasIA(max_memoria=2)
+    for texto in ("a", "b"):
+        cache._guardar_memoria(chave(texto), texto)
+    cache.obter(chave("a"))
+    cache._guardar_memoria(chave("c"), "c")
+
+    assert list(cache._memoria) == [chave("a"), chave("c")]
+
+
+def test_limpeza_remove_expiradas_e_excedentes():
+    cache = CacheRespostasIA(ttl_segundos=3600, max_persistente=2)
+    agora = datetime.now()
+    idades = (timedelta(hours=2), timedelta(minutes=3), timedelta(minutes=2), timedelta(minutes=1))
+    for i, idade in enumerate(idades):
+        db.session.add(
+            RespostaIACache(chave=chave(str(i)), modelo="modelo", resposta=str(i), criado_em=agora - idade)
+        )
+    db.session.commit()
+
+    assert CacheRespostasIA(ttl_segundos=3600).obter(chave("0")) is None  # Expirada
+    assert cache.limpar_persistente() == 2
+    assert sorted(r.resposta for r in RespostaIACache.query.all()) == ["2", "3"]
+
+
+def test_chat_reaproveita_resposta_com_entrada_normalizada(monkeypatch):
+    chamadas = []
+
+    def chat(model, messages):
+        chamadas.append(messages)
+        mensagem = SimpleNamespace(content=" Tela quebrada ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=mensagem)])
+
+    monkeypatch.setattr(ai_utils, "cache_respostas_ia", CacheRespostasIA())
+    monkeypatch.setattr(ai_utils.client, "chat", chat)
+
+    assert ai_utils.gerar_resumo("Tela  QUEBRADA", fallback=False) == "Tela quebrada"
+    assert ai_utils.gerar_resumo("tela quebrada", fallback=False) == "Tela quebrada"
+    assert len(chamadas) == 1
@@ -0,0 +1,122 @@
+"""Testes das rotas de clientes (/api/clientes) e da normalização de CPF/CNPJ e telefone."""
+
+from extensions import db
+from models import Cliente, normalizar_telefone
+from routes_clientes import preencher_contatos_normalizados
+from test_listagem_os import percorrer
+
+
+def test_clientes_paginados_com_status_e_campos(cliente_http, cabecalhos, criar_cliente):
+    ativos = [criar_cliente()["id"] for _ in range(3)]
+    inativo = criar_cliente()["id"]
+    db.session.get(Cliente, inativo).status = "inativo"
+    db.session.commit()
+
+    paginas = percorrer(
+        cliente_http, cabecalhos, "/api/clientes/", limite=2, status="ativo", fields="id,nome"
+    )
+    itens = [item for p in paginas for item in p]
+
+    assert [item["id"] for item in itens] == sorted(ativos, reverse=True)
+    assert all(set(item) == {"id", "nome"} for item in itens)
+
+
+def test_clientes_campo_invalido(cliente_http, cabecalhos):
+    resposta = cliente_http.get("/api/clientes/?fields=id,senha", headers=cabecalhos)
+
+    assert resposta.status_code == 400
+
+
+def test_clientes_filtro_por_tipo_de_pessoa(cliente_http, cabecalhos, criar_cliente):
+    criar_cliente()
+    empresa = criar_cliente(tipoPessoa="pessoa_juridica")["id"]
+
+    resposta = cliente_http.get(
+        "/api/clientes/", query_string={"limite": 10, "tipoPessoa": "pessoa_juridica"}, headers=cabecalhos
+    )
+
+    assert [item["id"] for item in resposta.get_json()["itens"]] == [empresa]
+
+
+def test_estatisticas_de_clientes(cliente_http, cabecalhos, criar_cliente):
+    criar_cliente(email="a@exemplo.com")
+    criar_cliente(email="  ")
+    inativo = criar_cliente()["id"]
+    db.session.get(Cliente, inativo).status = "inativo"
+    db.session.commit()
+
+    resposta = cliente_http.get("/api/clientes/estatisticas", headers=cabecalhos)
+
+    assert resposta.get_json() == {"total": 3, "ativos": 2, "comEmail": 1, "semTelefone": 0}
+
+
+def cliente_legado(**campos):
+    """Gravado sem passar pelos eventos do ORM, como os clientes anteriores à normalização."""
+    dados = {"nome": "Legado", "telefone": "(11) 3333-4444", **campos}
+    return db.session.execute(Cliente.__table__.insert().values(**dados)).inserted_primary_key[0]
+
+
+def test_normalizar_telefone():
+    assert normalizar_telefone("+55 (11) 98765-4321") == "11987654321"
+    assert normalizar_telefone("0 11 98765-4321") == "11987654321"
+    assert normalizar_telefone("5511") == "5511"
+    assert normalizar_telefone(" - ") is None
+
+
+def test_cpf_com_pontuacao_e_duplicado(cliente_http, cabecalhos, criar_cliente):
+    cliente = criar_cliente(cpfCnpj="123.456.789-01")
+    assert cliente["cpfCnpj"] == "12345678901"
+
+    resposta = cliente_http.post(
+        "/api/clientes/",
+        json={"nome": "Outro", "cpfCnpj": "12345678901", "telefone": "11999990000"},
+        headers=cabecalhos,
+    )
+    assert resposta.status_code == 409
+
+
+def test_busca_por_telefone_em_qualquer_formato(cliente_http, cabecalhos, criar_cliente):
+    cliente = criar_cliente(telefone="(11) 98765-4321")
+    criar_cliente(telefone="11 3333-4444")
+
+    resposta = cliente_http.get("/api/clientes/telefone/+55 11 987654321", headers=cabecalhos)
+
+    assert [c["id"] for c in resposta.get_json()] == [cliente["id"]]
+    assert cliente_http.get("/api/clientes/telefone/abc", headers=cabecalhos).status_code == 400
+
+
+def test_cliente_legado_que_colide_continua_editavel(cliente_http, cabecalhos, criar_cliente):
+    criar_cliente(cpfCnpj="12345678901")
+    legado = cliente_legado(cpf_cnpj="123.456.789-01")
+    db.session.commit()
+
+    resposta = cliente_http.put(
+        f"/api/clientes/{legado}",
+        json={"nome": "Legado editado", "cpfCnpj": "123.456.789-01", "telefone": "11 2222-3333"},
+        headers=cabecalhos,
+    )
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()["cpfCnpj"] == "123.456.789-01"
+    assert db.session.get(Cliente, legado).telefone_normalizado == "1122223333"
+
+
+def test_backfill_normaliza_e_reporta_conflitos(usuario, criar_cliente):
+    existente = criar_cliente(cpfCnpj="11111111111")["id"]
+    primeiro = cliente_legado(cpf_cnpj="222.222.222-22")
+    repetido = cliente_legado(cpf_cnpj="222.222.222/22")
+    colide = cliente_legado(cpf_cnpj="111.111.111-11")
+    db.session.commit()
+
+    atualizados, conflitos = preencher_contatos_normalizados(lote=2)
+
+    assert atualizados == 3
+    assert conflitos == [(repetido, "222.222.222/22"), (colide, "111.111.111-11")]
+    db.session.expire_all()
+    assert [db.session.get(Cliente, i).cpf_cnpj for i in (existente, primeiro, repetido, colide)] == [
+        "11111111111",
+        "22222222222",
+        "222.222.222/22",
+        "111.111.111-11",
+    ]
+    assert db.session.get(Cliente, colide).telefone_normalizado == "1133334444"
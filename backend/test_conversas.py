@@ -0,0 +1,74 @@
+"""Testes das sessões de conversa do assistente (memória e tabela conversas_ia)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from conversas_utils import ArmazemConversas
+from extensions import db
+from models import ConversaIA
+
+
+@pytest.fixture(params=[False, True], ids=["memoria", "persistente"])
+def armazem(request, usuario):
+    return ArmazemConversas(persistir=request.param)
+
+
+def test_conversa_e_do_usuario_que_a_criou(armazem, usuario):
+    conversa_id, conversa = armazem.nova()
+    conversa.update(estado="aguardando_cliente", entidades={"cliente_id": 7})
+    armazem.salvar(conversa_id, usuario.id, conversa)
+
+    assert armazem.obter(conversa_id, usuario.id) == {
+        "estado": "aguardando_cliente",
+        "entidades": {"cliente_id": 7},
+    }
+    assert armazem.obter(conversa_id, usuario.id + 1) is None
+    assert armazem.obter("inexistente", usuario.id) is None
+
+
+def test_salvar_de_novo_substitui_o_estado(armazem, usuario):
+    conversa_id, conversa = armazem.nova()
+    armazem.salvar(conversa_id, usuario.id, conversa)
+    conversa["estado"] = "confirmar_os"
+    armazem.salvar(conversa_id, usuario.id, conversa)
+
+    assert armazem.obter(conversa_id, usuario.id)["estado"] == "confirmar_os"
+
+
+def test_expiradas_nao_sao_devolvidas_e_sao_limpas(armazem, usuario):
+    armazem.ttl_segundos = -1
+    conversa_id, conversa = armazem.nova()
+    armazem.salvar(conversa_id, usuario.id, conversa)
+
+    assert armazem.obter(conversa_id, usuario.id) is None
+    assert armazem.limpar_expiradas() == 1
+    assert ConversaIA.query.count() == 0
+
+
+def test_memoria_limitada_descarta_a_menos_usada(usuario):
+    armazem = ArmazemConversas(max_conversas=2)
+    ids = []
+    for _ in range(2):
+        conversa_id, conversa = armazem.nova()
+        armazem.salvar(conversa_id, usuario.id, conversa)
+        ids.append(conversa_id)
+    armazem.obter(ids[0], usuario.id)
+    terceira, conversa = armazem.nova()
+    armazem.salvar(terceira, usuario.id, conversa)
+
+    assert armazem.obter(ids[1], usuario.id) is None
+    assert armazem.obter(ids[0], usuario.id) is not None
+
+
+def test_persistente_compartilhada_entre_workers(usuario):
+    conversa_id, conversa = ArmazemConversas(persistir=True).nova()
+    conversa["entidades"] = {"os_id": 3, "cliente_id": 1}
+    ArmazemConversas(persistir=True).salvar(conversa_id, usuario.id, conversa)
+
+    assert ArmazemConversas(persistir=True).obter(conversa_id, usuario.id)["entidades"] == {
+        "os_id": 3,
+        "cliente_id": 1,
+    }
+    linha = db.session.get(ConversaIA, conversa_id)
+    assert linha.expira_em > datetime.now() + timedelta(minutes=29)
@@ -0,0 +1,62 @@
+"""Testes do IMEI/serial normalizado e de GET /api/dispositivos/<imei>/historico."""
+
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import OrdemServico
+from routes_dispositivos import preencher_imei_serial_normalizado
+
+
+def test_historico_ignora_a_formatacao_do_imei(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente_id = criar_cliente()["id"]
+    antiga = criar_os(cliente_id, imeiSerial="35-209900-176148-1")
+    recente = criar_os(cliente_id, imeiSerial="352099001761481")
+    criar_os(cliente_id, imeiSerial="999999999999999")
+    db.session.get(OrdemServico, antiga["id"]).criado_em = datetime.now() - timedelta(days=30)
+    db.session.commit()
+
+    resposta = cliente_http.get("/api/dispositivos/35 2099 0017 6148 1/historico", headers=cabecalhos)
+
+    corpo = resposta.get_json()
+    assert corpo["imeiSerial"] == "352099001761481"
+    assert corpo["totalOrdens"] == 2
+    assert [o["id"] for o in corpo["ordens"]] == [recente["id"], antiga["id"]]
+    assert corpo["ultimaOrdem"]["id"] == recente["id"]
+
+
+def test_historico_de_serial_com_letras(cliente_http, cabecalhos, criar_cliente, criar_os):
+    os_criada = criar_os(criar_cliente()["id"], imeiSerial="r58m-12ab")
+
+    resposta = cliente_http.get("/api/dispositivos/R58M12AB/historico", headers=cabecalhos)
+    assert [o["id"] for o in resposta.get_json()["ordens"]] == [os_criada["id"]]
+
+    assert cliente_http.get("/api/dispositivos/---/historico", headers=cabecalhos).status_code == 400
+
+
+def test_alterar_imei_atualiza_o_normalizado(cliente_http, cabecalhos, criar_cliente, criar_os):
+    os_id = criar_os(criar_cliente()["id"], imeiSerial="111")["id"]
+
+    cliente_http.put(f"/api/os/{os_id}", json={"imeiSerial": "22.2"}, headers=cabecalhos)
+
+    assert db.session.get(OrdemServico, os_id).imei_serial_normalizado == "222"
+
+
+def test_backfill_preenche_sem_alterar_atualizado_em(usuario, criar_cliente, criar_os):
+    cliente_id = criar_cliente()["id"]
+    ids = [criar_os(cliente_id, imeiSerial=imei)["id"] for imei in ("12-34", "--", "56 78")]
+    antigo = datetime(2024, 1, 1)
+    tabela = OrdemServico.__table__
+    db.session.execute(
+        tabela.update()
+        .where(tabela.c.id.in_(ids))
+        .values(imei_serial_normalizado=None, atualizado_em=antigo)
+    )
+    db.session.commit()
+
+    preencher_imei_serial_normalizado(lote=2)
+
+    linhas = db.session.execute(
+        tabela.select().where(tabela.c.id.in_(ids)).order_by(tabela.c.id)
+    ).all()
+    assert [linha.imei_serial_normalizado for linha in linhas] == ["1234", "", "5678"]
+    assert {linha.atualizado_em for linha in linhas} == {antigo}
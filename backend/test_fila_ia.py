@@ -0,0 +1,115 @@
+"""Testes da fila persistente de tarefas de IA (tarefas_ia)."""
+
+import threading
+from datetime import datetime, timedelta
+
+from extensions import db
+from fila_ia import FilaTarefasIA
+from models import TarefaIA
+
+
+def fila(app, execucoes=None, erro=None, **opcoes):
+    instancia = FilaTarefasIA(app, workers=0, **opcoes)
+
+    def resumir(os_id):
+        if erro:
+            raise RuntimeError(erro)
+        execucoes.append(os_id)
+        return f"Resumo da OS {os_id}"
+
+    instancia.registrar("resumo", resumir)
+    return instancia
+
+
+def tarefas():
+    db.session.expire_all()
+    return TarefaIA.query.order_by(TarefaIA.id).all()
+
+
+def test_criar_os_enfileira_sem_duplicar(app, usuario, criar_cliente, criar_os):
+    os_id = criar_os(criar_cliente()["id"])["id"]
+
+    repetida = app.extensions["fila_ia"].enfileirar("resumo", os_id)
+    db.session.commit()
+
+    assert [(t.tipo, t.os_id, t.status) for t in tarefas()] == [("resumo", os_id, "pendente")]
+    assert repetida.id == tarefas()[0].id
+
+
+def test_tarefa_executada_por_um_so_worker(app, usuario, criar_cliente, criar_os):
+    os_id = criar_os(criar_cliente()["id"])["id"]
+    execucoes = []
+    primeira, segunda = fila(app, execucoes), fila(app, execucoes)
+
+    assert primeira.processar_proxima() is True
+    assert segunda.processar_proxima() is False
+
+    (tarefa,) = tarefas()
+    assert execucoes == [os_id]
+    assert (tarefa.status, tarefa.tentativas, tarefa.bloqueado_por) == ("concluida", 1, None)
+    assert tarefa.resultado == f"Resumo da OS {os_id}"
+
+
+def test_workers_concorrentes_drenam_a_fila_sem_repetir(app, usuario, criar_cliente, criar_os):
+    cliente_id = criar_cliente()["id"]
+    os_ids = [criar_os(cliente_id)["id"] for _ in range(12)]
+    execucoes = []
+    workers = [fila(app, execucoes) for _ in range(4)]
+    barreira = threading.Barrier(len(workers))
+
+    def drenar(worker):
+        with app.app_context():
+            barreira.wait()
+            while worker.processar_proxima():
+                pass
+            db.session.remove()
+
+    threads = [threading.Thread(target=drenar, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(execucoes) == os_ids
+    assert {t.status for t in tarefas()} == {"concluida"}
+
+
+def test_falha_volta_para_a_fila_com_backoff_ate_o_limite(app, usuario, criar_cliente, criar_os):
+    criar_os(criar_cliente()["id"])
+    com_backoff = fila(app, erro="API indisponível", tentativas=2, backoff=60)
+
+    assert com_backoff.processar_proxima() is True
+    (tarefa,) = tarefas()
+    assert (tarefa.status, tarefa.tentativas, tarefa.ultimo_erro) == ("pendente", 1, "API indisponível")
+    assert tarefa.disponivel_em > datetime.now() + timedelta(seconds=50)
+    assert com_backoff.processar_proxima() is False  # Ainda no backoff
+
+    tarefa.disponivel_em = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+    assert com_backoff.processar_proxima() is True
+
+    (tarefa,) = tarefas()
+    assert (tarefa.status, tarefa.tentativas) == ("falhou", 2)
+    assert com_backoff.processar_proxima() is False
+
+
+def test_trava_expirada_e_retomada(app, usuario, criar_cliente, criar_os):
+    os_id = criar_os(criar_cliente()["id"])["id"]
+    (tarefa,) = tarefas()
+    tarefa.status = "executando"
+    tarefa.tentativas = 1
+    tarefa.bloqueado_por = "worker-morto"
+    tarefa.bloqueado_ate = datetime.now() + timedelta(minutes=5)
+    db.session.commit()
+    execucoes = []
+    worker = fila(app, execucoes)
+
+    assert worker.processar_proxima() is False  # Trava ainda válida
+
+    tarefa.bloqueado_ate = datetime.now() - timedelta(seconds=1)
+    db.session.commit()
+    assert worker.processar_proxima() is True
+
+    (tarefa,) = tarefas()
+    assert execucoes == [os_id]
+    assert (tarefa.status, tarefa.tentativas) == ("concluida", 2)
@@ -0,0 +1,76 @@
+"""Testes da paginação por keyset de GET /api/os."""
+
+from datetime import datetime
+
+from extensions import db
+from models import OrdemServico
+
+
+def percorrer(cliente_http, cabecalhos, url, **parametros):
+    """Segue proximoCursor até o fim. Retorna as páginas (listas de itens)."""
+    paginas, cursor = [], None
+    while True:
+        if cursor:
+            parametros["cursor"] = cursor
+        resposta = cliente_http.get(url, query_string=parametros, headers=cabecalhos)
+        assert resposta.status_code == 200, resposta.get_json()
+        corpo = resposta.get_json()
+        paginas.append(corpo["itens"])
+        cursor = corpo["proximoCursor"]
+        if not cursor:
+            return paginas
+
+
+def test_os_paginadas_sem_repetir_nem_pular(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente()
+    ids = [criar_os(cliente["id"])["id"] for _ in range(5)]
+
+    paginas = percorrer(cliente_http, cabecalhos, "/api/os/", limite=2)
+
+    assert [len(p) for p in paginas] == [2, 2, 1]
+    assert [item["id"] for p in paginas for item in p] == sorted(ids, reverse=True)
+
+
+def test_os_com_mesmo_criado_em_desempatam_pelo_id(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente()
+    ids = [criar_os(cliente["id"])["id"] for _ in range(4)]
+    OrdemServico.query.update({OrdemServico.criado_em: datetime(2025, 3, 10, 9, 0)})
+    db.session.commit()
+
+    paginas = percorrer(cliente_http, cabecalhos, "/api/os/", limite=3)
+
+    assert [item["id"] for p in paginas for item in p] == sorted(ids, reverse=True)
+
+
+def test_os_sem_criado_em_aparecem_no_fim(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente()
+    ids = [criar_os(cliente["id"])["id"] for _ in range(5)]
+    sem_data = ids[1], ids[3]
+    db.session.execute(
+        OrdemServico.__table__.update()
+        .where(OrdemServico.__table__.c.id.in_(sem_data))
+        .values(criado_em=None)
+    )
+    db.session.commit()
+
+    paginas = percorrer(cliente_http, cabecalhos, "/api/os/", limite=2)
+    vistos = [item["id"] for p in paginas for item in p]
+
+    assert sorted(vistos) == sorted(ids)
+    assert vistos[-2:] == sorted(sem_data, reverse=True)
+
+
+def test_os_filtro_de_status_paginado(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente()
+    prontas = [criar_os(cliente["id"], status="pronto")["id"] for _ in range(3)]
+    criar_os(cliente["id"], status="aguardando")
+
+    paginas = percorrer(cliente_http, cabecalhos, "/api/os/", limite=2, status="pronto")
+
+    assert [item["id"] for p in paginas for item in p] == sorted(prontas, reverse=True)
+
+
+def test_cursor_invalido(cliente_http, cabecalhos):
+    resposta = cliente_http.get("/api/os/?cursor=nao-e-um-cursor", headers=cabecalhos)
+
+    assert resposta.status_code == 400
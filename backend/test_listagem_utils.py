@@ -0,0 +1,52 @@
+"""Testes do envio em streaming das listas completas (resposta_json_stream)."""
+
+import listagem_utils
+from extensions import db
+from models import ProdutoEstoque
+
+
+def trechos(cliente_http, cabecalhos, url):
+    resposta = cliente_http.get(url, headers=cabecalhos, buffered=False)
+    assert resposta.status_code == 200
+    assert resposta.mimetype == "application/json"
+    partes = [parte.decode() for parte in resposta.response]
+    resposta.close()
+    return partes
+
+
+def test_lista_vazia(cliente_http, cabecalhos):
+    assert "".join(trechos(cliente_http, cabecalhos, "/api/os/")) == "[]"
+
+
+def test_os_em_trechos_formam_o_mesmo_json(cliente_http, cabecalhos, criar_cliente, criar_os, monkeypatch):
+    cliente = criar_cliente(nome="José Conceição")
+    ids = [criar_os(cliente["id"])["id"] for _ in range(5)]
+    monkeypatch.setattr(listagem_utils, "TAMANHO_TRECHO", 1)
+    monkeypatch.setattr(listagem_utils, "LOTE_STREAM", 2)
+
+    partes = trechos(cliente_http, cabecalhos, "/api/os/")
+
+    assert partes[0] == "["  # Enviado antes da consulta
+    assert len(partes) == 7  # "[", uma OS por trecho e "]"
+    corpo = cliente_http.get("/api/os/", headers=cabecalhos).get_json()
+    assert [item["id"] for item in corpo] == ids[::-1]
+    assert corpo[0]["clienteNome"] == "José Conceição"
+    assert "José Conceição" in "".join(partes)  # ensure_ascii=False
+
+
+def test_clientes_com_campos_escolhidos(cliente_http, cabecalhos, criar_cliente):
+    criados = [criar_cliente() for _ in range(3)]
+
+    resposta = cliente_http.get("/api/clientes/", query_string={"fields": "id,nome"}, headers=cabecalhos)
+
+    assert resposta.get_json() == [{"id": c["id"], "nome": c["nome"]} for c in reversed(criados)]
+
+
+def test_estoque_completo(cliente_http, cabecalhos, usuario):
+    for i in range(3):
+        db.session.add(ProdutoEstoque(codigo=f"P{i}", nome=f"Peça {i}", categoria="Telas", quantidade=i))
+    db.session.commit()
+
+    resposta = cliente_http.get("/api/estoque/", headers=cabecalhos)
+
+    assert sorted(p["nome"] for p in resposta.get_json()) == ["Peça 0", "Peça 1", "Peça 2"]
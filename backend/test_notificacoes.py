@@ -0,0 +1,147 @@
+"""Testes das notificações automáticas."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import CheckpointVerificacao, Notificacao, OrdemServico
+from routes_notificacoes import (
+    contar_nao_lidas,
+    nova_notificacao_os_pronta,
+    registrar_notificacoes,
+    verificar_e_criar_notificacoes,
+)
+
+
+@pytest.fixture
+def os_atrasada_antiga(usuario, criar_cliente, criar_os):
+    """OS com prazo vencido há dias e sem alterações recentes."""
+    os_criada = criar_os(criar_cliente()["id"])
+    antigo = datetime.now() - timedelta(days=10)
+    db.session.execute(
+        OrdemServico.__table__.update()
+        .where(OrdemServico.__table__.c.id == os_criada["id"])
+        .values(criado_em=antigo, prazo_limite=antigo + timedelta(days=1), atualizado_em=antigo)
+    )
+    db.session.commit()
+    return os_criada["id"]
+
+
+def notificacoes(tipo):
+    db.session.expire_all()
+    return Notificacao.query.filter_by(tipo=tipo).all()
+
+
+def apagar_notificacoes():
+    db.session.execute(Notificacao.__table__.delete())
+    db.session.commit()
+
+
+def test_verificacao_repetida_nao_duplica(os_atrasada_antiga):
+    verificar_e_criar_notificacoes()
+    verificar_e_criar_notificacoes()
+
+    criadas = notificacoes("os_atrasada")
+    assert len(criadas) == 1
+    assert criadas[0].chave_dedup == f"os_atrasada:{os_atrasada_antiga}"
+
+
+def test_registrar_ignora_chave_existente(usuario, criar_cliente, criar_os):
+    os_pronta = db.session.get(OrdemServico, criar_os(criar_cliente()["id"])["id"])
+
+    primeira = registrar_notificacoes([nova_notificacao_os_pronta(os_pronta)])
+    db.session.commit()
+    segunda = registrar_notificacoes([nova_notificacao_os_pronta(os_pronta)])
+    db.session.commit()
+
+    assert len(primeira) == 1 and segunda == []
+    assert len(notificacoes("os_pronta")) == 1
+
+
+def test_varredura_incremental_usa_checkpoint(os_atrasada_antiga):
+    verificar_e_criar_notificacoes()  # Sem checkpoint: varredura completa
+    assert len(notificacoes("os_atrasada")) == 1
+    fontes = {c.fonte for c in CheckpointVerificacao.query.all()}
+    assert fontes == {"ordens_servico", "produtos_estoque", "prazos"}
+
+    # A OS não mudou desde o checkpoint: a próxima verificação não a reavalia
+    apagar_notificacoes()
+    verificar_e_criar_notificacoes()
+    assert notificacoes("os_atrasada") == []
+
+    # Alterada depois do checkpoint: volta a ser avaliada
+    db.session.get(OrdemServico, os_atrasada_antiga).observacoes = "Cliente ligou"
+    db.session.commit()
+    verificar_e_criar_notificacoes()
+    assert len(notificacoes("os_atrasada")) == 1
+
+
+def test_prazo_vencido_desde_o_checkpoint(usuario, criar_cliente, criar_os):
+    verificar_e_criar_notificacoes()  # Grava os checkpoints
+    os_criada = criar_os(criar_cliente()["id"])
+    antigo = datetime.now() - timedelta(days=10)
+    db.session.execute(
+        OrdemServico.__table__.update()
+        .where(OrdemServico.__table__.c.id == os_criada["id"])
+        .values(prazo_limite=datetime.now() - timedelta(seconds=1), atualizado_em=antigo)
+    )
+    db.session.commit()
+
+    verificar_e_criar_notificacoes()
+
+    assert [n.dados_referencia["os_id"] for n in notificacoes("os_atrasada")] == [os_criada["id"]]
+
+
+def test_contador_de_gerais_pela_marca_dagua(cliente_http, cabecalhos, usuario):
+    registrar_notificacoes(
+        [Notificacao(tipo="aviso", titulo=f"Aviso {i}", mensagem="Geral") for i in range(3)]
+    )
+    db.session.commit()
+    assert contar_nao_lidas(usuario.id) == 3
+    db.session.refresh(usuario)
+    assert usuario.notificacoes_nao_lidas == 0  # Gerais não gravam em usuarios
+
+    lista = cliente_http.get("/api/notificacoes", headers=cabecalhos).get_json()
+    cliente_http.put(f"/api/notificacoes/{lista[0]['id']}/lida", headers=cabecalhos)
+    cliente_http.delete(f"/api/notificacoes/{lista[1]['id']}", headers=cabecalhos)
+    assert cliente_http.get("/api/notificacoes/contador", headers=cabecalhos).get_json() == {"nao_lidas": 1}
+
+    cliente_http.put("/api/notificacoes/marcar-todas-lidas", headers=cabecalhos)
+    assert cliente_http.get("/api/notificacoes/contador", headers=cabecalhos).get_json() == {"nao_lidas": 0}
+
+
+def test_os_pronta_de_novo_gera_outro_aviso(cliente_http, cabecalhos, usuario, criar_cliente, criar_os):
+    os_id = criar_os(criar_cliente()["id"])["id"]
+
+    for status in ("pronto", "em_reparo", "pronto"):
+        resposta = cliente_http.put(f"/api/os/{os_id}", json={"status": status}, headers=cabecalhos)
+        assert resposta.status_code == 200
+    verificar_e_criar_notificacoes()  # A varredura não duplica o aviso atual
+
+    criadas = sorted(notificacoes("os_pronta"), key=lambda n: n.id)
+    assert len(criadas) == 2
+    assert [n.chave_dedup for n in criadas] == [None, f"os_pronta:{os_id}"]
+
+
+def test_heartbeat_do_stream_envia_contador_alterado_por_outro_processo(
+    cliente_http, cabecalhos, usuario, monkeypatch
+):
+    import routes_notificacoes
+
+    monkeypatch.setattr(routes_notificacoes, "INTERVALO_HEARTBEAT", 0.05)
+    ticket = cliente_http.post("/api/notificacoes/stream/ticket", headers=cabecalhos).get_json()["ticket"]
+    resposta = cliente_http.get(f"/api/notificacoes/stream?ticket={ticket}", buffered=False)
+    eventos = iter(resposta.response)
+
+    assert next(eventos) == b'event: contador\ndata: {"nao_lidas": 0}\n\n'
+    assert next(eventos) == b": ping\n\n"
+
+    # Gravada sem passar pelo hub deste processo (como faria outro worker)
+    with db.engine.begin() as conexao:
+        conexao.execute(
+            Notificacao.__table__.insert().values(tipo="aviso", titulo="Aviso", mensagem="Geral")
+        )
+
+    assert next(eventos) == b'event: contador\ndata: {"nao_lidas": 1}\n\n'
+    resposta.close()
@@ -0,0 +1,102 @@
+"""Testes do rollup diário (resumo_financeiro_diario) e de GET /api/financeiro/resumo."""
+
+from datetime import date, datetime
+
+from extensions import db
+from models import Cliente, OrdemServico, ResumoFinanceiroDiario
+from routes_financeiro import recalcular_resumo_dia, reconstruir_resumos
+
+
+def resumo_de_hoje():
+    db.session.expire_all()
+    return db.session.get(ResumoFinanceiroDiario, date.today())
+
+
+def test_rollup_acompanha_atualizacao_da_os(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente()
+    os_entregue = criar_os(cliente["id"], valorOrcamento=150)
+    criar_os(cliente["id"], valorOrcamento=80)
+
+    resumo = resumo_de_hoje()
+    assert (resumo.total_os, resumo.aguardando, resumo.entregue) == (2, 2, 0)
+
+    resposta = cliente_http.put(
+        f"/api/os/{os_entregue['id']}", json={"status": "entregue"}, headers=cabecalhos
+    )
+    assert resposta.status_code == 200
+
+    resumo = resumo_de_hoje()
+    assert (resumo.total_os, resumo.aguardando, resumo.entregue) == (2, 1, 1)
+    assert float(resumo.receitas) == 150
+
+    resposta = cliente_http.get("/api/financeiro/resumo", headers=cabecalhos)
+    corpo = resposta.get_json()
+    assert corpo["receitas"] == 150
+    assert corpo["osConcluidas"] == 1
+    assert corpo["osPorStatus"] == {"aguardando": 1, "entregue": 1}
+
+
+def test_rollup_igual_a_reconstrucao(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente()
+    for valor in (100, 200, 300):
+        os_criada = criar_os(cliente["id"], valorOrcamento=valor)
+        cliente_http.put(f"/api/os/{os_criada['id']}", json={"status": "entregue"}, headers=cabecalhos)
+
+    incremental = resumo_de_hoje()
+    esperado = (incremental.total_os, incremental.entregue, float(incremental.receitas))
+
+    reconstruir_resumos()
+    reconstruido = resumo_de_hoje()
+
+    assert (reconstruido.total_os, reconstruido.entregue, float(reconstruido.receitas)) == esperado
+
+
+def test_upsert_quando_outra_transacao_criou_o_dia(criar_cliente, criar_os):
+    cliente = criar_cliente()
+    criar_os(cliente["id"], valorOrcamento=50)
+    # Linha do dia gravada (com valores antigos) por outra transação
+    with db.engine.begin() as conexao:
+        conexao.execute(ResumoFinanceiroDiario.__table__.delete())
+        conexao.execute(ResumoFinanceiroDiario.__table__.insert().values(dia=date.today(), total_os=9))
+
+    recalcular_resumo_dia(date.today())
+    db.session.commit()
+
+    assert resumo_de_hoje().total_os == 1
+
+
+def test_excluir_cliente_recalcula_dias_das_os(criar_cliente, criar_os):
+    mantido = criar_cliente()
+    removido = criar_cliente()
+    criar_os(mantido["id"], valorOrcamento=10)
+    criar_os(removido["id"], valorOrcamento=20)
+    criar_os(removido["id"], valorOrcamento=30)
+
+    db.session.delete(db.session.get(Cliente, removido["id"]))
+    db.session.commit()
+
+    assert resumo_de_hoje().total_os == 1
+
+    db.session.delete(db.session.get(Cliente, mantido["id"]))
+    db.session.commit()
+
+    assert resumo_de_hoje() is None
+
+
+def test_serie_semanal_usa_semana_iso(cliente_http, cabecalhos, criar_cliente, criar_os):
+    cliente = criar_cliente()
+    dias = ("2024-12-29", "2024-12-30", "2025-01-05", "2025-01-06")
+    ids = [criar_os(cliente["id"], valorOrcamento=10, status="entregue")["id"] for _ in dias]
+    for os_id, dia in zip(ids, dias):
+        db.session.get(OrdemServico, os_id).criado_em = datetime.fromisoformat(dia)
+    db.session.commit()
+    reconstruir_resumos()
+
+    resposta = cliente_http.get(
+        "/api/financeiro/resumo",
+        query_string={"dataInicio": "2024-12-01", "dataFim": "2025-01-31", "granularidade": "semana"},
+        headers=cabecalhos,
+    )
+
+    serie = {p["periodo"]: p["osConcluidas"] for p in resposta.get_json()["serie"]}
+    assert serie == {"2024-W52": 1, "2025-W01": 2, "2025-W02": 1}
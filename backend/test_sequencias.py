@@ -0,0 +1,66 @@
+"""Testes da alocação de valores de sequência (números de OS)."""
+
+import threading
+
+from extensions import db
+from models import OrdemServico, Sequencia
+from sequencias_utils import AlocadorSequencia
+
+
+def alocar_em_paralelo(app, alocadores, por_thread, bloco=1):
+    """Uma thread por alocador (como workers diferentes), todas ao mesmo tempo."""
+    valores = []
+    lock = threading.Lock()
+    barreira = threading.Barrier(len(alocadores))
+
+    def alocar(alocador):
+        with app.app_context():
+            barreira.wait()
+            obtidos = [alocador.proximo(bloco) for _ in range(por_thread)]
+        with lock:
+            valores.extend(obtidos)
+
+    threads = [threading.Thread(target=alocar, args=(a,)) for a in alocadores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return valores
+
+
+def test_workers_concorrentes_nao_repetem_nem_pulam(app):
+    alocadores = [AlocadorSequencia("teste") for _ in range(6)]
+
+    valores = alocar_em_paralelo(app, alocadores, por_thread=20)
+
+    assert sorted(valores) == list(range(1, 121))
+
+
+def test_blocos_reservados_sao_disjuntos(app):
+    alocadores = [AlocadorSequencia("teste") for _ in range(4)]
+
+    valores = alocar_em_paralelo(app, alocadores, por_thread=7, bloco=5)
+
+    # Cada worker reservou 2 blocos de 5 e usou 7 valores: sem repetições, com lacunas
+    assert len(set(valores)) == len(valores) == 28
+    assert db.session.get(Sequencia, "teste").valor == 40
+
+
+def test_semente_na_primeira_reserva(app):
+    alocador = AlocadorSequencia("teste", valor_inicial=lambda conexao: 41)
+
+    assert [alocador.proximo(), alocador.proximo()] == [42, 43]
+
+
+def test_numero_da_os_continua_a_numeracao_existente(criar_cliente, criar_os):
+    cliente = criar_cliente()
+    assert criar_os(cliente["id"])["numeroOS"] == "#OS0001"
+
+    # Banco de antes da tabela sequencias: a semente vem do maior número gravado
+    db.session.execute(OrdemServico.__table__.update().values(numero_os="#OS0041"))
+    db.session.execute(Sequencia.__table__.delete())
+    db.session.commit()
+
+    numeros = [criar_os(cliente["id"])["numeroOS"] for _ in range(2)]
+
+    assert numeros == ["#OS0042", "#OS0043"]
@@ -0,0 +1,76 @@
+"""Testes dos índices em memória de casos parecidos e de nomes de clientes."""
+
+from extensions import db
+from models import Cliente, OrdemServico
+from similaridade_utils import IndiceDiagnosticos, IndiceNomesClientes
+
+
+def caso(criar_os, cliente_id, problema, diagnostico, tipo="Celular", modelo="Samsung Galaxy A10"):
+    return criar_os(
+        cliente_id,
+        tipoAparelho=tipo,
+        marcaModelo=modelo,
+        problemaRelatado=problema,
+        diagnosticoTecnico=diagnostico,
+        status="entregue",
+    )["id"]
+
+
+def test_casos_parecidos_pelo_problema_do_mesmo_tipo(usuario, criar_cliente, criar_os):
+    cliente_id = criar_cliente()["id"]
+    tela = caso(criar_os, cliente_id, "Tela quebrada após queda", "Troca do display", modelo="Motorola G8")
+    bateria = caso(criar_os, cliente_id, "Bateria não segura carga", "Troca da bateria")
+    caso(criar_os, cliente_id, "Tela quebrada após queda", "Troca da tela", tipo="Notebook")
+    criar_os(cliente_id, problemaRelatado="Tela quebrada")  # Aberta: fora do índice
+
+    similares = IndiceDiagnosticos().buscar("celular", "Samsung Galaxy A10", "tela QUEBRADA", k=3)
+
+    assert [s["osId"] for s in similares] == [tela]
+    assert similares[0]["diagnostico"] == "Troca do display"
+    assert bateria not in [s["osId"] for s in similares]  # Mesmo modelo, outro defeito
+
+
+def test_sincronizacao_incremental_acompanha_status(usuario, criar_cliente, criar_os):
+    cliente_id = criar_cliente()["id"]
+    os_id = criar_os(cliente_id, problemaRelatado="Não liga", diagnosticoTecnico="Placa em curto")["id"]
+    indice = IndiceDiagnosticos()
+    assert indice.buscar("Celular", "", "não liga") == []
+
+    db.session.get(OrdemServico, os_id).status = "pronto"
+    db.session.commit()
+    indice.sincronizar(forcar=True)
+    assert [s["osId"] for s in indice.buscar("Celular", "", "não liga")] == [os_id]
+
+    db.session.get(OrdemServico, os_id).status = "em_reparo"
+    db.session.commit()
+    indice.sincronizar(forcar=True)
+    assert indice.buscar("Celular", "", "não liga") == []
+
+
+def test_nomes_por_cobertura_e_com_erro_de_digitacao(usuario, criar_cliente):
+    carlos_lima = criar_cliente(nome="Carlos Eduardo Lima")["id"]
+    carlos_souza = criar_cliente(nome="Carlos Souza")["id"]
+    joao = criar_cliente(nome="João Pereira")["id"]
+    indice = IndiceNomesClientes()
+
+    assert [i for i, _ in indice.buscar("OS do Carlos Lima")] == [carlos_lima]
+    assert [i for i, _ in indice.buscar("Carlos")] == [carlos_souza, carlos_lima]  # Mais coberto antes
+    assert [i for i, _ in indice.buscar("cliente jaão")] == [joao]
+    assert [i for i, _ in indice.buscar("Pereyra")] == [joao]
+    assert indice.buscar("Fernanda") == []
+
+
+def test_nomes_acompanham_alteracoes_confirmadas(usuario, criar_cliente):
+    cliente_id = criar_cliente(nome="Ana Paula")["id"]
+    indice = IndiceNomesClientes()
+    assert [i for i, _ in indice.buscar("Ana Paula")] == [cliente_id]
+
+    cliente = db.session.get(Cliente, cliente_id)
+    cliente.nome = "Ana Beatriz"
+    cliente.status = "inativo"
+    db.session.commit()
+    indice.sincronizar(forcar=True)
+
+    assert indice.buscar("Paula") == []
+    assert indice.buscar("Ana Beatriz") == []
+    assert [i for i, _ in indice.buscar("Ana Beatriz", apenas_ativos=False)] == [cliente_id]
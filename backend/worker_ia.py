@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Processo dedicado que drena a fila persistente de tarefas de IA (tarefas_ia).
+Pode rodar em uma ou mais instâncias; use AI_WORKERS=0 nos servidores web
+para deixar as chamadas de IA apenas para este processo.
+"""
+
+from app import create_app
+
+
+def executar():
+    # Sem threads da fila nem agendador: este processo roda o próprio loop
+    app = create_app(servicos_em_segundo_plano=False)
+    fila_ia = app.extensions["fila_ia"]
+
+    print(f"🤖 Worker de IA iniciado ({fila_ia.identificador})")
+    try:
+        fila_ia.executar_worker()
+    except KeyboardInterrupt:
+        print("Worker de IA encerrado")
+
+
+if __name__ == '__main__':
+    executar()
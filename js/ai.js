@@ -151,7 +151,7 @@ class AIChatManager {
         this.historyList = document.getElementById('historyList');
         this.isLoading = false;
         this.historyManager = new ConversationHistory();
-        this.estadoConversacional = null; // Estado para fluxos conversacionais
+        this.conversaId = null; // Sessão no servidor (estado do fluxo e entidades citadas)
 
         this.init();
     }
@@ -200,8 +200,8 @@ class AIChatManager {
     }
 
     novaConversa() {
-        // Resetar estado conversacional ao iniciar nova conversa
-        this.estadoConversacional = null;
+        // Nova sessão no servidor ao iniciar nova conversa
+        this.conversaId = null;
 
         const conversation = this.historyManager.createNewConversation();
         this.carregarMensagensConversa(conversation);
@@ -218,6 +218,9 @@ class AIChatManager {
     }
 
     carregarMensagensConversa(conversation) {
+        // A sessão no servidor é da conversa anterior
+        this.conversaId = null;
+
         // Limpar mensagens atuais
         this.chatMessages.innerHTML = '';
 
@@ -408,7 +411,7 @@ class AIChatManager {
 
         // Enviar para API
         try {
-            const resposta = await this.consultarIA(mensagem);
+            const resposta = await this.consultarIA(mensagem, (texto) => this.atualizarLoading(texto));
             this.removerLoading();
             this.adicionarMensagemIA(resposta);
         } catch (error) {
@@ -418,35 +421,36 @@ class AIChatManager {
         }
     }
 
-    async consultarIA(consulta) {
+    async consultarIA(consulta, aoTexto) {
         const payload = { consulta };
 
-        // Incluir estado conversacional se existir
-        if (this.estadoConversacional) {
-            payload.estado_conversacional = this.estadoConversacional;
+        // O estado da conversa fica no servidor; basta enviar o id da sessão
+        if (this.conversaId) {
+            payload.conversaId = this.conversaId;
         }
 
-        const response = await fetch('/api/ai/consulta', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${getToken()}`
-            },
-            body: JSON.stringify(payload)
+        // Resposta em streaming: aoTexto recebe o texto acumulado a cada trecho
+        let texto = '';
+        let resultado = null;
+        let erro = null;
+
+        await apiStream('/api/ai/consulta/stream', payload, (evento, dados) => {
+            if (evento === 'token') {
+                texto += dados.texto;
+                if (aoTexto) aoTexto(texto);
+            } else if (evento === 'fim') {
+                resultado = dados;
+            } else if (evento === 'erro') {
+                erro = new Error(dados.mensagem || 'Erro na consulta');
+            }
         });
 
-        if (!response.ok) {
-            const error = await response.json();
-            throw new Error(error.mensagem || 'Erro na consulta');
+        if (erro || !resultado) {
+            throw erro || new Error('Resposta da IA incompleta');
         }
 
-        const resultado = await response.json();
-
-        // Atualizar estado conversacional se fornecido pela API
-        if (resultado.estado_conversacional) {
-            this.estadoConversacional = resultado.estado_conversacional;
-        } else {
-            this.estadoConversacional = null; // Finalizar fluxo conversacional
+        if (resultado.conversaId) {
+            this.conversaId = resultado.conversaId;
         }
 
         return resultado;
@@ -643,6 +647,15 @@ class AIChatManager {
         this.scrollParaBaixo();
     }
 
+    atualizarLoading(texto) {
+        // Troca os pontos de carregamento pelo texto parcial da resposta
+        const loadingText = document.querySelector('#loadingMessage .message-text');
+        if (loadingText) {
+            loadingText.textContent = texto;
+            this.scrollParaBaixo();
+        }
+    }
+
     removerLoading() {
         this.isLoading = false;
         this.sendButton.disabled = false;
@@ -93,8 +93,25 @@ async function apiRequest(path, options = {}) {
 // CLIENTES - Funções específicas
 // ========================================
 
-async function listarClientesApi() {
-  return await apiRequest("/api/clientes");
+async function listarClientesApi(filtros = {}) {
+  // filtros: status, tipoPessoa, fields (ex.: "id,nome"), limite, cursor
+  // (com limite/cursor a resposta é paginada)
+  const params = new URLSearchParams();
+  Object.entries(filtros).forEach(([chave, valor]) => {
+    if (valor !== undefined && valor !== null && valor !== "") {
+      params.append(chave, valor);
+    }
+  });
+  const query = params.toString();
+  return await apiRequest(`/api/clientes${query ? `?${query}` : ""}`);
+}
+
+async function obterClienteApi(id) {
+  return await apiRequest(`/api/clientes/${id}`);
+}
+
+async function obterEstatisticasClientesApi() {
+  return await apiRequest("/api/clientes/estatisticas");
 }
 
 async function criarClienteApi(dados) {
@@ -144,8 +161,38 @@ async function deletarProdutoApi(id) {
 // OS - Funções específicas
 // ========================================
 
-async function listarOSApi() {
-  return await apiRequest("/api/os");
+async function listarOSApi(filtros = {}) {
+  // filtros: status, prioridade, clienteId, dataInicio, dataFim,
+  // limite, cursor, incluirTotal (com limite/cursor a resposta é paginada)
+  const params = new URLSearchParams();
+  Object.entries(filtros).forEach(([chave, valor]) => {
+    if (valor !== undefined && valor !== null && valor !== "") {
+      params.append(chave, valor);
+    }
+  });
+  const query = params.toString();
+  return await apiRequest(`/api/os${query ? `?${query}` : ""}`);
+}
+
+// Itens por requisição ao percorrer listagens paginadas (máximo aceito pela API)
+const LIMITE_PAGINA_API = 200;
+
+/**
+ * Percorre uma listagem paginada por keyset (listarOSApi, listarClientesApi)
+ * seguindo proximoCursor até o fim. Cada requisição traz no máximo `limite`
+ * itens; aoReceberPagina(itens) é chamado a cada página recebida.
+ * Retorna todos os itens.
+ */
+async function listarTodasPaginasApi(listarApi, filtros = {}, aoReceberPagina = null) {
+  const itens = [];
+  let cursor = null;
+  do {
+    const pagina = await listarApi({ limite: LIMITE_PAGINA_API, ...filtros, cursor });
+    itens.push(...pagina.itens);
+    if (aoReceberPagina) aoReceberPagina(pagina.itens);
+    cursor = pagina.proximoCursor;
+  } while (cursor);
+  return itens;
 }
 
 async function criarOSApi(dados) {
@@ -162,6 +209,28 @@ async function atualizarOSApi(id, dados) {
   });
 }
 
+// ========================================
+// FINANCEIRO - Funções específicas
+// ========================================
+
+async function buscarApi(filtros = {}) {
+  // filtros: q, tipos (ex.: "cliente"), limite, pagina
+  // Resposta: { itens: [{ tipo, pontuacao, dados }], temMais }
+  const params = new URLSearchParams();
+  Object.entries(filtros).forEach(([chave, valor]) => {
+    if (valor !== undefined && valor !== null && valor !== "") {
+      params.append(chave, valor);
+    }
+  });
+  return await apiRequest(`/api/busca?${params.toString()}`);
+}
+
+async function obterResumoFinanceiroApi(filtros = {}) {
+  // filtros: dataInicio, dataFim (AAAA-MM-DD) e granularidade (dia, semana, mes)
+  const params = new URLSearchParams(filtros);
+  return await apiRequest(`/api/financeiro/resumo?${params.toString()}`);
+}
+
 // ========================================
 // AI - Funções específicas
 // ========================================
@@ -172,3 +241,71 @@ async function gerarDiagnosticoApi(dados) {
     body: JSON.stringify(dados),
   });
 }
+
+// Lê uma resposta text/event-stream de um POST e chama aoEvento(evento, dados)
+async function apiStream(path, dados, aoEvento) {
+  const resp = await fetch(
+    `${API_BASE_URL}${path}`,
+    adicionarAuthHeader({
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(dados),
+    })
+  );
+
+  if (!resp.ok || !resp.body) {
+    let erro = {};
+    try {
+      erro = await resp.json();
+    } catch (e) {
+      // resposta sem JSON
+    }
+    throw new Error(erro.mensagem || erro.erro || `Erro na API (${resp.status})`);
+  }
+
+  const leitor = resp.body.getReader();
+  const decodificador = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await leitor.read();
+    if (done) break;
+    buffer += decodificador.decode(value, { stream: true });
+
+    let fim;
+    while ((fim = buffer.indexOf("\n\n")) !== -1) {
+      const bloco = buffer.slice(0, fim);
+      buffer = buffer.slice(fim + 2);
+
+      let evento = "message";
+      let dadosEvento = "";
+      bloco.split("\n").forEach((linha) => {
+        if (linha.startsWith("event: ")) evento = linha.slice(7);
+        else if (linha.startsWith("data: ")) dadosEvento += linha.slice(6);
+      });
+      if (dadosEvento) aoEvento(evento, JSON.parse(dadosEvento));
+    }
+  }
+}
+
+// Pré-diagnóstico em streaming: aoTexto recebe o texto acumulado a cada trecho.
+// Resolve com o resultado final (mesmo formato de gerarDiagnosticoApi).
+async function gerarDiagnosticoStreamApi(dados, aoTexto) {
+  let texto = "";
+  let resultado = null;
+  let erro = null;
+
+  await apiStream("/api/ai/diagnostico/stream", dados, (evento, payload) => {
+    if (evento === "token") {
+      texto += payload.texto;
+      if (aoTexto) aoTexto(texto);
+    } else if (evento === "fim") {
+      resultado = payload;
+    } else if (evento === "erro") {
+      erro = new Error(payload.mensagem || payload.erro);
+    }
+  });
+
+  if (erro) throw erro;
+  return resultado;
+}
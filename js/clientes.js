@@ -11,13 +11,14 @@ let clientesEmMemoria = [];
 // ============================
 
 /**
- * Carrega todos os clientes da API
+ * Carrega todos os clientes da API, página a página (limite + proximoCursor).
+ * Não é chamada automaticamente: cada página pede só os campos que usa.
+ * @param {Object} filtros - status, tipoPessoa e fields (ex.: { fields: "id,nome" } para selects)
  * @returns {Promise<Array>} Array de clientes
  */
-async function carregarClientes() {
+async function carregarClientes(filtros = {}) {
   try {
-    const clientes = await listarClientesApi();
-    clientesEmMemoria = clientes || [];
+    clientesEmMemoria = await listarTodasPaginasApi(listarClientesApi, filtros);
   } catch (e) {
     clientesEmMemoria = [];
   }
@@ -95,20 +96,21 @@ function buscarClientePorId(id) {
 /**
  * Busca clientes por termo (nome, CPF, telefone, email)
  * @param {string} termo - Termo de busca
+ * @param {Array} clientes - Lista onde buscar (padrão: clientes em memória)
  * @returns {Array} Array de clientes encontrados
  */
-function buscarClientes(termo) {
+function buscarClientes(termo, clientes = clientesEmMemoria) {
   if (!termo || termo.trim() === "") {
-    return clientesEmMemoria;
+    return clientes;
   }
 
   const termoLower = termo.toLowerCase();
 
-  return clientesEmMemoria.filter((cliente) => {
+  return clientes.filter((cliente) => {
     return (
       cliente.nome.toLowerCase().includes(termoLower) ||
-      cliente.cpfCnpj.includes(termo) ||
-      cliente.telefone.includes(termo) ||
+      (cliente.cpfCnpj || "").includes(termo) ||
+      (cliente.telefone || "").includes(termo) ||
       (cliente.email && cliente.email.toLowerCase().includes(termoLower))
     );
   });
@@ -289,11 +291,4 @@ function formatarTelefone(valor) {
   return valor;
 }
 
-// ============================
-// INICIALIZAÇÃO
-// ============================
-
-// Carrega clientes ao iniciar
-carregarClientes();
 console.log("✅ clientes.js carregado com sucesso!");
-console.log("📊 Total de clientes:", clientesEmMemoria.length);
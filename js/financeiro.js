@@ -3,9 +3,9 @@
 // ========================================
 
 // Variáveis globais para armazenar dados em memória
-let osEmMemoria = [];
-let clientesEmMemoria = [];
-let produtosEmMemoria = [];
+let resumoPeriodo = null;   // Agregados do período selecionado (/api/financeiro/resumo)
+let resumoGrafico = null;   // Agregados mensais dos últimos 6 meses
+let osReceitas = [];        // OS entregues do período (tabela de receitas e CSV)
 
 // Variáveis de controle
 let periodoAtual = 'mes_atual';
@@ -13,59 +13,66 @@ let dataInicioFiltro = null;
 let dataFimFiltro = null;
 let chartReceitasVsCustos = null;
 
+const LIMITE_OS_RECEITAS = 200;
+
 // ============================
 // FUNÇÕES DE CARREGAMENTO DE DADOS
 // ============================
 
 /**
- * Carrega todas as OS da API
+ * Carrega o resumo financeiro agregado do período selecionado
  */
-async function carregarOS() {
+async function carregarResumoPeriodo() {
+    const { inicio, fim } = getPeriodoDatas();
     try {
-        console.log('📡 Carregando OS para financeiro...');
-        const os = await listarOSApi();
-        osEmMemoria = os || [];
-        console.log('✅ OS carregadas:', osEmMemoria.length);
-        return osEmMemoria;
+        resumoPeriodo = await obterResumoFinanceiroApi({
+            dataInicio: formatarDataISO(inicio),
+            dataFim: formatarDataISO(fim),
+            granularidade: 'mes'
+        });
     } catch (e) {
-        console.error('❌ Erro ao carregar OS:', e);
-        osEmMemoria = [];
-        return osEmMemoria;
+        console.error('❌ Erro ao carregar resumo financeiro:', e);
+        resumoPeriodo = null;
     }
+    return resumoPeriodo;
 }
 
 /**
- * Carrega todos os clientes da API
+ * Carrega o resumo mensal dos últimos 6 meses para o gráfico
  */
-async function carregarClientes() {
+async function carregarResumoGrafico() {
+    const hoje = new Date();
     try {
-        console.log('📡 Carregando clientes para financeiro...');
-        const clientes = await listarClientesApi();
-        clientesEmMemoria = clientes || [];
-        console.log('✅ Clientes carregados:', clientesEmMemoria.length);
-        return clientesEmMemoria;
+        resumoGrafico = await obterResumoFinanceiroApi({
+            dataInicio: formatarDataISO(new Date(hoje.getFullYear(), hoje.getMonth() - 5, 1)),
+            dataFim: formatarDataISO(hoje),
+            granularidade: 'mes'
+        });
     } catch (e) {
-        console.error('❌ Erro ao carregar clientes:', e);
-        clientesEmMemoria = [];
-        return clientesEmMemoria;
+        console.error('❌ Erro ao carregar série do gráfico:', e);
+        resumoGrafico = null;
     }
+    return resumoGrafico;
 }
 
 /**
- * Carrega todos os produtos da API
+ * Carrega as OS entregues do período (apenas a primeira página)
  */
-async function carregarProdutos() {
+async function carregarOSReceitas() {
+    const { inicio, fim } = getPeriodoDatas();
     try {
-        console.log('📡 Carregando produtos para financeiro...');
-        const produtos = await listarProdutosApi();
-        produtosEmMemoria = produtos || [];
-        console.log('✅ Produtos carregados:', produtosEmMemoria.length);
-        return produtosEmMemoria;
+        const pagina = await listarOSApi({
+            status: 'entregue',
+            dataInicio: formatarDataISO(inicio),
+            dataFim: formatarDataISO(fim),
+            limite: LIMITE_OS_RECEITAS
+        });
+        osReceitas = (pagina && pagina.itens) || [];
     } catch (e) {
-        console.error('❌ Erro ao carregar produtos:', e);
-        produtosEmMemoria = [];
-        return produtosEmMemoria;
+        console.error('❌ Erro ao carregar OS do período:', e);
+        osReceitas = [];
     }
+    return osReceitas;
 }
 
 // ============================
@@ -73,31 +80,14 @@ async function carregarProdutos() {
 // ============================
 
 /**
- * Calcula métricas financeiras baseado no período
+ * Atualiza os indicadores financeiros do período
  */
 function calcularMetricasFinanceiras() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    // Filtra OS do período e status entregue
-    const osPeriodo = osEmMemoria.filter(os => {
-        if (os.status !== 'entregue') return false;
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
-
-    // Calcula receitas (valor das OS entregues)
-    const receitas = osPeriodo.reduce((total, os) => total + (os.valorOrcamento || 0), 0);
-
-    // Calcula custos (estimativa baseada em produtos com estoque baixo)
-    const custos = produtosEmMemoria.reduce((total, produto) => {
-        // Estimativa: custo médio por produto x quantidade em estoque baixa
-        const custoEstimado = produto.quantidade < produto.estoqueMinimo ?
-            (produto.precoCusto || 0) * (produto.estoqueMinimo - produto.quantidade) : 0;
-        return total + custoEstimado;
-    }, 0);
-
-    const lucro = receitas - custos;
-    const margem = receitas > 0 ? ((lucro / receitas) * 100) : 0;
+    const resumo = resumoPeriodo || {};
+    const receitas = resumo.receitas || 0;
+    const custos = resumo.custos || 0;
+    const lucro = resumo.lucro || 0;
+    const margem = resumo.margem || 0;
 
     // Atualiza indicadores na interface
     document.getElementById('totalReceitas').textContent = formatarMoeda(receitas);
@@ -211,32 +201,25 @@ function gerarDadosGrafico() {
     const receitas = [];
     const custos = [];
 
+    // Receitas por mês vindas do servidor (chave AAAA-MM)
+    const receitasPorMes = {};
+    ((resumoGrafico && resumoGrafico.serie) || []).forEach(item => {
+        receitasPorMes[item.periodo] = item.receitas;
+    });
+
+    // Custos estimados (igual para todos os meses por enquanto)
+    const custosMes = ((resumoGrafico && resumoGrafico.custos) || 0) / 6; // Divide pelos 6 meses
+
     // Últimos 6 meses
     for (let i = 5; i >= 0; i--) {
         const data = new Date();
+        data.setDate(1);
         data.setMonth(data.getMonth() - i);
 
-        const mes = data.toLocaleDateString('pt-BR', { month: 'short', year: '2-digit' });
-        labels.push(mes);
+        labels.push(data.toLocaleDateString('pt-BR', { month: 'short', year: '2-digit' }));
 
-        // Calcula receitas do mês
-        const inicioMes = new Date(data.getFullYear(), data.getMonth(), 1);
-        const fimMes = new Date(data.getFullYear(), data.getMonth() + 1, 0);
-
-        const receitasMes = osEmMemoria
-            .filter(os => {
-                if (os.status !== 'entregue') return false;
-                const dataOS = new Date(os.dataCriacao);
-                return dataOS >= inicioMes && dataOS <= fimMes;
-            })
-            .reduce((total, os) => total + (os.valorOrcamento || 0), 0);
-
-        // Custos estimados (igual para todos os meses por enquanto)
-        const custosMes = produtosEmMemoria.reduce((total, produto) => {
-            return total + ((produto.precoCusto || 0) * Math.max(0, produto.estoqueMinimo - produto.quantidade));
-        }, 0) / 6; // Divide pelos 6 meses
-
-        receitas.push(receitasMes);
+        const chave = `${data.getFullYear()}-${String(data.getMonth() + 1).padStart(2, '0')}`;
+        receitas.push(receitasPorMes[chave] || 0);
         custos.push(custosMes);
     }
 
@@ -257,20 +240,11 @@ function renderizarRelatorios() {
  * Renderiza relatório de receitas
  */
 function renderizarRelatorioReceitas() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osReceitas = osEmMemoria
-        .filter(os => {
-            if (os.status !== 'entregue') return false;
-            const dataOS = new Date(os.dataCriacao);
-            return dataOS >= inicio && dataOS <= fim;
-        })
-        .sort((a, b) => new Date(b.dataCriacao) - new Date(a.dataCriacao));
-
     const tbody = document.getElementById('receitasTableBody');
     const count = document.getElementById('receitasCount');
 
-    count.textContent = osReceitas.length + ' OS concluídas';
+    const total = resumoPeriodo ? resumoPeriodo.osConcluidas : osReceitas.length;
+    count.textContent = total + ' OS concluídas';
 
     if (osReceitas.length === 0) {
         tbody.innerHTML = '<tr><td colspan="4" style="text-align: center; padding: 40px;">Nenhuma OS concluída no período</td></tr>';
@@ -292,93 +266,54 @@ function renderizarRelatorioReceitas() {
  */
 function renderizarRelatorioCustos() {
     // Por enquanto, mostra produtos com estoque baixo (custos estimados)
-    const produtosCustos = produtosEmMemoria
-        .filter(p => p.quantidade < p.estoqueMinimo)
-        .sort((a, b) => ((b.estoqueMinimo - b.quantidade) * (b.precoCusto || 0)) - ((a.estoqueMinimo - a.quantidade) * (a.precoCusto || 0)));
+    const produtosCustos = (resumoPeriodo && resumoPeriodo.reposicao) || [];
 
     const tbody = document.getElementById('custosTableBody');
     const count = document.getElementById('custosCount');
 
-    count.textContent = `${produtosCustos.length} produtos com reposição necessária`;
+    const total = resumoPeriodo ? resumoPeriodo.produtosReposicao : 0;
+    count.textContent = `${total} produtos com reposição necessária`;
 
     if (produtosCustos.length === 0) {
         tbody.innerHTML = '<tr><td colspan="5" style="text-align: center; padding: 40px;">Nenhum custo identificado no período</td></tr>';
         return;
     }
 
-    tbody.innerHTML = produtosCustos.map(produto => {
-        const qtdNecessaria = produto.estoqueMinimo - produto.quantidade;
-        const custoUnitario = produto.precoCusto || 0;
-        const custoTotal = qtdNecessaria * custoUnitario;
-
-        return `
+    tbody.innerHTML = produtosCustos.map(produto => `
             <tr>
                 <td>${produto.nome}</td>
                 <td>${produto.categoria}</td>
-                <td>${qtdNecessaria}</td>
-                <td>${formatarMoeda(custoUnitario)}</td>
-                <td>${formatarMoeda(custoTotal)}</td>
+                <td>${produto.quantidadeNecessaria}</td>
+                <td>${formatarMoeda(produto.custoUnitario)}</td>
+                <td>${formatarMoeda(produto.custoTotal)}</td>
             </tr>
-        `;
-    }).join('');
+        `).join('');
 }
 
 /**
  * Renderiza relatório de lucro
  */
 function renderizarRelatorioLucro() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osPeriodo = osEmMemoria.filter(os => {
-        if (os.status !== 'entregue') return false;
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
+    const resumo = resumoPeriodo || {};
 
-    const receitas = osPeriodo.reduce((total, os) => total + (os.valorOrcamento || 0), 0);
-    const custos = produtosEmMemoria.reduce((total, produto) => {
-        return total + ((produto.precoCusto || 0) * Math.max(0, produto.estoqueMinimo - produto.quantidade));
-    }, 0);
-
-    const lucro = receitas - custos;
-    const margem = receitas > 0 ? ((lucro / receitas) * 100) : 0;
-
-    document.getElementById('resumoReceitas').textContent = formatarMoeda(receitas);
-    document.getElementById('resumoCustos').textContent = formatarMoeda(custos);
-    document.getElementById('resumoLucro').textContent = formatarMoeda(lucro);
-    document.getElementById('resumoMargem').textContent = margem.toFixed(1) + '%';
+    document.getElementById('resumoReceitas').textContent = formatarMoeda(resumo.receitas || 0);
+    document.getElementById('resumoCustos').textContent = formatarMoeda(resumo.custos || 0);
+    document.getElementById('resumoLucro').textContent = formatarMoeda(resumo.lucro || 0);
+    document.getElementById('resumoMargem').textContent = (resumo.margem || 0).toFixed(1) + '%';
 }
 
 /**
  * Renderiza relatório de produtividade
  */
 function renderizarRelatorioProdutividade() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osPeriodo = osEmMemoria.filter(os => {
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
-
-    const osConcluidasMes = osPeriodo.filter(os => os.status === 'entregue').length;
-
-    // Tempo médio (estimativa baseada na diferença entre criação e entrega)
-    const osComTempo = osPeriodo.filter(os => os.status === 'entregue');
-    const tempoTotal = osComTempo.reduce((total, os) => {
-        // Estimativa simples: 3 dias por OS
-        return total + 3;
-    }, 0);
-    const tempoMedio = osComTempo.length > 0 ? tempoTotal / osComTempo.length : 0;
-
-    const ticketMedio = osComTempo.length > 0 ?
-        osComTempo.reduce((total, os) => total + (os.valorOrcamento || 0), 0) / osComTempo.length : 0;
+    const resumo = resumoPeriodo || {};
 
     // Crescimento mensal (simplificado)
     const crescimento = 0; // TODO: implementar cálculo real
 
-    document.getElementById('osConcluidasMes').textContent = osConcluidasMes;
-    document.getElementById('tempoMedioOS').textContent = tempoMedio.toFixed(1) + ' dias';
-    document.getElementById('ticketMedio').textContent = formatarMoeda(ticketMedio);
+    document.getElementById('osConcluidasMes').textContent = resumo.osConcluidas || 0;
+    document.getElementById('tempoMedioOS').textContent = (resumo.tempoMedioDias || 0).toFixed(1) + ' dias';
+    document.getElementById('ticketMedio').textContent = formatarMoeda(resumo.ticketMedio || 0);
     document.getElementById('crescimentoMensal').textContent = crescimento + '%';
 }
 
@@ -457,6 +392,15 @@ function formatarMoeda(valor) {
     }).format(valor);
 }
 
+/**
+ * Formata data no padrão AAAA-MM-DD (horário local) para a API
+ */
+function formatarDataISO(data) {
+    const mes = String(data.getMonth() + 1).padStart(2, '0');
+    const dia = String(data.getDate()).padStart(2, '0');
+    return `${data.getFullYear()}-${mes}-${dia}`;
+}
+
 /**
  * Formata data
  */
@@ -476,11 +420,11 @@ async function carregarDadosFinanceiros() {
     try {
         console.log('💰 Carregando dados financeiros para período:', periodoAtual);
 
-        // Carrega OS, clientes e produtos
+        // Carrega agregados do servidor e a primeira página de OS entregues
         await Promise.all([
-            carregarOS(),
-            carregarClientes(),
-            carregarProdutos()
+            carregarResumoPeriodo(),
+            carregarResumoGrafico(),
+            carregarOSReceitas()
         ]);
 
         // Calcula métricas
@@ -523,13 +467,7 @@ function exportarRelatorio(formato) {
  * Exporta dados em CSV
  */
 function exportarCSV() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osPeriodo = osEmMemoria.filter(os => {
-        if (os.status !== 'entregue') return false;
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
+    const osPeriodo = osReceitas;
 
     let csv = 'OS,Cliente,Data Conclusão,Valor\n';
 
@@ -13,6 +13,8 @@ class NotificationManager {
 
         this.notificacoes = [];
         this.isOpen = false;
+        this.eventSource = null;
+        this.pollingInterval = null;
 
         this.init();
     }
@@ -49,12 +51,99 @@ class NotificationManager {
         // Carregar notificações iniciais
         this.carregarNotificacoes();
 
+        // Receber notificações em tempo real (SSE); polling apenas como fallback
+        this.conectarStream();
+    }
+
+    async obterTicketStream() {
+        // Ticket de curta duração: o token de sessão não vai na URL do stream
+        const response = await fetch('/api/notificacoes/stream/ticket', {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${getToken()}`
+            }
+        });
+        if (!response.ok) return null;
+        const data = await response.json();
+        return data.ticket;
+    }
+
+    async conectarStream() {
+        if (!window.EventSource) {
+            this.iniciarPolling();
+            return;
+        }
+
+        let ticket = null;
+        try {
+            ticket = await this.obterTicketStream();
+        } catch (error) {
+            console.error('Erro ao obter ticket do stream:', error);
+        }
+        if (!ticket) {
+            this.iniciarPolling();
+            return;
+        }
+
+        this.eventSource = new EventSource(`/api/notificacoes/stream?ticket=${encodeURIComponent(ticket)}`);
+
+        this.eventSource.addEventListener('contador', (e) => {
+            const data = JSON.parse(e.data);
+            const atual = parseInt(this.notificationCount.textContent) || 0;
+            this.exibirContador(data.nao_lidas || 0);
+            // Aumento sem evento "notificacao" (criada em outro processo do
+            // servidor, chega pelo heartbeat): recarrega a lista se estiver aberta
+            if (this.isOpen && (data.nao_lidas || 0) > atual) this.carregarNotificacoes();
+        });
+
+        this.eventSource.addEventListener('notificacao', (e) => {
+            const notif = JSON.parse(e.data);
+            if (this.notificacoes.some(n => n.id === notif.id)) return;
+
+            this.notificacoes.unshift(notif);
+            this.renderizarNotificacoes();
+            const atual = parseInt(this.notificationCount.textContent) || 0;
+            this.exibirContador(atual + (notif.lida ? 0 : 1));
+        });
+
+        // Sessão expirada ou usuário desativado: o servidor encerra o stream
+        this.eventSource.addEventListener('expirado', () => {
+            this.eventSource.close();
+            this.eventSource = null;
+            this.iniciarPolling();
+        });
+
+        this.eventSource.onopen = () => this.pararPolling();
+
+        this.eventSource.onerror = () => {
+            // A reconexão automática reutilizaria o ticket (já vencido):
+            // fecha, volta para o polling e reconecta com um ticket novo
+            this.eventSource.close();
+            this.eventSource = null;
+            this.iniciarPolling();
+            setTimeout(() => this.conectarStream(), 30000);
+        };
+    }
+
+    streamConectado() {
+        return this.eventSource && this.eventSource.readyState === EventSource.OPEN;
+    }
+
+    iniciarPolling() {
+        if (this.pollingInterval) return;
         // Atualizar contador periodicamente
-        setInterval(() => {
+        this.pollingInterval = setInterval(() => {
             this.atualizarContador();
         }, 30000); // A cada 30 segundos
     }
 
+    pararPolling() {
+        if (this.pollingInterval) {
+            clearInterval(this.pollingInterval);
+            this.pollingInterval = null;
+        }
+    }
+
     toggleDropdown() {
         if (this.isOpen) {
             this.closeDropdown();
@@ -87,7 +176,7 @@ class NotificationManager {
             if (response.ok) {
                 this.notificacoes = await response.json();
                 this.renderizarNotificacoes();
-                this.atualizarContador();
+                if (!this.streamConectado()) this.atualizarContador();
             } else {
                 console.error('Erro ao carregar notificações:', response.status);
             }
@@ -106,15 +195,18 @@ class NotificationManager {
 
             if (response.ok) {
                 const data = await response.json();
-                const count = data.nao_lidas || 0;
-                this.notificationCount.textContent = count;
-                this.notificationCount.style.display = count > 0 ? 'flex' : 'none';
+                this.exibirContador(data.nao_lidas || 0);
             }
         } catch (error) {
             console.error('Erro ao atualizar contador:', error);
         }
     }
 
+    exibirContador(count) {
+        this.notificationCount.textContent = count;
+        this.notificationCount.style.display = count > 0 ? 'flex' : 'none';
+    }
+
     renderizarNotificacoes() {
         if (this.notificacoes.length === 0) {
             this.notificationList.innerHTML = `
@@ -215,7 +307,8 @@ class NotificationManager {
                 if (notif) {
                     notif.lida = true;
                     this.renderizarNotificacoes();
-                    this.atualizarContador();
+                    // Com o stream ativo o servidor envia o contador atualizado
+                    if (!this.streamConectado()) this.atualizarContador();
                 }
             }
         } catch (error) {
@@ -236,7 +329,7 @@ class NotificationManager {
                 // Atualizar localmente
                 this.notificacoes.forEach(n => n.lida = true);
                 this.renderizarNotificacoes();
-                this.atualizarContador();
+                if (!this.streamConectado()) this.atualizarContador();
             }
         } catch (error) {
             console.error('Erro ao marcar todas como lidas:', error);